@@ -0,0 +1,237 @@
+"""Precomputed chart aggregates: per-genre rating histograms, co-occurrence and top-N lists
+
+loader.py materializes one row per genre (plus ALL_GENRES for the whole table)
+into AGGREGATES_TABLE at load time. The dashboard then builds its charts from
+these small rows, so a filter change costs O(bins x genres) instead of a scan
+and the chart payload no longer grows with the number of movies.
+
+Ratings are binned at 0.1 (bin = floor(rating * 10)), so "rating >= m" for any
+slider value m is exactly "bin >= m * 10".
+
+Multi-genre selections are a union of genres. Summing per-genre aggregates is
+only exact when no movie is in two of the selected genres; the co-occurrence
+histograms say whether that is the case. When it is not, exact mode returns
+None so the caller computes the charts from rows instead; approximate mode
+returns the sums (movies in k selected genres counted k times).
+"""
+import heapq
+import math
+
+import numpy as np
+
+AGGREGATES_TABLE = 'nicholas_cage_movie_aggregates'
+ALL_GENRES = '*'
+RATING_BINS = 101  # 0.0 .. 10.0 inclusive
+TOP_N = 106
+
+# Table layout:
+#   create table nicholas_cage_movie_aggregates (
+#     genre text primary key, movie_count int, rated_count int,
+#     rating_histogram int[], cooccurrence jsonb, top_movies jsonb, data_version jsonb,
+#     updated_at timestamptz
+#   );
+
+
+def rating_bin(rating):
+    """0.1-wide bin of a rating; the small epsilon absorbs float error such as 6.3 * 10 = 62.999..."""
+    return min(RATING_BINS - 1, max(0, int(math.floor(float(rating) * 10 + 1e-6))))
+
+
+def min_rating_bin(min_rating):
+    return max(0, int(round((min_rating or 0.0) * 10)))
+
+
+def _rating(record):
+    rating = record.get('imdb_rating')
+    if rating is None:
+        return None
+    try:
+        rating = float(rating)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(rating) else rating
+
+
+def _top_entry(record, rating):
+    return {
+        'imdb_rank': record.get('imdb_rank', record.get('rank')),
+        'title': record.get('title'),
+        'imdb_rating': rating,
+        'genres': list(record.get('genres') or []),
+    }
+
+
+def _top_key(entry):
+    # Same order as DataFrame.nlargest on rank-ordered rows: rating desc, then rank
+    rank = entry['imdb_rank']
+    return (-entry['imdb_rating'], rank is None, rank or 0)
+
+
+def _worst_first(entry):
+    """_top_key inverted, so the heap's smallest item is the entry to drop first"""
+    rating, unranked, rank = _top_key(entry)
+    return (-rating, not unranked, -rank)
+
+
+def build_aggregates(records, top_n=TOP_N, data_version=None, updated_at=None):
+    """One aggregate row per genre plus ALL_GENRES, from movie records (table or pipeline field names)"""
+    aggregates = {}
+
+    def aggregate(genre):
+        if genre not in aggregates:
+            aggregates[genre] = {
+                'genre': genre,
+                'movie_count': 0,
+                'rated_count': 0,
+                'rating_histogram': [0] * RATING_BINS,
+                'cooccurrence': {},
+                'top_movies': [],
+            }
+        return aggregates[genre]
+
+    # Each genre's top list is a bounded heap (worst entry on top), so records can be streamed
+    tops = {}
+    for order, record in enumerate(records):
+        genres = sorted(set(record.get('genres') or []))
+        rating = _rating(record)
+        bin_index = rating_bin(rating) if rating is not None else None
+        for genre in [ALL_GENRES] + genres:
+            row = aggregate(genre)
+            row['movie_count'] += 1
+            if bin_index is None:
+                continue
+            row['rated_count'] += 1
+            row['rating_histogram'][bin_index] += 1
+            heap = tops.setdefault(genre, [])
+            entry = _top_entry(record, rating)
+            item = (_worst_first(entry), -order, entry)
+            if len(heap) < top_n:
+                heapq.heappush(heap, item)
+            elif item[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, item)
+            if genre == ALL_GENRES:
+                continue
+            for other in genres:
+                if other != genre:
+                    histogram = row['cooccurrence'].setdefault(other, [0] * RATING_BINS)
+                    histogram[bin_index] += 1
+
+    aggregate(ALL_GENRES)
+    for row in aggregates.values():
+        best = sorted(tops.get(row['genre'], []), key=lambda item: (_top_key(item[2]), -item[1]))
+        row['top_movies'] = [entry for _, _, entry in best]
+        # Lets the dashboard tell whether the aggregates describe the rows it sees
+        row['data_version'] = list(data_version) if data_version is not None else None
+        if updated_at is not None:
+            row['updated_at'] = updated_at
+    return [aggregates[genre] for genre in sorted(aggregates)]
+
+
+class ChartAggregates:
+    """Aggregate rows as NumPy arrays, ready to answer dashboard filter states"""
+
+    def __init__(self, rows):
+        rows = {row['genre']: row for row in rows}
+        overall = rows.pop(ALL_GENRES, None)
+        self.genres = sorted(rows)
+        self.data_version = overall.get('data_version') if overall else None
+        column = {genre: i for i, genre in enumerate(self.genres)}
+        self._column = column
+        # pairs[i, j] = rating histogram of movies in genres i and j; pairs[i, i] = genre i
+        pairs = np.zeros((len(self.genres), len(self.genres), RATING_BINS), dtype=np.int64)
+        self.tops = {ALL_GENRES: (overall.get('top_movies') or []) if overall else []}
+        for genre, row in rows.items():
+            i = column[genre]
+            pairs[i, i] = row['rating_histogram']
+            for other, histogram in (row.get('cooccurrence') or {}).items():
+                if other in column:
+                    pairs[i, column[other]] = histogram
+            self.tops[genre] = row.get('top_movies') or []
+        self.histograms = pairs.diagonal(axis1=0, axis2=1).T.copy()
+        self.total = np.asarray(overall['rating_histogram'] if overall else [0] * RATING_BINS, dtype=np.int64)
+        # above[i, j, b] = movies in i and j rated in bin b or higher; the extra bin is 0
+        above = np.zeros((len(self.genres), len(self.genres), RATING_BINS + 1), dtype=np.int64)
+        above[:, :, :RATING_BINS] = pairs[:, :, ::-1].cumsum(axis=2)[:, :, ::-1]
+        self._above = above
+
+    def __bool__(self):
+        return bool(self.total.any())
+
+    def matches(self, data_version):
+        return self.data_version is not None and list(self.data_version) == list(data_version or [])
+
+    def chart_data(self, min_rating=0.0, genres=(), exact=True, top_n=TOP_N):
+        """Chart data for a filter state (see chart_data_from_rows), or None
+
+        None means the selected genres share movies at or above min_rating and
+        exact is set, so the caller has to compute the charts from rows.
+        """
+        min_bin = min(min_rating_bin(min_rating), RATING_BINS)
+        selected = sorted({self._column[genre] for genre in genres if genre in self._column})
+        overlap = False
+        if not genres:
+            histogram = self.total.copy()
+            counts = self._above.diagonal(axis1=0, axis2=1)[min_bin]
+            tops = [self.tops[ALL_GENRES]]
+        else:
+            overlap = any(self._above[i, j, min_bin] for n, i in enumerate(selected) for j in selected[n + 1:])
+            if overlap and exact:
+                return None
+            histogram = self.histograms[selected].sum(axis=0)
+            counts = self._above[selected, :, min_bin].sum(axis=0)
+            tops = [self.tops[self.genres[i]] for i in selected]
+
+        histogram[:min_bin] = 0
+        return {
+            'histogram': histogram,
+            'genre_counts': {genre: int(n) for genre, n in zip(self.genres, counts.tolist()) if n},
+            'top_movies': merge_top_movies(tops, min_rating, top_n),
+            'exact': not overlap,
+        }
+
+
+def chart_data_from_rows(filtered_df, genre_counts, top_n=TOP_N):
+    """The same chart data computed from already filtered rows
+
+    histogram is RATING_BINS counts, genre_counts maps genre -> movies,
+    top_movies lists the best rated (rating desc, then rank).
+    """
+    ratings = filtered_df['imdb_rating'].to_numpy(dtype=float, na_value=np.nan)
+    top = filtered_df.nlargest(top_n, 'imdb_rating')
+    return {
+        'histogram': rating_histogram(ratings),
+        'genre_counts': dict(genre_counts),
+        'top_movies': top[['title', 'imdb_rating', 'genres']].to_dict('records'),
+        'exact': True,
+    }
+
+
+def merge_top_movies(lists, min_rating=0.0, top_n=TOP_N):
+    """Merge per-genre top lists into the top of their union (exact: each winner is in its genre's top N)"""
+    seen = set()
+    merged = []
+    for entry in sorted((entry for top in lists for entry in top), key=_top_key):
+        key = (entry['imdb_rank'], entry['title'])
+        if key in seen or entry['imdb_rating'] < (min_rating or 0.0):
+            continue
+        seen.add(key)
+        merged.append(entry)
+        if len(merged) == top_n:
+            break
+    return merged
+
+
+def rating_histogram(ratings):
+    """RATING_BINS counts for an array of ratings (NaN ignored), binned like rating_bin()"""
+    ratings = np.asarray(ratings, dtype=float)
+    ratings = ratings[~np.isnan(ratings)]
+    bins = np.clip(np.floor(ratings * 10 + 1e-6).astype(np.int64), 0, RATING_BINS - 1)
+    return np.bincount(bins, minlength=RATING_BINS)
+
+
+def display_bins(histogram, width=0.5):
+    """Fold 0.1 bins into width-wide bars: (bar start ratings, counts)"""
+    step = max(1, int(round(width * 10)))
+    edges = np.arange(0, RATING_BINS, step)
+    counts = np.add.reduceat(np.asarray(histogram), edges)
+    return edges / 10.0, counts
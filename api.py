@@ -0,0 +1,333 @@
+"""Read-only JSON query API next to the dashboard
+
+    GET /movies?min_rating=6.5&genres=Action,Drama&top=106&limit=25&cursor=...
+    GET /genres
+    GET /health
+
+/movies answers "the top movies in these genres above this rating" with the
+sidebar's semantics: rating >= min_rating, any of the genres, and the top list
+ordered like the dashboard's table (rating desc, then rank). Pages of `limit`
+rows are walked with the opaque next_cursor of the previous page; a cursor from
+an older data version gets 410, and one from a different query gets 400.
+
+Rows come from the snapshot when it matches Supabase's data version, else from
+Supabase once per data version, so the database sees one version check per
+MOVIE_CACHE_TTL however many requests arrive. Finished responses (JSON plus a
+gzipped copy) are kept in an LRU per data version and served with an ETag, so a
+repeat If-None-Match is a 304.
+
+Usage: python api.py [--port 8080]    (Modal serves `application` as a WSGI app)
+"""
+import base64
+import binascii
+import gzip
+import json
+import os
+import sys
+import threading
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import numpy as np
+import pandas as pd
+
+from aggregates import TOP_N
+from genre_index import GenreIndex
+from instrumentation import count, log, span
+from llm_cache import fingerprint
+from movie_data import (
+    CACHE_TTL_SECONDS,
+    DASHBOARD_COLUMNS,
+    MovieCache,
+    fetch_data_version,
+    fetch_movies,
+)
+from render_cache import RATING_STEP, RenderCache, render_key
+from snapshot import SNAPSHOT_PATH, open_snapshot
+
+PORT = int(os.getenv("API_PORT", "8080"))
+API_CACHE_BYTES = int(float(os.getenv("API_CACHE_MB", "32")) * 1024 * 1024)
+API_PAGE_SIZE = int(os.getenv("API_PAGE_SIZE", "25"))
+API_MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", "100"))
+API_MAX_TOP = int(os.getenv("API_MAX_TOP", "1000"))
+
+# Bodies smaller than this are sent as they are; gzip would barely shrink them
+GZIP_MIN_BYTES = 512
+
+# Filter states answered ahead of the first request for every new data version
+PRECOMPUTE = os.getenv("API_PRECOMPUTE", "1") == "1"
+
+
+class BadRequest(Exception):
+    def __init__(self, message, status="400 Bad Request"):
+        super().__init__(message)
+        self.status = status
+
+
+def fetch_api_movies(client, data_version=None):
+    """The dashboard columns, from the snapshot when it matches Supabase, else from Supabase"""
+    if data_version is None:
+        data_version = fetch_data_version(client)
+    snapshot = open_snapshot(SNAPSHOT_PATH)
+    if snapshot is not None and snapshot.matches(data_version):
+        return snapshot.dashboard_frame()
+    return fetch_movies(client, columns=DASHBOARD_COLUMNS)
+
+
+class MovieQueries:
+    """Filters and pages over the movies of the current data version, with the finished responses cached"""
+
+    def __init__(self, movies=None, max_bytes=API_CACHE_BYTES):
+        self.movies = movies or MovieCache(fetch=self._fetch_movies, fetch_version=self._fetch_version)
+        self._checked_version = None
+        self.responses = RenderCache(max_bytes, sizeof=lambda response: len(response["body"]) +
+                                     len(response["gzip"] or b""), metric="api_cache")
+        self._lock = threading.Lock()
+        self._current = None
+
+    def _fetch_version(self, client):
+        # MovieCache fetches right after this check, under its lock, so the fetch can reuse it
+        self._checked_version = fetch_data_version(client)
+        return self._checked_version
+
+    def _fetch_movies(self, client):
+        return fetch_api_movies(client, self._checked_version)
+
+    def current(self):
+        """(df, genre_index, version tag) for the current data version; a new version is precomputed first"""
+        df, version = self.movies.get()
+        with self._lock:
+            fresh = self._current is None or self._current[0] is not df
+            if fresh:
+                self.responses.clear()
+                self._current = (df, GenreIndex.build(df["genres"]), fingerprint(version)[:16])
+            current = self._current
+        if fresh and PRECOMPUTE:
+            self.precompute(*current)
+        return current
+
+    def precompute(self, df, genre_index, tag):
+        """The genre list and the first page of every single-genre query with no rating floor"""
+        with span("api.precompute", version=tag) as precompute_span:
+            self.response(df, genre_index, tag, "/genres", {})
+            self.response(df, genre_index, tag, "/movies", {})
+            for genre in genre_index.genres:
+                self.response(df, genre_index, tag, "/movies", {"genres": [genre]})
+            precompute_span.set(responses=len(genre_index.genres) + 2)
+
+    def response(self, df, genre_index, tag, path, params):
+        """Cached {"body", "gzip", "etag"} for a request, built on a miss"""
+        if path == "/genres":
+            key = (tag, "genres")
+            return self.responses.get(key, lambda: encode(genres_payload(genre_index, tag)))
+        query = parse_movie_query(params, tag)
+        key = ("movies", render_key(tag, query["min_rating"], query["genres"]),
+               query["top"], query["offset"], query["limit"])
+        return self.responses.get(key, lambda: encode(movies_payload(df, genre_index, tag, query)))
+
+
+def _param(params, name, default, cast, low, high):
+    values = params.get(name)
+    if not values:
+        return default
+    try:
+        value = cast(values[-1])
+    except ValueError:
+        raise BadRequest(f"{name} must be a number")
+    if not low <= value <= high:
+        raise BadRequest(f"{name} must be between {low} and {high}")
+    return value
+
+
+def query_hash(query):
+    """Fingerprint of a normalized query's filters and page size, carried in its cursors"""
+    return fingerprint([query["genres"], query["min_rating"], query["top"], query["limit"]])[:12]
+
+
+def encode_cursor(tag, query, offset):
+    raw = json.dumps({"v": tag, "q": query_hash(query), "o": offset}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, tag, query):
+    """Offset of a cursor from next_cursor; 400 if malformed or from another query, 410 if the data changed"""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        version, query_key, offset = state["v"], state["q"], int(state["o"])
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise BadRequest("cursor is not valid")
+    if version != tag:
+        raise BadRequest("cursor is from an older data version; start again without a cursor", "410 Gone")
+    if query_key != query_hash(query):
+        raise BadRequest("cursor belongs to a different query; send the same filters and limit as its first page")
+    return max(offset, 0)
+
+
+def parse_movie_query(params, tag):
+    """Normalized filter state and page of a /movies request"""
+    genres = sorted({genre.strip() for value in params.get("genres", []) for genre in value.split(",")
+                     if genre.strip()})
+    # Rounded to the slider's step, so 6.5 and 6.50 share a cache entry
+    min_rating = round(round(_param(params, "min_rating", 0.0, float, 0.0, 10.0) / RATING_STEP) * RATING_STEP, 1)
+    query = {
+        "min_rating": min_rating,
+        "genres": genres,
+        "top": _param(params, "top", TOP_N, int, 1, API_MAX_TOP),
+        "limit": _param(params, "limit", API_PAGE_SIZE, int, 1, API_MAX_PAGE_SIZE),
+    }
+    cursor = (params.get("cursor") or [None])[-1]
+    query["offset"] = decode_cursor(cursor, tag, query) if cursor else 0
+    return query
+
+
+def top_movies(df, genre_index, min_rating, genres, top):
+    """(matching movie count, top rows): the sidebar's filter, then the dashboard's top-N order"""
+    mask = df["imdb_rating"].to_numpy(dtype=float, na_value=np.nan) >= min_rating
+    if genres:
+        mask &= genre_index.any_of(genres)
+    return int(mask.sum()), df[mask].nlargest(top, "imdb_rating")
+
+
+def movies_payload(df, genre_index, tag, query):
+    with span("api.filter", genres=len(query["genres"])):
+        matching, top = top_movies(df, genre_index, query["min_rating"], query["genres"], query["top"])
+    offset, limit = query["offset"], query["limit"]
+    page = top.iloc[offset:offset + limit]
+    movies = [
+        {"imdb_rank": None if pd.isna(row.imdb_rank) else int(row.imdb_rank), "title": row.title, "imdb_rating": float(row.imdb_rating),
+         "genres": list(row.genres) if row.genres is not None else []}
+        for row in page.itertuples(index=False)
+    ]
+    more = offset + limit < len(top)
+    return {
+        "data_version": tag,
+        "min_rating": query["min_rating"],
+        "genres": query["genres"],
+        "matching": matching,
+        "total": len(top),
+        "movies": movies,
+        "next_cursor": encode_cursor(tag, query, offset + limit) if more else None,
+    }
+
+
+def genres_payload(genre_index, tag):
+    return {"data_version": tag, "genres": genre_index.counts()}
+
+
+def encode(payload):
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return {
+        "body": body,
+        "gzip": gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_BYTES else None,
+        "etag": '"' + fingerprint(body.decode("utf-8"))[:20] + '"',
+    }
+
+
+def accepts_gzip(accept_encoding):
+    """True if Accept-Encoding gives gzip (or *, when gzip is not listed) a q-value above 0"""
+    weights = {}
+    for item in (accept_encoding or "").split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if coding:
+            weights[coding.lower()] = weight
+    weight = weights.get("gzip", weights.get("x-gzip", weights.get("*", 0.0)))
+    return weight > 0
+
+
+def not_modified(if_none_match, etag):
+    """True if If-None-Match lists etag (weak comparison, as for GET)"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def _json(start_response, status, payload):
+    """An uncached JSON response: errors and /health"""
+    body = json.dumps(payload).encode("utf-8")
+    start_response(status, [("Content-Type", "application/json"), ("Content-Length", str(len(body))),
+                            ("Cache-Control", "no-store")])
+    return [body]
+
+
+queries = MovieQueries()
+
+
+def application(environ, start_response):
+    """WSGI entry point"""
+    path = environ.get("PATH_INFO", "/").rstrip("/") or "/"
+    method = environ.get("REQUEST_METHOD", "GET")
+    with span("api.request", path=path) as request_span:
+        if method not in ("GET", "HEAD"):
+            request_span.set(status=405)
+            return _json(start_response, "405 Method Not Allowed", {"error": "read-only API: use GET"})
+        try:
+            df, genre_index, tag = queries.current()
+            if path == "/health":
+                return _json(start_response, "200 OK", {"data_version": tag, "movies": len(df)})
+            if path not in ("/movies", "/genres"):
+                request_span.set(status=404)
+                return _json(start_response, "404 Not Found", {"error": f"no such endpoint: {path}"})
+            params = parse_qs(environ.get("QUERY_STRING", ""))
+            response = queries.response(df, genre_index, tag, path, params)
+        except BadRequest as e:
+            request_span.set(status=int(e.status.split()[0]))
+            count("api_responses_total", status=e.status.split()[0])
+            return _json(start_response, e.status, {"error": str(e)})
+
+        body, etag = response["body"], response["etag"]
+        gzipped = response["gzip"] is not None and accepts_gzip(environ.get("HTTP_ACCEPT_ENCODING"))
+        if gzipped:
+            # Each encoding is a different representation, so it gets its own ETag
+            body, etag = response["gzip"], etag[:-1] + '-gzip"'
+        headers = [
+            ("Content-Type", "application/json"),
+            ("ETag", etag),
+            ("Cache-Control", f"public, max-age={int(CACHE_TTL_SECONDS)}"),
+            ("Vary", "Accept-Encoding"),
+        ]
+        if not_modified(environ.get("HTTP_IF_NONE_MATCH"), etag):
+            request_span.set(status=304)
+            count("api_responses_total", status="304")
+            start_response("304 Not Modified", headers)
+            return []
+
+        if gzipped:
+            headers.append(("Content-Encoding", "gzip"))
+        headers.append(("Content-Length", str(len(body))))
+        request_span.set(status=200, bytes=len(body))
+        count("api_responses_total", status="200")
+        start_response("200 OK", headers)
+        return [] if method == "HEAD" else [body]
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def main(argv):
+    port = PORT
+    if "--port" in argv:
+        port = int(argv[argv.index("--port") + 1])
+    df, genre_index, tag = queries.current()
+    log(f"Query API on port {port}: {len(df)} movies, data version {tag}")
+    with make_server("", port, application, ThreadingWSGIServer, QuietHandler) as server:
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
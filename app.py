@@ -1,11 +1,36 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
-from supabase import create_client
 import os
-from dotenv import load_dotenv
+import instrumentation
+from aggregates import ChartAggregates, chart_data_from_rows, display_bins
+from genre_index import GenreIndex
+from instrumentation import span
+from movie_data import (
+    CACHE_TTL_SECONDS,
+    DASHBOARD_COLUMNS,
+    fetch_aggregates,
+    fetch_data_version,
+    fetch_genre_vocabulary,
+    fetch_movies,
+    get_supabase_client,
+    movie_cache,
+)
+from render_cache import render_cache, render_key
+from similarity import compare, similarity
+from snapshot import SNAPSHOT_PATH, open_snapshot
+from title_index import TitleIndex
+
+# "cache" filters a cached copy of the whole table in pandas,
+# "query" pushes the filters down into Supabase,
+# "snapshot" memory-maps the local Arrow snapshot and asks Supabase only for the data version
+DATA_MODE = os.getenv("MOVIE_DATA_MODE", "cache")
 
-load_dotenv()
+# Charts come from the aggregates loader.py precomputes. When the selected genres share
+# movies, summing their aggregates double-counts those movies: with exact charts on,
+# such selections are computed from rows instead; off, the sums are shown with a note
+EXACT_CHARTS = os.getenv("MOVIE_CHARTS_EXACT", "1") == "1"
 
 st.set_page_config(
     page_title="Cage Match[er]",
@@ -13,11 +38,144 @@ st.set_page_config(
 )
 
 def init_supabase():
-    supabase_url = os.getenv("SUPABASE_URL")
-    supabase_key = os.getenv("SUPABASE_KEY")
-    return create_client(supabase_url, supabase_key)
+    return get_supabase_client()
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def load_data_version():
+    return fetch_data_version(get_supabase_client())
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def load_genre_vocabulary(data_version):
+    return fetch_genre_vocabulary(get_supabase_client())
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_genre_index(data_version, _df):
+    return GenreIndex.build(_df['genres'])
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def load_title_index(data_version, source, _titles):
+    # source keeps snapshot and Supabase frames apart, their row order may differ
+    return TitleIndex.build(_titles)
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_search_frame(data_version):
+    """Query mode has no local rows, so search gets its own copy of the dashboard columns"""
+    df = fetch_movies(get_supabase_client(), columns=DASHBOARD_COLUMNS)
+    return df, GenreIndex.build(df['genres'])
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_aggregates(data_version):
+    """Chart aggregates for this data version, or None if the loader has not written matching ones"""
+    aggregates = ChartAggregates(fetch_aggregates(get_supabase_client()))
+    return aggregates if aggregates and aggregates.matches(data_version) else None
+
+def load_current_snapshot():
+    """(df, genre_index) from the snapshot if it matches Supabase's data version, else (None, None)"""
+    snapshot = open_snapshot(SNAPSHOT_PATH)
+    if snapshot is None:
+        st.sidebar.caption("No snapshot found; reading from Supabase")
+        return None, None
+    if not snapshot.matches(load_data_version()):
+        st.sidebar.caption("Snapshot is out of date; reading from Supabase")
+        return None, None
+    return snapshot.dashboard_frame(), snapshot.genre_index()
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def load_filtered_movies(data_version, min_rating, genres):
+    return fetch_movies(get_supabase_client(), min_rating, list(genres), columns=DASHBOARD_COLUMNS)
+
+def render_views(chart_data):
+    """Figures and the top movies table for one filter state; cached and shared, so never mutated"""
+    # 0.1 bins folded into 0.5-wide bars, trimmed to the rated range
+    starts, counts = display_bins(chart_data['histogram'])
+    rated = np.flatnonzero(counts)
+    if len(rated):
+        starts, counts = starts[rated[0]:rated[-1] + 1], counts[rated[0]:rated[-1] + 1]
+    fig_hist = px.bar(
+        x=starts + 0.25,
+        y=counts,
+        labels={'x': 'imdb_rating', 'y': 'count'},
+        color_discrete_sequence=['#FF4B4B']
+    )
+    fig_hist.update_traces(
+        marker=dict(
+            line=dict(width=2, color='DarkSlateGrey')
+        )
+    )
+    fig_hist.update_layout(
+        bargap=0,
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='white')
+    )
+    
+    top_movies = pd.DataFrame(chart_data['top_movies'], columns=['title', 'imdb_rating', 'genres'])
+    
+    genre_df = pd.DataFrame(list(chart_data['genre_counts'].items()), columns=['Genre', 'Count'])
+    fig_pie = px.pie(
+        genre_df, 
+        values='Count', 
+        names='Genre',
+        color_discrete_sequence=px.colors.qualitative.Set3
+    )
+    return {'histogram': fig_hist, 'top_movies': top_movies, 'genres': fig_pie, 'exact': chart_data['exact']}
+
+def find_movie(snapshot, query):
+    """Row of the best title match for query, or None"""
+    rows = snapshot.title_index().search(query, limit=1)
+    return int(rows[0]) if len(rows) else None
+
+def cage_match(snapshot):
+    """Similar movies for one title and, given a second, how the two compare"""
+    st.subheader("Cage Match")
+    if snapshot is None or not snapshot.has_neighbors():
+        st.caption("Similar movies come from the snapshot loader.py writes; none with neighbors was found")
+        return
+    if not snapshot.matches(load_data_version()):
+        st.caption("Similar movies are from an older load")
+    
+    col1, col2 = st.columns(2)
+    first = col1.text_input("Movie", placeholder="e.g. Con Air")
+    second = col2.text_input("Versus", placeholder="e.g. Face/Off (optional)")
+    if not first.strip():
+        return
+    with span("app.cage_match"):
+        row = find_movie(snapshot, first)
+        if row is None:
+            col1.caption(f"No title matches \"{first.strip()}\"")
+            return
+        movie = snapshot.movie(row)
+        rows, scores = snapshot.neighbors(row)
+        similar = snapshot.movies(rows)
+        similar['similarity'] = scores.round(3)
+    
+        with col1:
+            st.markdown(f"**Most like {movie['title']}** ({movie['year']})")
+            st.dataframe(similar, use_container_width=True, hide_index=True)
+    
+        if not second.strip():
+            return
+        other_row = find_movie(snapshot, second)
+        if other_row is None:
+            col2.caption(f"No title matches \"{second.strip()}\"")
+            return
+        other = snapshot.movie(other_row)
+        facts = compare(movie, other)
+        score = similarity(snapshot.features(), row, other_row)
+    
+    with col2:
+        st.markdown(f"**{movie['title']}** vs **{other['title']}**")
+        st.metric("Similarity", f"{score:.0%}")
+        st.write(f"Shared genres: {', '.join(facts['shared_genres']) or 'none'}")
+        if facts['rating_gap'] is not None:
+            st.write(f"Rating: {movie['imdb_rating']} vs {other['imdb_rating']}")
+        if facts['year_gap'] is not None:
+            st.write(f"Years apart: {abs(facts['year_gap'])}")
+        st.write(f"Winner: {facts['winner'] or 'a draw'}")
 
 def main():
+    # Timings are per script thread; start each run from none
+    instrumentation.reset_timings()
     st.image("https://cdn1.sbnation.com/assets/3430219/ExtremeBliss.gif", 
                  width=400)
     
@@ -27,73 +185,123 @@ def main():
     
     supabase = init_supabase()
     
-    response = supabase.table("nicholas_cage_movies").select("*").order("imdb_rank").execute()
-    df = pd.DataFrame(response.data)
+    if st.sidebar.button("Refresh data"):
+        movie_cache.invalidate()
+        render_cache.clear()
+        st.cache_data.clear()
     
     st.sidebar.header("Filters")
     min_rating = st.sidebar.slider("Minimum Rating", 0.0, 10.0, 0.0, 0.1)
     
-    all_genres = set()
-    for genres in df['genres']:
-        if genres:
-            all_genres.update(genres)
+    with span("app.fetch", mode=DATA_MODE):
+        if DATA_MODE == "query":
+            data_version = load_data_version()
+            aggregates = load_aggregates(data_version)
+            all_genres = aggregates.genres if aggregates else load_genre_vocabulary(data_version)
+        else:
+            df = None
+            source = DATA_MODE
+            if DATA_MODE == "snapshot":
+                df, genre_index = load_current_snapshot()
+                data_version = load_data_version()
+            if df is None:
+                source = "cache"
+                df, data_version = movie_cache.get(supabase)
+                genre_index = load_genre_index(data_version, df)
+            aggregates = load_aggregates(data_version)
+            all_genres = genre_index.genres
     
     selected_genres = st.sidebar.multiselect("Genres", sorted(all_genres))
+    search = st.sidebar.text_input("Search titles", placeholder="e.g. face off")
     
-    filtered_df = df[df['imdb_rating'] >= min_rating]
-    if selected_genres:
-        filtered_df = filtered_df[filtered_df['genres'].apply(
-            lambda x: any(genre in x for genre in selected_genres) if x else False
-        )]
+    if search.strip():
+        with span("app.search", mode=DATA_MODE) as search_span:
+            if DATA_MODE == "query":
+                source = "query"
+                df, genre_index = load_search_frame(data_version)
+            title_index = load_title_index(data_version, source, df['title'])
+            # Matches are limited to the movies the rating and genre filters keep
+            mask = df['imdb_rating'].to_numpy(dtype=float, na_value=np.nan) >= min_rating
+            if selected_genres:
+                mask &= genre_index.any_of(selected_genres)
+            results = title_index.search_frame(df, search, mask)
+            search_span.set(results=len(results))
+        st.subheader("Search Results")
+        if len(results):
+            st.dataframe(
+                results[['title', 'imdb_rating', 'genres']],
+                use_container_width=True,
+                hide_index=True
+            )
+        else:
+            st.caption(f"No titles match \"{search.strip()}\" with the current filters")
     
-    col1, col2 = st.columns(2)
+    def build_views():
+        # In query mode the filters run in Supabase, so this span includes that round trip
+        with span("app.filter", mode=DATA_MODE, genres=len(selected_genres)) as filter_span:
+            chart_data = None
+            if aggregates is not None:
+                chart_data = aggregates.chart_data(min_rating, selected_genres, exact=EXACT_CHARTS)
+            filter_span.set(source="aggregates" if chart_data is not None else "rows")
+            if chart_data is None:
+                if DATA_MODE == "query":
+                    filtered_df = load_filtered_movies(data_version, min_rating, tuple(sorted(selected_genres)))
+                    genre_counts = GenreIndex.build(filtered_df['genres']).counts()
+                else:
+                    mask = df['imdb_rating'].to_numpy(dtype=float, na_value=np.nan) >= min_rating
+                    if selected_genres:
+                        mask &= genre_index.any_of(selected_genres)
+                    filtered_df = df[mask]
+                    genre_counts = genre_index.counts(mask)
+                chart_data = chart_data_from_rows(filtered_df, genre_counts)
+        with span("app.render", rows=int(chart_data['histogram'].sum())):
+            return render_views(chart_data)
     
-    with col1:
-        st.subheader("Ratings Distribution")
-        fig_hist = px.histogram(
-            filtered_df, 
-            x='imdb_rating', 
-            nbins=20,
-            color_discrete_sequence=['#FF4B4B']
-        )
-        fig_hist.update_traces(
-            marker=dict(
-                line=dict(width=2, color='DarkSlateGrey')
-            )
-        )
-        fig_hist.update_layout(
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font=dict(color='white')
-        )
-        st.plotly_chart(fig_hist, use_container_width=True)
-        
-    with col2:
-        st.subheader("Top Rated Movies")
-        top_movies = filtered_df.nlargest(106, 'imdb_rating')[['title', 'imdb_rating', 'genres']]
+    # Sessions looking at the same filters on the same data share one set of figures
+    views = render_cache.get(render_key(data_version, min_rating, selected_genres), build_views)
+    
+    with span("app.charts"):
+        col1, col2 = st.columns(2)
+    
+        with col1:
+            st.subheader("Ratings Distribution")
+            st.plotly_chart(views['histogram'], use_container_width=True)
         
-        # Make the dataframe scrollable with fixed height
-        st.dataframe(
-            top_movies, 
-            use_container_width=True,
-            height=400  # Fixed height makes it scrollable
-        )
+        with col2:
+            st.subheader("Top Rated Movies")
+            # Make the dataframe scrollable with fixed height
+            st.dataframe(
+                views['top_movies'], 
+                use_container_width=True,
+                height=400  # Fixed height makes it scrollable
+            )
     
-    st.subheader("Movies by Genre")
-    genre_counts = {}
-    for genres in filtered_df['genres']:
-        if genres:
-            for genre in genres:
-                genre_counts[genre] = genre_counts.get(genre, 0) + 1
+        st.subheader("Movies by Genre")
+        st.plotly_chart(views['genres'], use_container_width=True)
+        if not views['exact']:
+            st.caption("Movies in more than one selected genre are counted once per genre")
     
-    genre_df = pd.DataFrame(list(genre_counts.items()), columns=['Genre', 'Count'])
-    fig_pie = px.pie(
-        genre_df, 
-        values='Count', 
-        names='Genre',
-        color_discrete_sequence=px.colors.qualitative.Set3
+    cage_match(open_snapshot(SNAPSHOT_PATH))
+    
+    stats = movie_cache.stats()
+    st.sidebar.caption(
+        f"Data cache: {stats['hits']} hits / {stats['misses']} misses "
+        f"({stats['hit_rate']:.0%} hit rate)"
+    )
+    stats = render_cache.stats()
+    st.sidebar.caption(
+        f"Render cache: {stats['hits']} hits / {stats['misses']} misses "
+        f"({stats['hit_rate']:.0%} hit rate, {stats['entries']} views, {stats['bytes'] / 1e6:.1f} MB)"
     )
-    st.plotly_chart(fig_pie, use_container_width=True)
+    
+    if instrumentation.enabled():
+        timings = instrumentation.last_timings()
+        st.sidebar.caption("Timings: " + ", ".join(
+            f"{name.split('.', 1)[1]} {timings[name] * 1000:.0f} ms"
+            for name in ("app.fetch", "app.search", "app.filter", "app.render", "app.charts")
+            if name in timings
+        ))
+        instrumentation.flush_metrics()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,99 @@
+"""Query API latency and database load: first request, cached repeat, 304 revalidation
+
+api.py is served in-process on a local port against the PostgREST stub (the
+loader also writes the snapshot it reads from). Random filter states are each
+requested three times: the first builds the response, the second is a cache
+hit, and the third sends the ETag back and gets a 304. The database requests
+made over the whole run are counted as well.
+
+Usage: python benchmarks/bench_api.py [--movies 10000] [--queries 200]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+from bench_cold_start import free_port, prepare_data  # noqa: E402
+from fixtures import percentiles, synthetic_movies  # noqa: E402
+from stubs import PostgrestStub  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--movies", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=200, help="distinct filter states")
+    parser.add_argument("--output", help="also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    with PostgrestStub() as db:
+        prepare_data(db, synthetic_movies(args.movies), tempfile.mkdtemp(prefix="cage-api-"))
+        os.environ["MOVIE_DATA_MODE"] = "snapshot"
+        from wsgiref.simple_server import make_server
+        import api
+
+        start = time.perf_counter()
+        api.queries.current()
+        warm_s = time.perf_counter() - start
+        server = make_server("127.0.0.1", free_port(), api.application, api.ThreadingWSGIServer, api.QuietHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_port}/movies"
+        genres = api.queries.current()[1].genres
+        requests_before = db.requests
+
+        rng = random.Random(0)
+        latencies = {"first": [], "cached": [], "not_modified": []}
+        sizes = {"identity": [], "gzip": []}
+        session = requests.Session()
+        for _ in range(args.queries):
+            params = {"min_rating": round(rng.uniform(0, 9), 1),
+                      "genres": ",".join(rng.sample(genres, rng.randint(0, 3))),
+                      "limit": rng.choice([10, 25, 100])}
+            for kind in ("first", "cached"):
+                start = time.perf_counter()
+                response = session.get(base, params=params)
+                latencies[kind].append(time.perf_counter() - start)
+            # requests asks for gzip; Content-Length is the size on the wire, content the decoded body
+            sizes["gzip"].append(int(response.headers["Content-Length"]))
+            sizes["identity"].append(len(response.content))
+            etag = response.headers["ETag"]
+            start = time.perf_counter()
+            revalidated = session.get(base, params=params, headers={"If-None-Match": etag})
+            latencies["not_modified"].append(time.perf_counter() - start)
+            assert revalidated.status_code == 304, revalidated.status_code
+        server.shutdown()
+
+        report = {
+            "movies": args.movies,
+            "queries": args.queries,
+            "warm_s": round(warm_s, 3),
+            "latency": {kind: percentiles(values) for kind, values in latencies.items()},
+            "mean_bytes": {kind: round(statistics.fmean(values)) for kind, values in sizes.items()},
+            "database_requests": db.requests - requests_before,
+            "cache": api.queries.responses.stats(),
+        }
+
+    print(f"{args.movies} movies, data loaded and common responses precomputed in {report['warm_s']:.2f}s")
+    for kind, result in report["latency"].items():
+        print(f"   {kind:<13} p50 {result['p50_ms']:>7.2f}ms  p95 {result['p95_ms']:>7.2f}ms  "
+              f"p99 {result['p99_ms']:>7.2f}ms")
+    print(f"   mean body {report['mean_bytes']['identity']} bytes, {report['mean_bytes']['gzip']} gzipped; "
+          f"{report['database_requests']} database requests for {3 * args.queries} API requests")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Cold start report: import times and time to first byte for the dashboard entry commands
+
+Each command is launched fresh, the way a new container would start it, against
+a local PostgREST stub loaded with synthetic movies (and the Arrow snapshot the
+loader writes), so no Supabase project is needed.
+
+Reported per command (median over --runs):
+  ready_s        launch until /_stcore/health answers (the port accepts traffic)
+  ttfb_s         first byte of the dashboard page once ready
+  first_paint_s  first session: request until the first element arrives
+  render_s       first session: request until the script run finishes
+  cold_s         ready_s + render_s, what the first visitor of a new container waits
+  warmup         serve.py's own breakdown (imports, chart warmup, data load)
+
+The import report is `python -X importtime` over the modules app.py pulls in.
+
+Usage: python benchmarks/bench_cold_start.py [--movies 10000] [--runs 3]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+from fixtures import ROOT, synthetic_movies  # noqa: E402
+from streamlit_client import StreamlitSession  # noqa: E402
+from stubs import STUB_SUPABASE_KEY, PostgrestStub  # noqa: E402
+
+# The previous Modal entry command and the warmed one it now runs
+COMMANDS = {
+    "streamlit run": lambda port: [sys.executable, "-m", "streamlit", "run", "app.py",
+                                   "--server.headless=true", f"--server.port={port}"],
+    "serve.py": lambda port: [sys.executable, "serve.py", "--port", str(port)],
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def import_report(env, top=12):
+    """Cumulative import time per module for everything app.py imports at module level"""
+    code = "import numpy, pandas, pyarrow, plotly.express, supabase, streamlit, genre_index, movie_data, snapshot"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)", line)
+        if match and len(match.group(3)) == 1:  # top-level imports only
+            rows.append((match.group(4), int(match.group(2)) / 1e6))
+    rows.sort(key=lambda row: row[1], reverse=True)
+    return {"total_s": round(sum(seconds for _, seconds in rows), 3),
+            "top": {name: round(seconds, 3) for name, seconds in rows[:top]}}
+
+
+def launch(command, env, timeout):
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        command(port), cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    output = []
+    reader = threading.Thread(target=lambda: output.extend(process.stdout), daemon=True)
+    reader.start()
+    base = f"http://127.0.0.1:{port}"
+    try:
+        ready = None
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                break
+            try:
+                if requests.get(f"{base}/_stcore/health", timeout=1).status_code == 200:
+                    ready = time.perf_counter() - start
+                    break
+            except requests.ConnectionError:
+                pass
+            time.sleep(0.02)
+        if ready is None:
+            raise RuntimeError(f"{command(port)} did not become ready:\n{''.join(output)[-2000:]}")
+        page_start = time.perf_counter()
+        response = requests.get(f"{base}/", stream=True, timeout=10)
+        next(response.iter_content(1))
+        ttfb = time.perf_counter() - page_start
+        response.close()
+        with StreamlitSession(base, timeout=timeout) as session:
+            render = session.rerun()
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        reader.join(timeout=2)
+
+    warmup = None
+    for line in output:
+        if line.startswith("WARMUP "):
+            warmup = json.loads(line[len("WARMUP "):])
+    return {
+        "ready_s": round(ready, 3),
+        "ttfb_s": round(ttfb, 4),
+        "first_paint_s": round(render["first_delta_s"], 3),
+        "render_s": round(render["finished_s"], 3),
+        "cold_s": round(ready + render["finished_s"], 3),
+        "warmup": warmup,
+    }
+
+
+def prepare_data(db, movies, workdir):
+    """Load the stub table; the loader also writes the version-stamped snapshot"""
+    source = os.path.join(workdir, "movies.json")
+    with open(source, "w", encoding="utf-8") as f:
+        json.dump(movies, f)
+    snapshot_path = os.path.join(workdir, "movies.arrow")
+    # loader and snapshot read these at import time
+    os.environ.update(SUPABASE_URL=db.url, SUPABASE_KEY=STUB_SUPABASE_KEY, MOVIE_SNAPSHOT=snapshot_path)
+    import loader
+    with contextlib.redirect_stdout(io.StringIO()):
+        loader.load_to_supabase(path=source)
+    return snapshot_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--movies", type=int, default=10_000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--mode", default="snapshot", choices=["snapshot", "cache", "query"])
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--output", help="also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="cage-cold-start-")
+    with PostgrestStub() as db:
+        snapshot_path = prepare_data(db, synthetic_movies(args.movies), workdir)
+        env = dict(os.environ, MOVIE_DATA_MODE=args.mode, MOVIE_SNAPSHOT=snapshot_path,
+                   SUPABASE_URL=db.url, SUPABASE_KEY=STUB_SUPABASE_KEY, PYTHONUNBUFFERED="1")
+
+        report = {"movies": args.movies, "mode": args.mode, "imports": import_report(env), "commands": {}}
+        print(f"Import time (top-level, cumulative): {report['imports']['total_s']}s")
+        for name, seconds in report["imports"]["top"].items():
+            print(f"   {name:<24} {seconds:>7.3f}s")
+
+        for name, command in COMMANDS.items():
+            runs = [launch(command, env, args.timeout) for _ in range(args.runs)]
+            summary = {
+                key: statistics.median(run[key] for run in runs)
+                for key in ("ready_s", "ttfb_s", "first_paint_s", "render_s", "cold_s")
+            }
+            summary.update(warmup=runs[-1]["warmup"], runs=runs)
+            report["commands"][name] = summary
+            print(f"{name:<14} ready {summary['ready_s']:.2f}s  ttfb {summary['ttfb_s'] * 1000:.1f}ms  "
+                  f"first paint {summary['first_paint_s']:.2f}s  render {summary['render_s']:.2f}s  "
+                  f"cold total {summary['cold_s']:.2f}s")
+            if summary["warmup"]:
+                warmup = summary["warmup"]
+                print(f"{'':<14} warmup {warmup['total']:.2f}s (charts {warmup['charts']:.2f}s, "
+                      f"data {warmup['data']:.2f}s: {warmup['data_source']})")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Benchmark the list-page extraction strategies: parse time and peak allocations
+
+Usage: python benchmarks/bench_extraction.py [saved_page.html]
+
+Without an argument the saved imdb_page_debug.html (DEBUG_HTML=1 python noway.py)
+is used if present, otherwise a synthetic page built from the processed movies.
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from extraction import STRATEGIES, extract_legacy, extract_movies  # noqa: E402
+from fixtures import ROOT, load_movies, render_list_page  # noqa: E402
+
+
+def load_fixture(path=None):
+    path = path or os.path.join(ROOT, "imdb_page_debug.html")
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return path, f.read()
+    return "synthetic list page", render_list_page(load_movies())
+
+
+def measure(fn, repeat=5):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def main():
+    source, html = load_fixture(sys.argv[1] if len(sys.argv) > 1 else None)
+    print(f"Fixture: {source} ({len(html) / 1024:.0f} KiB)")
+
+    candidates = dict(STRATEGIES)
+    candidates["legacy (lxml)"] = lambda page: extract_legacy(page, parser="lxml")
+    candidates["engine"] = lambda page: extract_movies(page)[1]
+
+    print(f"{'strategy':<16} {'movies':>7} {'ms':>9} {'peak KiB':>10}")
+    for name, extract in candidates.items():
+        try:
+            elapsed, peak, movies = measure(lambda: extract(html))
+        except Exception as e:
+            print(f"{name:<16} failed: {e}")
+            continue
+        print(f"{name:<16} {len(movies):>7} {elapsed * 1e3:>9.2f} {peak / 1024:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Micro-benchmark: row-by-row genre handling in app.py vs the vectorized GenreIndex
+
+Usage: python benchmarks/bench_genre_index.py [--sizes 100 10000 1000000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from genre_index import GenreIndex  # noqa: E402
+
+GENRES = [
+    "Action", "Adventure", "Animation", "Biography", "Comedy", "Crime", "Drama",
+    "Family", "Fantasy", "History", "Horror", "Music", "Mystery", "Romance",
+    "Sci-Fi", "Sport", "Thriller", "War", "Western",
+]
+SELECTED = ["Comedy", "Horror"]
+MIN_RATING = 6.0
+
+
+def synthetic_movies(n, seed=0):
+    rng = random.Random(seed)
+    return pd.DataFrame({
+        "imdb_rating": np.round(np.random.default_rng(seed).uniform(1.0, 9.5, n), 1),
+        "genres": [rng.sample(GENRES, rng.randint(0, 3)) for _ in range(n)],
+    })
+
+
+def legacy_path(df):
+    """The per-row code path app.py used before the genre index"""
+    all_genres = set()
+    for genres in df['genres']:
+        if genres:
+            all_genres.update(genres)
+    filtered_df = df[df['imdb_rating'] >= MIN_RATING]
+    filtered_df = filtered_df[filtered_df['genres'].apply(
+        lambda x: any(genre in x for genre in SELECTED) if x else False
+    )]
+    genre_counts = {}
+    for genres in filtered_df['genres']:
+        if genres:
+            for genre in genres:
+                genre_counts[genre] = genre_counts.get(genre, 0) + 1
+    return sorted(all_genres), len(filtered_df), genre_counts
+
+
+def index_query(df, index):
+    mask = df['imdb_rating'].to_numpy() >= MIN_RATING
+    mask &= index.any_of(SELECTED)
+    return index.genres, int(mask.sum()), index.counts(mask)
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'legacy ms':>12} {'build ms':>10} {'query ms':>10} {'speedup':>9}")
+    for n in args.sizes:
+        df = synthetic_movies(n)
+        legacy_time, legacy = best_of(lambda: legacy_path(df), args.repeat)
+        build_time, index = best_of(lambda: GenreIndex.build(df['genres']), args.repeat)
+        query_time, fast = best_of(lambda: index_query(df, index), args.repeat)
+        assert legacy == fast, "genre index disagrees with the legacy code path"
+        print(f"{n:>10} {legacy_time * 1e3:>12.2f} {build_time * 1e3:>10.2f} "
+              f"{query_time * 1e3:>10.2f} {legacy_time / query_time:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
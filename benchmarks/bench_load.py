@@ -0,0 +1,233 @@
+"""Concurrent-session load test for the dashboard
+
+Launches the dashboard the way the Modal container does (serve.py by default)
+against a local PostgREST stub loaded with synthetic movies, then drives N
+simulated browser sessions at once over the Streamlit websocket. Each session
+loads the page, then keeps moving the rating slider and changing the genre
+selection at random, one rerun after another, for --duration seconds.
+
+Reported per concurrency level:
+  p50/p95/p99_ms   rerun latency, request until script_finished
+  reruns_per_s     completed reruns across all sessions (throughput)
+  cpu_percent      server CPU over the level (100 = one core), and per session
+  rss_mb           server RSS at the end of the level, and the growth per session
+                   over the idle server
+
+The saturation point is the last level whose throughput is at least
+--saturation-gain above the best of the levels before it; past it, more
+sessions only add latency. If that is the highest level tested, throughput
+was still scaling and the report says it did not saturate. Server CPU and RSS
+are read from /proc (Linux).
+
+Usage: python benchmarks/bench_load.py [--sessions 1 2 4 8 16 32] [--duration 20] [--movies 10000]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import requests
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+from bench_cold_start import COMMANDS, free_port, prepare_data  # noqa: E402
+from fixtures import ROOT, synthetic_movies  # noqa: E402
+from streamlit_client import StreamlitSession  # noqa: E402
+from stubs import STUB_SUPABASE_KEY, PostgrestStub  # noqa: E402
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def cpu_seconds(pid):
+    """User + system CPU time of a process, or None where /proc is unavailable"""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    except OSError:
+        return None
+
+
+def rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def start_server(command, env, timeout):
+    port = free_port()
+    process = subprocess.Popen(
+        command(port), cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline and process.poll() is None:
+        try:
+            if requests.get(f"{base}/_stcore/health", timeout=1).status_code == 200:
+                return process, base
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.05)
+    process.kill()
+    raise RuntimeError(f"{command(port)} did not become ready")
+
+
+def widget_state(session, label, **value):
+    """WidgetState for the widget the session saw under label; value is e.g. double_array_value=[7.0]"""
+    kind, widget = session.widgets[label]
+    state = WidgetState(id=widget.id)
+    for field, data in value.items():
+        getattr(state, field).data.extend(data)
+    return state
+
+
+def random_filters(session, rng, max_genres):
+    """A slider move and a new genre selection, as the widget states of one rerun"""
+    genres = list(session.widgets["Genres"][1].options)
+    rating = round(rng.uniform(0.0, 9.0), 1)
+    selected = rng.sample(genres, rng.randint(0, min(max_genres, len(genres))))
+    return [
+        widget_state(session, "Minimum Rating", double_array_value=[rating]),
+        widget_state(session, "Genres", string_array_value=selected),
+    ]
+
+
+def run_session(base, seed, stop, args, runs, errors):
+    rng = random.Random(seed)
+    try:
+        with StreamlitSession(base, timeout=args.timeout) as session:
+            session.rerun()  # page load; it finds the widget ids and is not timed
+            while not stop.is_set():
+                run = session.rerun(random_filters(session, rng, args.max_genres))
+                if run["status"] == "FINISHED_SUCCESSFULLY":
+                    runs.append((time.perf_counter(), run["finished_s"]))
+                else:
+                    errors.append(run["status"])
+                if args.think_time:
+                    stop.wait(rng.expovariate(1 / args.think_time))
+    except Exception as e:
+        errors.append(repr(e))
+
+
+def run_level(base, pid, sessions, args, idle_rss):
+    stop = threading.Event()
+    runs, errors = [], []
+    threads = [
+        threading.Thread(target=run_session, args=(base, sessions * 1000 + i, stop, args, runs, errors),
+                         daemon=True)
+        for i in range(sessions)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.ramp_up)  # every session loads the page before the window opens
+    cpu_start, start = cpu_seconds(pid), time.perf_counter()
+    time.sleep(args.duration)
+    end, cpu_end, rss = time.perf_counter(), cpu_seconds(pid), rss_mb(pid)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=args.timeout)
+
+    # Only reruns that finished inside the measured window count
+    latencies = [latency for finished, latency in runs if start <= finished <= end]
+    result = {
+        "sessions": sessions,
+        "reruns": len(latencies),
+        "errors": len(errors),
+        "reruns_per_s": round(len(latencies) / (end - start), 2),
+    }
+    if latencies:
+        p50, p95, p99 = np.percentile(np.array(latencies) * 1e3, [50, 95, 99])
+        result.update(p50_ms=round(p50, 1), p95_ms=round(p95, 1), p99_ms=round(p99, 1))
+    if cpu_start is not None and cpu_end is not None:
+        cpu = (cpu_end - cpu_start) / (end - start) * 100
+        result.update(cpu_percent=round(cpu, 1), cpu_percent_per_session=round(cpu / sessions, 1))
+    if rss is not None and idle_rss is not None:
+        result.update(rss_mb=round(rss, 1), rss_mb_per_session=round((rss - idle_rss) / sessions, 2))
+    return result
+
+
+def saturation_point(levels, gain):
+    """The last level that still raised throughput by gain over every level before it"""
+    best = None
+    for level in levels:
+        if best is None or level["reruns_per_s"] >= best["reruns_per_s"] * (1 + gain):
+            best = level
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds per level")
+    parser.add_argument("--ramp-up", type=float, default=3, help="seconds for the sessions to load the page")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean seconds between a session's reruns")
+    parser.add_argument("--max-genres", type=int, default=2, help="most genres a session selects at once")
+    parser.add_argument("--movies", type=int, default=10_000)
+    parser.add_argument("--mode", default="snapshot", choices=["snapshot", "cache", "query"])
+    parser.add_argument("--command", default="serve.py", choices=sorted(COMMANDS))
+    parser.add_argument("--saturation-gain", type=float, default=0.1,
+                        help="throughput gain a level needs over the levels before it to count as scaling")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--output", help="also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="cage-load-")
+    with PostgrestStub() as db:
+        snapshot_path = prepare_data(db, synthetic_movies(args.movies), workdir)
+        env = dict(os.environ, MOVIE_DATA_MODE=args.mode, MOVIE_SNAPSHOT=snapshot_path,
+                   SUPABASE_URL=db.url, SUPABASE_KEY=STUB_SUPABASE_KEY, PYTHONUNBUFFERED="1")
+        process, base = start_server(COMMANDS[args.command], env, args.timeout)
+        try:
+            idle_rss = rss_mb(process.pid)
+            report = {"movies": args.movies, "mode": args.mode, "command": args.command,
+                      "cpus": os.cpu_count(), "idle_rss_mb": idle_rss, "settings": vars(args), "levels": []}
+            print(f"{args.command} ({args.mode} mode, {args.movies} movies) at {base}, "
+                  f"idle RSS {idle_rss or 0:.0f} MB, {os.cpu_count()} CPUs")
+            for sessions in args.sessions:
+                level = run_level(base, process.pid, sessions, args, idle_rss)
+                report["levels"].append(level)
+                print(f"   {sessions:>4} sessions  {level['reruns_per_s']:>7.2f} reruns/s  "
+                      f"p50 {level.get('p50_ms', 0):>8.1f}ms  p95 {level.get('p95_ms', 0):>8.1f}ms  "
+                      f"p99 {level.get('p99_ms', 0):>8.1f}ms  CPU {level.get('cpu_percent', 0):>5.0f}% "
+                      f"({level.get('cpu_percent_per_session', 0):.0f}%/session)  "
+                      f"RSS {level.get('rss_mb', 0):>6.0f} MB (+{level.get('rss_mb_per_session', 0):.1f}/session)"
+                      + (f"  {level['errors']} errors" if level["errors"] else ""))
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    saturated = saturation_point(report["levels"], args.saturation_gain)
+    if saturated is report["levels"][-1]:
+        # Still scaling at the highest level, so the real saturation point lies beyond it
+        report["saturation"] = None
+        print(f"Throughput not saturated within the tested levels "
+              f"({saturated['reruns_per_s']:.2f} reruns/s at {saturated['sessions']} sessions)")
+    elif saturated:
+        report["saturation"] = {"sessions": saturated["sessions"], "reruns_per_s": saturated["reruns_per_s"]}
+        print(f"Throughput saturates at {saturated['sessions']} sessions "
+              f"({saturated['reruns_per_s']:.2f} reruns/s)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Title search latency: trigram index vs a str.contains scan, per keystroke
+
+Titles are synthetic (the real catalog cycled with numeric suffixes, as in the
+other benchmarks). Each sampled title is typed one keystroke at a time, in
+lowercase with the punctuation dropped, and every prefix is a timed search.
+A typo is put into some of the queries. Searches run alone and combined with
+a rating and genre mask, the same way app.py runs them.
+
+The str.contains baseline only finds exact substrings. Its hit rate is
+reported next to the index's so the two can be compared on more than speed.
+
+Usage: python benchmarks/bench_search.py [--titles 100000] [--queries 200]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+from fixtures import percentiles, synthetic_movies  # noqa: E402
+from genre_index import GenreIndex  # noqa: E402
+from title_index import TitleIndex  # noqa: E402
+
+
+def typed(title, rng, typo_rate):
+    """The keystrokes for a title: lowercase, punctuation dropped, maybe one letter missing"""
+    text = "".join(ch for ch in title.lower() if ch.isalnum() or ch == " ")
+    if len(text) > 6 and rng.random() < typo_rate:
+        drop = rng.randrange(3, len(text) - 1)
+        text = text[:drop] + text[drop + 1:]
+    return [text[:i] for i in range(1, len(text) + 1)]
+
+
+def run(df, genre_index, title_index, keystrokes, masked):
+    ratings = df["imdb_rating"].to_numpy(dtype=float, na_value=np.nan)
+    mask = None
+    if masked:
+        mask = ratings >= 5.0
+        mask &= genre_index.any_of(["Action", "Drama"])
+    results = {}
+    for name, search in (
+        ("index", lambda query: title_index.search(query, mask)),
+        ("contains", lambda query: np.flatnonzero(
+            df["title"].str.contains(query, case=False, regex=False).to_numpy()
+            & (True if mask is None else mask))[:20]),
+    ):
+        latencies = []
+        found = reachable = 0
+        for target, queries in keystrokes:
+            for query in queries:
+                start = time.perf_counter()
+                rows = search(query)
+                latencies.append(time.perf_counter() - start)
+            # Found = the fully typed query lists the title, among titles the mask keeps
+            if mask is None or mask[target]:
+                reachable += 1
+                found += target in set(rows.tolist())
+        results[name] = dict(percentiles(latencies), keystrokes=len(latencies),
+                             found_rate=round(found / max(reachable, 1), 3))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--titles", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200, help="titles typed out per run")
+    parser.add_argument("--typo-rate", type=float, default=0.3)
+    parser.add_argument("--output", help="also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    df = pd.DataFrame(synthetic_movies(args.titles))[["title", "imdb_rating", "genres"]]
+    genre_index = GenreIndex.build(df["genres"])
+    start = time.perf_counter()
+    title_index = TitleIndex.build(df["title"])
+    build_s = time.perf_counter() - start
+
+    rng = random.Random(0)
+    targets = rng.sample(range(len(df)), min(args.queries, len(df)))
+    # Only the first copy of a cycled title is reachable in a top 20, so target those
+    first = {}
+    for row, title in enumerate(df["title"]):
+        first.setdefault(title.rsplit(" ", 1)[0] if title[-1].isdigit() else title, row)
+    keystrokes = []
+    for row in targets:
+        title = df["title"].iat[row]
+        base = title.rsplit(" ", 1)[0] if title[-1].isdigit() else title
+        keystrokes.append((first[base], typed(base, rng, args.typo_rate)))
+
+    report = {"titles": len(df), "build_s": round(build_s, 3), "postings": int(len(title_index._rows)),
+              "unfiltered": run(df, genre_index, title_index, keystrokes, masked=False),
+              "filtered": run(df, genre_index, title_index, keystrokes, masked=True)}
+
+    print(f"Index over {report['titles']} titles built in {report['build_s']:.2f}s "
+          f"({report['postings']} postings)")
+    for scope in ("unfiltered", "filtered"):
+        for name, result in report[scope].items():
+            print(f"   {scope:<10} {name:<8} p50 {result['p50_ms']:>8.3f}ms  p95 {result['p95_ms']:>8.3f}ms  "
+                  f"p99 {result['p99_ms']:>8.3f}ms  found {result['found_rate']:.0%}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Similar-movie precompute and lookup timings for the Cage Match neighbors
+
+For each catalog size: the time to build the feature vectors, the blocked
+all-pairs top-k pass that snapshot.py runs when it writes the snapshot, the
+size of one block of scores (the pass's working memory per worker), and the
+latency of a neighbor lookup against the memory-mapped snapshot.
+
+Usage: python benchmarks/bench_similarity.py [--scales 1000 10000 100000] [--k 10]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+from fixtures import synthetic_movies  # noqa: E402
+import similarity  # noqa: E402
+import snapshot  # noqa: E402
+
+
+def bench(n, args, workdir):
+    table = snapshot.build_table(synthetic_movies(n), neighbors_k=0)
+    start = time.perf_counter()
+    features = snapshot.table_features(table)
+    features_s = time.perf_counter() - start
+    start = time.perf_counter()
+    indices, scores = similarity.top_k_neighbors(features, args.k, block_mb=args.block_mb)
+    neighbors_s = time.perf_counter() - start
+
+    path = os.path.join(workdir, f"movies-{n}.arrow")
+    table = (table.append_column("neighbors", snapshot.list_column(indices))
+             .append_column("neighbor_scores", snapshot.list_column(scores)))
+    mapped = snapshot.read_snapshot(snapshot.write_table(table, path))
+    rows = np.random.default_rng(0).integers(0, n, size=args.lookups)
+    latencies = []
+    for row in rows:
+        start = time.perf_counter()
+        mapped.neighbors(int(row))
+        latencies.append(time.perf_counter() - start)
+
+    block = min(similarity.block_rows(n, args.block_mb), n)
+    return {
+        "movies": n,
+        "features_s": round(features_s, 3),
+        "neighbors_s": round(neighbors_s, 3),
+        "block_rows": block,
+        "block_mb": round(block * n * 4 / 1e6, 1),
+        "lookup_p50_us": round(statistics.median(latencies) * 1e6, 1),
+        "lookup_p99_us": round(sorted(latencies)[int(0.99 * (len(latencies) - 1))] * 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--k", type=int, default=similarity.NEIGHBORS_K)
+    parser.add_argument("--block-mb", type=float, default=similarity.SIMILARITY_BLOCK_MB)
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--output", help="also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="cage-similarity-")
+    report = []
+    for n in args.scales:
+        result = bench(n, args, workdir)
+        report.append(result)
+        print(f"{n:>8} movies  features {result['features_s']:.2f}s  top-{args.k} all pairs "
+              f"{result['neighbors_s']:.2f}s  ({result['block_rows']} rows/block, {result['block_mb']} MB)  "
+              f"lookup p50 {result['lookup_p50_us']:.0f}us p99 {result['lookup_p99_us']:.0f}us")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Synthetic IMDB pages and catalogs built from the processed movie data, and shared report helpers"""
+import html
+import json
+import os
+import random
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROCESSED_FILE = os.path.join(ROOT, "nicholas_cage_processed_movies.json")
+
+
+def load_movies():
+    with open(PROCESSED_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def synthetic_movies(n, seed=0):
+    """n processed-style movies, cycling the real catalog with fresh tt ids, years and ratings"""
+    base = load_movies()
+    rng = random.Random(seed)
+    movies = []
+    for i in range(n):
+        template = base[i % len(base)]
+        suffix = f" {i // len(base) + 1}" if i >= len(base) else ""
+        movies.append({
+            "rank": i + 1,
+            "title": template["title"] + suffix,
+            "release_year": rng.randint(1980, 2024),
+            "imdb_rating": round(rng.uniform(2.0, 9.0), 1),
+            "runtime": f"{rng.randint(80, 160)} min",
+            "genres": list(template["genres"]),
+            "imdb_url": f"https://www.imdb.com/title/tt{9000000 + i:07d}/",
+        })
+    return movies
+
+
+def title_id(movie):
+    return movie["imdb_url"].rstrip("/").rsplit("/", 1)[-1]
+
+
+def _minutes(runtime):
+    return int(str(runtime).split()[0]) if runtime else None
+
+
+def render_list_page(movies, json_ld=True, markup=True, next_page=None):
+    """An IMDB-style list page: ipc list items plus an ItemList JSON-LD block"""
+    parts = ["<!DOCTYPE html><html><head><title>Nicolas Cage - IMDb list</title>"]
+    if json_ld:
+        items = []
+        for movie in movies:
+            item = {
+                "@type": "Movie",
+                "url": f"https://www.imdb.com/title/{title_id(movie)}/",
+                "name": movie["title"],
+                "genre": ", ".join(movie.get("genres") or []),
+            }
+            if movie.get("release_year"):
+                item["datePublished"] = f"{movie['release_year']}-01-01"
+            if movie.get("imdb_rating") is not None:
+                item["aggregateRating"] = {"@type": "AggregateRating", "ratingValue": movie["imdb_rating"]}
+            minutes = _minutes(movie.get("runtime"))
+            if minutes:
+                item["duration"] = f"PT{minutes // 60}H{minutes % 60}M"
+            items.append({"@type": "ListItem", "position": movie["rank"], "item": item})
+        document = {"@context": "https://schema.org", "@type": "ItemList", "itemListElement": items}
+        parts.append(f'<script type="application/ld+json">{json.dumps(document)}</script>')
+    parts.append("</head><body><div class='ipc-page-content-container'><ul class='ipc-metadata-list'>")
+    if markup:
+        for movie in movies:
+            genres = html.escape(", ".join(movie.get("genres") or []))
+            parts.append(
+                "<li class='ipc-metadata-list-summary-item'><div class='sc-item'>"
+                f"<a class='ipc-title-link-wrapper' href='/title/{title_id(movie)}/?ref_=ls_t_{movie['rank']}'>"
+                f"<h3 class='ipc-title__text'>{movie['rank']}. {html.escape(movie['title'])}</h3></a>"
+                f"<div class='dli-title-metadata'><span>({movie.get('release_year') or ''})</span>"
+                f"<span>{movie.get('runtime') or ''}</span></div>"
+                f"<span class='ipc-rating-star--rating'>{movie.get('imdb_rating') or ''}</span>"
+                f"<span class='genre'>{genres}</span>"
+                "<div class='ipc-html-content-inner-div'>A film starring Nicolas Cage.</div>"
+                "</div></li>"
+            )
+    parts.append("</ul>")
+    if next_page:
+        parts.append(f"<a class='flat-button lister-page-next next-page' href='{next_page}'>Next</a>")
+    parts.append("</div></body></html>")
+    return "".join(parts)
+
+
+def render_title_page(movie):
+    """An IMDB-style title page whose JSON-LD carries year, runtime and genres"""
+    document = {
+        "@context": "https://schema.org",
+        "@type": "Movie",
+        "url": f"https://www.imdb.com/title/{title_id(movie)}/",
+        "name": movie["title"],
+        "genre": movie.get("genres") or [],
+    }
+    if movie.get("release_year"):
+        document["datePublished"] = f"{movie['release_year']}-01-01"
+    minutes = _minutes(movie.get("runtime"))
+    if minutes:
+        document["duration"] = f"PT{minutes // 60}H{minutes % 60}M"
+    return (
+        "<!DOCTYPE html><html><head>"
+        f"<title>{html.escape(movie['title'])} - IMDb</title>"
+        f'<script type="application/ld+json">{json.dumps(document)}</script>'
+        f"</head><body><h1>{html.escape(movie['title'])}</h1></body></html>"
+    )
+
+
+def percentiles(latencies):
+    """p50/p95/p99 and mean of latencies in seconds, as milliseconds"""
+    ordered = sorted(latencies)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99),
+            "mean_ms": round(statistics.fmean(ordered) * 1000, 3)}
@@ -0,0 +1,305 @@
+"""End-to-end offline benchmark: scrape -> enrich -> normalize -> load -> dashboard queries
+
+Everything runs against the local stubs in stubs.py, so no network, API keys or
+Supabase project are needed. Results are written as JSON for comparing runs.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--scales 100 10000 100000] [--llm-latency 0.05]
+                                        [--compare benchmarks/results/previous.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+from fixtures import ROOT, synthetic_movies  # noqa: E402
+from stubs import STUB_SUPABASE_KEY, ImdbStub, LLMStub, PostgrestStub  # noqa: E402
+
+RESULTS_DIR = os.path.join(HERE, "results")
+
+
+@contextlib.contextmanager
+def quiet():
+    """Swallow the pipeline's progress output while a stage is being timed"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def timed(fn, latencies):
+    """Wrap fn so every call appends its latency to latencies"""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+    return wrapper
+
+
+def summarize(rows, seconds, latencies):
+    result = {
+        "rows": rows,
+        "seconds": round(seconds, 4),
+        "rows_per_second": round(rows / seconds, 1) if seconds else None,
+        "operations": len(latencies),
+    }
+    if latencies:
+        p50, p95, p99 = np.percentile(np.array(latencies) * 1e3, [50, 95, 99])
+        result.update(p50_ms=round(p50, 3), p95_ms=round(p95, 3), p99_ms=round(p99, 3))
+    return result
+
+
+def run_stage(name, fn):
+    """fn() -> (rows, latencies); returns the summary and prints one line"""
+    start = time.perf_counter()
+    with quiet():
+        rows, latencies = fn()
+    result = summarize(rows, time.perf_counter() - start, latencies)
+    percentiles = "  ".join(
+        f"{p} {result[p + '_ms']:>8.2f}ms" for p in ("p50", "p95", "p99") if p + "_ms" in result
+    )
+    print(f"   {name:<20} {result['rows']:>8} rows {result['seconds']:>9.3f}s "
+          f"{result['rows_per_second'] or 0:>11.0f} rows/s  {percentiles}")
+    return result
+
+
+def bench_scale(n, args, workdir):
+    import aggregates
+    import enrich
+    import loader
+    import movie_data
+    with quiet():
+        import noway
+    from genre_index import GenreIndex
+    from normalize import split_by_confidence
+    from supabase import create_client
+
+    movies = synthetic_movies(n)
+    results = {}
+    with ImdbStub(movies) as imdb, PostgrestStub(latency=args.db_latency) as db:
+        raw_movies = []
+
+        def scrape():
+            latencies = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                raw_movies[:] = noway.scrape_nicholas_cage_movies(imdb.list_url)
+                latencies.append(time.perf_counter() - start)
+            return len(raw_movies) * args.repeat, latencies
+        results["scrape"] = run_stage("scrape", scrape)
+
+        sample = movies[:min(n, args.enrich_sample)]
+
+        passes = []
+
+        def enrich_stage():
+            latencies = []
+            fetcher = enrich.DetailFetcher(
+                cache=enrich.ResponseCache(os.path.join(workdir, f"imdb-{n}")),
+                limiter=enrich.HostRateLimiter(1e9),
+            )
+            fetcher.fetch = timed(fetcher.fetch, latencies)
+            rows = [dict(movie, release_year=None, runtime=None) for movie in sample]
+            enrich.enrich_movies(rows, fetcher, base_url=imdb.url)
+            passes.append((rows, dict(fetcher.stats)))
+            return len(rows), latencies
+        results["enrich"] = run_stage("enrich", enrich_stage)
+        results["enrich_revalidate"] = run_stage("enrich (304s)", enrich_stage)
+        # The second pass must be all 304s answered from the cached bodies
+        (first_rows, _), (second_rows, second_stats) = passes
+        if second_stats["not_modified"] != len(sample) or second_stats["downloaded"] or first_rows != second_rows:
+            raise RuntimeError(f"enrich revalidation did not reuse the cached pages: {second_stats}")
+
+        def normalize_local():
+            start = time.perf_counter()
+            resolved, _ = split_by_confidence(raw_movies)
+            return len(resolved), [time.perf_counter() - start]
+        results["normalize_local"] = run_stage("normalize local", normalize_local)
+
+        def normalize_llm():
+            latencies = []
+            original = noway.request_batch
+            noway.request_batch = timed(original, latencies)
+            noway.llm_cache.clear()
+            try:
+                rows = raw_movies[:min(len(raw_movies), args.llm_sample)]
+                processed = noway.process_movies_with_llm(rows, local_fast_path=False)
+            finally:
+                noway.request_batch = original
+            return len(processed or []), latencies
+        stats_before = dict(noway.batch_stats)
+        results["normalize_llm"] = run_stage("normalize LLM", normalize_llm)
+        calls = noway.batch_stats["calls"] - stats_before["calls"]
+        if calls:
+            results["normalize_llm"].update(
+                rows_per_call=round((noway.batch_stats["rows"] - stats_before["rows"]) / calls, 2),
+                truncation_rate=round((noway.batch_stats["truncated"] - stats_before["truncated"]) / calls, 4),
+                splits=noway.batch_stats["splits"] - stats_before["splits"],
+            )
+
+        source = os.path.join(workdir, f"movies-{n}.json")
+        with open(source, "w", encoding="utf-8") as f:
+            json.dump(movies, f)
+        client = create_client(db.url, STUB_SUPABASE_KEY)
+
+        def load(label):
+            def stage():
+                latencies = []
+                original = loader._upsert
+                loader._upsert = timed(original, latencies)
+                try:
+                    loader.sync_records(client, loader.iter_prepared_records(source, label))
+                finally:
+                    loader._upsert = original
+                return n, latencies
+            return stage
+        results["load"] = run_stage("load", load("initial"))
+        results["load_resync"] = run_stage("load (no-op)", load("resync"))
+
+        rng = random.Random(0)
+        vocabulary = sorted({genre for movie in movies for genre in movie["genres"]})
+        filters = [
+            (round(rng.choice([0.0, 5.0, 6.5, 7.5]), 1), rng.sample(vocabulary, rng.randint(0, 2)))
+            for _ in range(args.queries)
+        ]
+
+        def app_cache_mode():
+            cache = movie_data.MovieCache(ttl=0)
+            df, version = cache.get(client)
+            index = GenreIndex.build(df["genres"])
+            ratings = df["imdb_rating"].to_numpy(dtype=float)
+            latencies = []
+            for min_rating, genres in filters:
+                start = time.perf_counter()
+                mask = ratings >= min_rating
+                if genres:
+                    mask &= index.any_of(genres)
+                df[mask].nlargest(106, "imdb_rating")
+                index.counts(mask)
+                latencies.append(time.perf_counter() - start)
+            return len(df), latencies
+        results["app_cache_mode"] = run_stage("app cache mode", app_cache_mode)
+
+        def app_aggregates_mode():
+            # Charts from the precomputed aggregates; overlapping genre selections use the rows path
+            cache = movie_data.MovieCache(ttl=0)
+            df, version = cache.get(client)
+            with quiet():
+                loader.write_aggregates(client, df.to_dict("records"), version)
+            chart_aggregates = aggregates.ChartAggregates(movie_data.fetch_aggregates(client))
+            index = GenreIndex.build(df["genres"])
+            ratings = df["imdb_rating"].to_numpy(dtype=float)
+            latencies = []
+            for min_rating, genres in filters:
+                start = time.perf_counter()
+                if chart_aggregates.chart_data(min_rating, genres) is None:
+                    mask = ratings >= min_rating
+                    mask &= index.any_of(genres)
+                    aggregates.chart_data_from_rows(df[mask], index.counts(mask))
+                latencies.append(time.perf_counter() - start)
+            return len(df), latencies
+        results["app_aggregates_mode"] = run_stage("app aggregates mode", app_aggregates_mode)
+
+        def app_query_mode():
+            latencies = []
+            rows = 0
+            for min_rating, genres in filters:
+                start = time.perf_counter()
+                rows += len(movie_data.fetch_movies(
+                    client, min_rating, genres, columns=movie_data.DASHBOARD_COLUMNS
+                ))
+                latencies.append(time.perf_counter() - start)
+            return rows, latencies
+        results["app_query_mode"] = run_stage("app query mode", app_query_mode)
+
+        results["http"] = {
+            "imdb": {"requests": imdb.requests, "bytes": imdb.bytes_sent},
+            "postgrest": {"requests": db.requests, "bytes": db.bytes_sent},
+        }
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, previous_path):
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    print(f"\nCompared with {previous_path} ({previous.get('git_commit')}):")
+    for scale, stages in current["scales"].items():
+        for stage, result in stages.items():
+            before = previous.get("scales", {}).get(scale, {}).get(stage, {})
+            if "p50_ms" in result and before.get("p50_ms"):
+                change = result["p50_ms"] / before["p50_ms"]
+                print(f"   {scale:>8} {stage:<20} p50 {before['p50_ms']:>9.2f} -> {result['p50_ms']:>9.2f}ms "
+                      f"({change:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[100, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3, help="scrape repetitions per scale")
+    parser.add_argument("--queries", type=int, default=20, help="dashboard filter combinations")
+    parser.add_argument("--enrich-sample", type=int, default=500, help="title pages fetched per scale")
+    parser.add_argument("--llm-sample", type=int, default=300, help="rows sent to the LLM stub per scale")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per LLM call")
+    parser.add_argument("--llm-tokens-per-row", type=int, default=60)
+    parser.add_argument("--db-latency", type=float, default=0.0, help="seconds per PostgREST request")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/bench-<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="cage-bench-")
+    with LLMStub(latency=args.llm_latency, completion_tokens_per_row=args.llm_tokens_per_row) as llm:
+        # noway reads these at import time
+        os.environ.update({
+            "LLM_ENDPOINT": llm.base_url,
+            "LLM_API_KEY": "stub",
+            "LLM_CACHE_PATH": os.path.join(workdir, "llm-cache.sqlite3"),
+            "LLM_REQUESTS_PER_MINUTE": "1000000",
+            "LLM_TOKENS_PER_MINUTE": "1000000000",
+            "RESPONSE_CACHE_DIR": os.path.join(workdir, "imdb"),
+        })
+        report = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": vars(args),
+            "scales": {},
+        }
+        for n in args.scales:
+            print(f"Scale {n} movies:")
+            report["scales"][str(n)] = bench_scale(n, args, workdir)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
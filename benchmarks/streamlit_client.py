@@ -0,0 +1,72 @@
+"""Minimal headless Streamlit client: one browser session over the /_stcore/stream websocket
+
+Speaks the same protobuf messages the frontend does (BackMsg out, ForwardMsg in),
+so a script run can be timed from the request to its first delta ("first paint")
+and to script_finished, without a browser.
+"""
+import time
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from websockets.sync.client import connect
+
+
+class StreamlitSession:
+    def __init__(self, base_url, timeout=60):
+        self.url = base_url.replace("http://", "ws://").replace("https://", "wss://").rstrip("/") + "/_stcore/stream"
+        self.timeout = timeout
+        self.websocket = None
+        self.widgets = {}
+
+    def __enter__(self):
+        self.websocket = connect(self.url, subprotocols=["streamlit"], max_size=None,
+                                 open_timeout=self.timeout)
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        if self.websocket is not None:
+            self.websocket.close()
+            self.websocket = None
+
+    def rerun(self, widget_states=None):
+        """Run the script once; returns timings and counts for that run
+
+        widget_states is a list of WidgetState protos (see self.widgets for the
+        ids of widgets seen in earlier runs).
+        """
+        message = BackMsg()
+        message.rerun_script.query_string = ""
+        for state in widget_states or []:
+            message.rerun_script.widget_states.widgets.append(state)
+        start = time.perf_counter()
+        self.websocket.send(message.SerializeToString())
+
+        result = {"first_delta_s": None, "finished_s": None, "deltas": 0, "bytes": 0, "status": None}
+        while True:
+            payload = self.websocket.recv(timeout=self.timeout)
+            forward = ForwardMsg()
+            forward.ParseFromString(payload)
+            result["bytes"] += len(payload)
+            kind = forward.WhichOneof("type")
+            if kind == "delta":
+                result["deltas"] += 1
+                if result["first_delta_s"] is None:
+                    result["first_delta_s"] = time.perf_counter() - start
+                self._remember_widget(forward.delta)
+            elif kind == "script_finished":
+                result["finished_s"] = time.perf_counter() - start
+                result["status"] = ForwardMsg.ScriptFinishedStatus.Name(forward.script_finished)
+                return result
+
+    def _remember_widget(self, delta):
+        if delta.WhichOneof("type") != "new_element":
+            return
+        element = delta.new_element
+        kind = element.WhichOneof("type")
+        widget = getattr(element, kind, None)
+        if widget is not None and hasattr(widget, "id") and hasattr(widget, "label") and widget.id:
+            self.widgets[widget.label] = (kind, widget)
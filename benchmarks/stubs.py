@@ -0,0 +1,457 @@
+"""Local stand-ins for IMDB, the OpenAI API and Supabase/PostgREST
+
+Each stub is a ThreadingHTTPServer started on 127.0.0.1 with a free port:
+
+    with ImdbStub(movies) as imdb, LLMStub(latency=0.05) as llm, PostgrestStub() as db:
+        scrape_nicholas_cage_movies(imdb.list_url)
+        OpenAI(base_url=llm.base_url, api_key="stub")
+        create_client(db.url, STUB_SUPABASE_KEY)
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from fixtures import render_list_page, render_title_page, title_id
+
+# Any JWT-shaped string passes supabase-py's key check
+STUB_SUPABASE_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.c3R1Yg"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; without this, Nagle plus delayed
+    # ACKs add ~40ms to every keep-alive response and swamp what is being measured
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, status, body=b"", content_type="application/json", headers=None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+        self.server.stub.record(len(body))
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"null")
+
+
+class StubServer:
+    handler = _Handler
+
+    def __init__(self):
+        self.requests = 0
+        self.bytes_sent = 0
+        self._stats_lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, size):
+        with self._stats_lock:
+            self.requests += 1
+            self.bytes_sent += size
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# ---------------------------------------------------------------- IMDB
+
+
+class _ImdbHandler(_Handler):
+    def do_GET(self):
+        stub = self.server.stub
+        parts = urlsplit(self.path)
+        query = dict(parse_qsl(parts.query))
+        if parts.path.startswith("/list/"):
+            page = int(query.get("page", 1))
+            body = stub.list_page(page, parts.path.split("/")[2])
+            if body is None:
+                return self.send_body(404, "not found", "text/plain")
+            return self.send_body(200, body, "text/html; charset=utf-8")
+        match = re.match(r"^/title/(tt\d+)/?$", parts.path)
+        movie = stub.titles.get(match.group(1)) if match else None
+        if movie is None:
+            return self.send_body(404, "not found", "text/plain")
+        body = render_title_page(movie)
+        etag = '"%s"' % hashlib.sha1(body.encode("utf-8")).hexdigest()[:16]
+        if self.headers.get("If-None-Match") == etag:
+            return self.send_body(304, headers={"ETag": etag})
+        self.send_body(200, body, "text/html; charset=utf-8", {"ETag": etag})
+
+
+class ImdbStub(StubServer):
+    """Replays IMDB-style list pages (paginated) and title pages for a movie catalog
+
+    lists maps more list ids to their movies (the same title may be in several);
+    every list is served under /list/<id>/ and all their titles under /title/.
+    """
+
+    handler = _ImdbHandler
+
+    def __init__(self, movies, page_size=None, list_id="ls086744766", lists=None):
+        super().__init__()
+        self.movies = movies
+        self.page_size = page_size or max(1, len(movies))
+        self.list_id = list_id
+        self.lists = dict(lists or {}, **{list_id: movies})
+        self.titles = {title_id(movie): movie for items in self.lists.values() for movie in items}
+        self._pages = {}
+
+    @property
+    def list_url(self):
+        return f"{self.url}/list/{self.list_id}/"
+
+    def list_page(self, page, list_id=None):
+        list_id = list_id or self.list_id
+        movies = self.lists.get(list_id)
+        if movies is None:
+            return None
+        if (list_id, page) not in self._pages:
+            start = (page - 1) * self.page_size
+            chunk = movies[start:start + self.page_size]
+            if not chunk:
+                return None
+            has_next = start + self.page_size < len(movies)
+            next_page = f"/list/{list_id}/?page={page + 1}" if has_next else None
+            self._pages[list_id, page] = render_list_page(chunk, next_page=next_page)
+        return self._pages[list_id, page]
+
+
+# ---------------------------------------------------------------- LLM
+
+
+class _LLMHandler(_Handler):
+    def do_POST(self):
+        stub = self.server.stub
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self.send_body(404, json.dumps({"error": {"message": "not found"}}))
+        request = self.read_json()
+        prompt = "\n".join(message.get("content", "") for message in request.get("messages", []))
+        movies = stub.parse_movies(prompt)
+        content = json.dumps(stub.normalize(movies))
+        completion_tokens = stub.completion_tokens_per_row * len(movies)
+        finish_reason = "stop"
+        max_tokens = request.get("max_tokens")
+        if max_tokens and completion_tokens > max_tokens:
+            # Cut the answer off mid-JSON the way a real model does at its token limit
+            content = content[:len(content) * max_tokens // completion_tokens]
+            completion_tokens, finish_reason = max_tokens, "length"
+        time.sleep(stub.latency + stub.seconds_per_token * completion_tokens)
+        response = {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": finish_reason,
+            }],
+            "usage": {
+                "prompt_tokens": len(prompt) // 4,
+                "completion_tokens": completion_tokens,
+                "total_tokens": len(prompt) // 4 + completion_tokens,
+            },
+        }
+        self.send_body(200, json.dumps(response))
+
+
+class LLMStub(StubServer):
+    """OpenAI-compatible /chat/completions that answers the batch prompt deterministically"""
+
+    handler = _LLMHandler
+    _FIELDS = {"Rank": "raw_rank", "Title": "raw_title", "Year": "raw_year", "Rating": "raw_rating",
+               "Runtime": "raw_runtime", "Genre": "raw_genre", "URL": "raw_url"}
+
+    def __init__(self, latency=0.05, seconds_per_token=0.0, completion_tokens_per_row=60):
+        super().__init__()
+        self.latency = latency
+        self.seconds_per_token = seconds_per_token
+        self.completion_tokens_per_row = completion_tokens_per_row
+
+    @property
+    def base_url(self):
+        return f"{self.url}/v1"
+
+    def parse_movies(self, prompt):
+        movies = []
+        current = {}
+        for line in prompt.splitlines():
+            line = line.strip()
+            if line == "---":
+                if current:
+                    movies.append(current)
+                current = {}
+                continue
+            key, _, value = line.partition(": ")
+            if key in self._FIELDS and value:
+                current[self._FIELDS[key]] = value
+        return movies
+
+    def normalize(self, movies):
+        from normalize import normalize_movie
+        records = []
+        for movie in movies:
+            movie["raw_rank"] = int(movie.get("raw_rank", 0))
+            record, _ = normalize_movie(movie)
+            records.append(record)
+        return records
+
+
+# ---------------------------------------------------------------- PostgREST
+
+
+def _split_top_level(text):
+    parts, depth, current = [], 0, ""
+    for char in text:
+        if char == "," and depth == 0:
+            parts.append(current)
+            current = ""
+            continue
+        depth += char == "("
+        depth -= char == ")"
+        current += char
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _coerce(value, like):
+    if isinstance(like, bool):
+        return value == "true"
+    if isinstance(like, (int, float)):
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    return value
+
+
+def _list_literal(text, open_char, close_char):
+    inner = text.strip()[1:-1] if text.strip().startswith(open_char) else text
+    return [item.strip().strip('"') for item in _split_top_level(inner) if item.strip()]
+
+
+def _condition(column, expression):
+    """PostgREST 'op.value' (optionally 'not.op.value') as a row predicate"""
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    op, _, value = expression.partition(".")
+
+    def test(row):
+        current = row.get(column)
+        if op == "is":
+            result = current is None if value == "null" else current == (value == "true")
+        elif op == "in":
+            result = current is not None and str(current) in _list_literal(value, "(", ")")
+        elif op == "ov":
+            result = bool(set(current or []) & set(_list_literal(value, "{", "}")))
+        elif op == "cs":
+            result = set(_list_literal(value, "{", "}")) <= set(current or [])
+        elif current is None:
+            result = False
+        else:
+            target = _coerce(value, current)
+            try:
+                result = {
+                    "eq": current == target, "neq": current != target,
+                    "gt": current > target, "gte": current >= target,
+                    "lt": current < target, "lte": current <= target,
+                }[op]
+            except TypeError:
+                result = False
+        return not result if negate else result
+
+    return test
+
+
+def _logic(kind, text):
+    """or=(a.gt.1,and(b.eq.2,c.lt.3)) style expressions"""
+    tests = []
+    for part in _split_top_level(text.strip()[1:-1]):
+        part = part.strip()
+        if part.startswith(("and(", "or(")):
+            inner_kind, _, rest = part.partition("(")
+            tests.append(_logic(inner_kind, "(" + rest))
+        else:
+            column, _, expression = part.partition(".")
+            tests.append(_condition(column, expression))
+    combine = all if kind == "and" else any
+    return lambda row: combine(test(row) for test in tests)
+
+
+class _PostgrestHandler(_Handler):
+    RESERVED = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+    def _table(self):
+        parts = urlsplit(self.path)
+        match = re.match(r"^/rest/v1/([\w]+)$", parts.path)
+        return (match.group(1) if match else None), parse_qsl(parts.query, keep_blank_values=True)
+
+    def _filters(self, params):
+        tests = []
+        for key, value in params:
+            if key in self.RESERVED:
+                continue
+            if key in ("or", "and"):
+                tests.append(_logic(key, value))
+            else:
+                tests.append(_condition(key, value))
+        return lambda row: all(test(row) for test in tests)
+
+    def _prefer(self):
+        return self.headers.get("Prefer", "")
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        stub = self.server.stub
+        name, params = self._table()
+        if name is None:
+            return self.send_body(404, json.dumps({"message": "not found", "code": "404"}))
+        stub.maybe_delay()
+        query = dict(params)
+        matches = self._filters(params)
+        rows = [row for row in stub.table(name) if matches(row)]
+        for clause in reversed([c for c in query.get("order", "").split(",") if c]):
+            column, *modifiers = clause.split(".")
+            descending = "desc" in modifiers
+            nulls_first = "nullsfirst" in modifiers or (descending and "nullslast" not in modifiers)
+            present = [row for row in rows if row.get(column) is not None]
+            missing = [row for row in rows if row.get(column) is None]
+            present.sort(key=lambda row: row[column], reverse=descending)
+            rows = missing + present if nulls_first else present + missing
+        total = len(rows)
+        offset = int(query.get("offset", 0))
+        limit = int(query["limit"]) if "limit" in query else stub.max_rows
+        rows = rows[offset:offset + min(limit, stub.max_rows)]
+        select = query.get("select", "*")
+        if select != "*":
+            columns = [column.strip() for column in select.split(",")]
+            rows = [{column: row.get(column) for column in columns} for row in rows]
+        end = offset + len(rows) - 1 if rows else offset
+        headers = {"Content-Range": f"{offset}-{end}/{total if 'count=' in self._prefer() else '*'}"}
+        self.send_body(200, json.dumps(rows), headers=headers)
+
+    def do_POST(self):
+        stub = self.server.stub
+        name, params = self._table()
+        if name is None:
+            return self.send_body(404, json.dumps({"message": "not found", "code": "404"}))
+        stub.maybe_delay()
+        payload = self.read_json()
+        records = payload if isinstance(payload, list) else [payload]
+        on_conflict = dict(params).get("on_conflict")
+        merge = "resolution=merge-duplicates" in self._prefer()
+        written = stub.write(name, records, on_conflict if merge else None)
+        body = "" if "return=minimal" in self._prefer() else json.dumps(written)
+        self.send_body(201, body, headers={"Content-Range": f"*/{len(written)}"})
+
+    def do_DELETE(self):
+        stub = self.server.stub
+        name, params = self._table()
+        if name is None:
+            return self.send_body(404, json.dumps({"message": "not found", "code": "404"}))
+        stub.maybe_delay()
+        self.read_json()  # postgrest-py sends "{}" with deletes; drain it to keep the connection clean
+        deleted = stub.delete(name, self._filters(params))
+        body = "" if "return=minimal" in self._prefer() else json.dumps(deleted)
+        self.send_body(200, body)
+
+
+class PostgrestStub(StubServer):
+    """In-memory PostgREST subset: select/filters/or/order/limit/count, insert, upsert, delete"""
+
+    handler = _PostgrestHandler
+
+    def __init__(self, latency=0.0, max_rows=1000):
+        super().__init__()
+        self.latency = latency
+        self.max_rows = max_rows
+        self._tables = {}
+        self._next_id = {}
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def maybe_delay(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def table(self, name):
+        with self._lock:
+            return list(self._tables.get(name, []))
+
+    def write(self, name, records, on_conflict=None):
+        with self._lock:
+            rows = self._tables.setdefault(name, [])
+            index = self._index(name, on_conflict) if on_conflict else {}
+            written = []
+            for record in records:
+                existing = index.get(record.get(on_conflict)) if on_conflict else None
+                if existing is not None:
+                    existing.update(record)
+                    written.append(existing)
+                    continue
+                row = dict(record)
+                if "id" not in row:
+                    self._next_id[name] = self._next_id.get(name, 0) + 1
+                    row["id"] = self._next_id[name]
+                rows.append(row)
+                for (table, column), other in self._indexes.items():
+                    if table == name:
+                        other[row.get(column)] = row
+                written.append(row)
+            return [dict(row) for row in written]
+
+    def _index(self, name, column):
+        """Unique-key index used for upserts, kept in step with inserts and deletes"""
+        if (name, column) not in self._indexes:
+            self._indexes[(name, column)] = {row.get(column): row for row in self._tables.get(name, [])}
+        return self._indexes[(name, column)]
+
+    def delete(self, name, matches):
+        with self._lock:
+            rows = self._tables.get(name, [])
+            deleted = [row for row in rows if matches(row)]
+            if deleted:
+                self._tables[name] = [row for row in rows if not matches(row)]
+                for (table, column), index in self._indexes.items():
+                    if table == name:
+                        for row in deleted:
+                            index.pop(row.get(column), None)
+            return deleted
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentation import count, log, span
+from normalize import iso_duration_to_runtime
+from rate_limit import TokenBucket
+
+IMDB_BASE_URL = os.getenv("IMDB_BASE_URL", "https://www.imdb.com")
+ENRICH_CONCURRENCY = int(os.getenv("ENRICH_CONCURRENCY", "8"))
+HOST_REQUESTS_PER_MINUTE = float(os.getenv("HOST_REQUESTS_PER_MINUTE", "120"))
+RESPONSE_CACHE_DIR = os.getenv("RESPONSE_CACHE_DIR", ".imdb_cache")
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+_JSON_LD = re.compile(r'<script[^>]*type="application/ld\+json"[^>]*>(.*?)</script>', re.DOTALL | re.IGNORECASE)
+_TITLE_ID = re.compile(r'tt\d+')
+
+
+def create_session(pool_size=ENRICH_CONCURRENCY):
+    """One pooled session shared by every worker so connections are reused"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(HEADERS)
+    return session
+
+
+class HostRateLimiter:
+    """One token bucket per host"""
+
+    def __init__(self, requests_per_minute=HOST_REQUESTS_PER_MINUTE):
+        self.requests_per_minute = requests_per_minute
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                # Small burst so a fresh run does not hammer the host
+                bucket = TokenBucket(self.requests_per_minute, capacity=min(5, self.requests_per_minute))
+                self._buckets[host] = bucket
+        return bucket.acquire()
+
+
+class ResponseCache:
+    """Directory of cached bodies with their ETag/Last-Modified validators"""
+
+    def __init__(self, directory=RESPONSE_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, url):
+        try:
+            with open(self._path(url), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url, response):
+        entry = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "body": response.text,
+        }
+        # A temp file of its own, so two workers fetching the same URL do not write over each other
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self._path(url))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return entry
+
+
+class DetailFetcher:
+    """Conditional, rate-limited GETs through a shared session and an on-disk cache"""
+
+    def __init__(self, session=None, cache=None, limiter=None, timeout=30):
+        self.session = session or create_session()
+        self.cache = cache or ResponseCache()
+        self.limiter = limiter or HostRateLimiter()
+        self.timeout = timeout
+        self.stats = {"downloaded": 0, "not_modified": 0, "errors": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, key, source):
+        with self._lock:
+            self.stats[key] += 1
+        count("enrich_fetches_total", result=key, source=source)
+
+    def fetch(self, url, source="imdb_title"):
+        cached = self.cache.get(url)
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        self.limiter.acquire(url)
+        try:
+            with span("enrich.fetch", url=url, source=source, conditional=bool(headers)) as fetch_span:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+                fetch_span.set(status=response.status_code, bytes=len(response.content))
+            count("http_bytes_total", len(response.content), source=source)
+            if response.status_code == 304 and cached:
+                self._count("not_modified", source)
+                return cached["body"]
+            response.raise_for_status()
+        except requests.RequestException as e:
+            self._count("errors", source)
+            log(f"Error fetching {url}: {e}")
+            # A stale page is better than no page
+            return cached["body"] if cached else None
+
+        self._count("downloaded", source)
+        return self.cache.put(url, response)["body"]
+
+
+def title_url(imdb_url, base_url=IMDB_BASE_URL):
+    match = _TITLE_ID.search(imdb_url or '')
+    return f"{base_url.rstrip('/')}/title/{match.group(0)}/" if match else None
+
+
+def parse_title_details(html):
+    """Year, runtime and genres from a title page's JSON-LD block"""
+    details = {}
+    for block in _JSON_LD.findall(html or ''):
+        try:
+            data = json.loads(block)
+        except ValueError:
+            continue
+        if not isinstance(data, dict):
+            continue
+        published = str(data.get("datePublished") or '')
+        if published[:4].isdigit():
+            details["release_year"] = int(published[:4])
+        runtime = iso_duration_to_runtime(data.get("duration"))
+        if runtime:
+            details["runtime"] = runtime
+        genre = data.get("genre")
+        if genre:
+            details["genres"] = [genre] if isinstance(genre, str) else list(genre)
+        break
+    return details
+
+
+def enrich_movies(movies, fetcher=None, concurrency=ENRICH_CONCURRENCY, base_url=IMDB_BASE_URL):
+    """Fill missing release_year/runtime (and empty genres) from each title's detail page"""
+    fetcher = fetcher or DetailFetcher()
+    todo = [
+        movie for movie in movies
+        if movie.get("release_year") is None or movie.get("runtime") in (None, "N/A") or not movie.get("genres")
+    ]
+
+    def enrich(movie):
+        url = title_url(movie.get("imdb_url"), base_url)
+        if not url:
+            return 0
+        details = parse_title_details(fetcher.fetch(url))
+        changed = 0
+        for field, value in details.items():
+            if movie.get(field) in (None, "N/A", []):
+                movie[field] = value
+                changed = 1
+        return changed
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        filled = sum(pool.map(enrich, todo))
+
+    log(f"Enriched {filled}/{len(todo)} movies from detail pages "
+        f"({fetcher.stats['downloaded']} downloaded, {fetcher.stats['not_modified']} not modified, "
+        f"{fetcher.stats['errors']} errors)")
+    return movies
@@ -0,0 +1,294 @@
+import json
+import os
+import re
+from html import unescape
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+from normalize import iso_duration_to_runtime
+
+try:
+    import lxml.html
+except ImportError:  # single_pass falls back to the pure-Python parser
+    lxml = None
+
+IMDB_BASE_URL = "https://www.imdb.com"
+
+# Strategies tried in order; the first one that finds any movies wins
+EXTRACTION_STRATEGIES = os.getenv("EXTRACTION_STRATEGIES", "json_ld,single_pass").split(",")
+
+_JSON_LD = re.compile(r'<script[^>]*type="application/ld\+json"[^>]*>(.*?)</script>', re.DOTALL | re.IGNORECASE)
+_TITLE_HREF = re.compile(r'/title/tt\d+')
+_YEAR = re.compile(r'\((\d{4})\)')
+_RUNTIME = re.compile(r'(\d+h\s*\d*min|\d+\s*min)')
+_ANCHOR = re.compile(r'<a\b[^>]*>', re.IGNORECASE)
+_HREF = re.compile(r'href=["\']([^"\']+)["\']', re.IGNORECASE)
+_NEXT_MARKERS = re.compile(r'rel=["\']next["\']|next-page|aria-label=["\']next', re.IGNORECASE)
+
+
+def raw_movie(title, year="N/A", rating="N/A", runtime="N/A", genre="N/A", url="N/A", rank=None):
+    return {
+        "raw_title": title,
+        "raw_year": year,
+        "raw_rating": rating,
+        "raw_runtime": runtime,
+        "raw_genre": genre,
+        "raw_description": "N/A",
+        "raw_url": url,
+        "raw_rank": rank
+    }
+
+
+def _absolute(href):
+    return IMDB_BASE_URL + href if href.startswith('/') else href
+
+
+def movies_from_json_ld(script_text):
+    """Movies from an ItemList JSON-LD document (IMDB often stores list data this way)"""
+    movies_list = []
+    try:
+        data = json.loads(script_text)
+    except (TypeError, ValueError):
+        return movies_list
+    if not isinstance(data, dict) or 'itemListElement' not in data:
+        return movies_list
+    for item in data['itemListElement']:
+        if 'item' not in item:
+            continue
+        movie_data = item['item']
+        genre = movie_data.get('genre', [])
+        runtime = iso_duration_to_runtime(movie_data.get('duration'))
+        movies_list.append(raw_movie(
+            movie_data.get('name', 'N/A'),
+            year=movie_data.get('datePublished', 'N/A'),
+            rating=(movie_data.get('aggregateRating') or {}).get('ratingValue', 'N/A'),
+            runtime=runtime or "N/A",
+            genre=genre if isinstance(genre, str) else ', '.join(genre),
+            url=_absolute(movie_data.get('url', 'N/A')),
+            rank=item.get('position', len(movies_list) + 1)
+        ))
+    return movies_list
+
+
+def extract_json_ld(html):
+    """Structured path: pull the JSON-LD block out with a regex, no HTML parse at all"""
+    for script_text in _JSON_LD.findall(html):
+        movies_list = movies_from_json_ld(script_text)
+        if movies_list:
+            return movies_list
+    return []
+
+
+def _classes(element):
+    return element.get('class', '').split()
+
+
+# (selector, matcher) pairs checked against every element during the single traversal
+_CONTAINER_MATCHERS = [
+    ('div.lister-item', lambda el: el.tag == 'div' and 'lister-item' in _classes(el)),
+    ('li.ipc-metadata-list-summary-item',
+     lambda el: el.tag == 'li' and 'ipc-metadata-list-summary-item' in _classes(el)),
+    ('div[data-testid="list-item"]', lambda el: el.tag == 'div' and el.get('data-testid') == 'list-item'),
+]
+
+
+def _movie_from_lxml_container(container, rank):
+    title_link = next(
+        (a for a in container.iter('a') if _TITLE_HREF.search(a.get('href', ''))), None
+    )
+    if title_link is None:
+        return None
+    title = title_link.text_content().strip()
+    if not title or title == '...':
+        return None
+    text = container.text_content()
+    year_match = _YEAR.search(text)
+    runtime_match = _RUNTIME.search(text)
+
+    # The legacy selectors' priority, in one traversal: span.ipl-rating-star__rating, then any
+    # span with "rating" in a class, then any such div (a wrapper's text would be the whole bar)
+    ratings = [None, None, None]
+    genre = "N/A"
+    for element in container.iterdescendants('span', 'div'):
+        classes = element.get('class', '').split()
+        is_rating = any('rating' in cls for cls in classes)
+        if element.tag == 'span':
+            if ratings[0] is None and 'ipl-rating-star__rating' in classes:
+                ratings[0] = element
+            if ratings[1] is None and is_rating:
+                ratings[1] = element
+            if genre == "N/A" and 'genre' in classes:
+                genre = element.text_content().strip()
+        elif ratings[2] is None and is_rating:
+            ratings[2] = element
+    rating_element = next((element for element in ratings if element is not None), None)
+    rating = rating_element.text_content().strip() if rating_element is not None else "N/A"
+
+    return raw_movie(
+        title,
+        year=year_match.group(1) if year_match else "N/A",
+        rating=rating,
+        runtime=runtime_match.group(1) if runtime_match else "N/A",
+        genre=genre,
+        url=_absolute(title_link.get('href')),
+        rank=rank
+    )
+
+
+def extract_single_pass(html):
+    """One traversal over an lxml tree collecting every candidate container at once"""
+    if lxml is None:
+        return extract_legacy(html)
+
+    root = lxml.html.fromstring(html)
+    found = {selector: [] for selector, _ in _CONTAINER_MATCHERS}
+    title_links = []
+    for element in root.iter('div', 'li', 'a'):
+        if element.tag == 'a':
+            if _TITLE_HREF.search(element.get('href', '')):
+                title_links.append(element)
+            continue
+        for selector, matches in _CONTAINER_MATCHERS:
+            if matches(element):
+                found[selector].append(element)
+
+    containers = max(found.values(), key=len)
+    if containers:
+        movies_list = []
+        for container in containers:
+            movie = _movie_from_lxml_container(container, len(movies_list) + 1)
+            if movie:
+                movies_list.append(movie)
+        return movies_list
+
+    # No list markup: fall back to unique title links
+    movies_list = []
+    seen_titles = set()
+    for link in title_links:
+        title = link.text_content().strip()
+        if title and title not in seen_titles and len(title) > 2:
+            seen_titles.add(title)
+            parent = link.getparent()
+            text = parent.text_content() if parent is not None else ''
+            runtime_match = _RUNTIME.search(text)
+            movies_list.append(raw_movie(
+                title,
+                runtime=runtime_match.group(1) if runtime_match else "N/A",
+                url=_absolute(link.get('href')),
+                rank=len(movies_list) + 1
+            ))
+    return movies_list
+
+
+def extract_legacy(html, parser="html.parser"):
+    """The original BeautifulSoup path: four full-tree selectors, then per-container regexes"""
+    soup = BeautifulSoup(html, parser)
+    movies_list = []
+
+    selectors_to_try = [
+        'div.lister-item',  # Traditional IMDB list selector
+        'li.ipc-metadata-list-summary-item',  # New IMDB selector
+        'div[data-testid="list-item"]',  # Test ID selector
+        'h3 a[href*="/title/tt"]',  # Direct title links
+    ]
+
+    movie_containers = []
+    for selector in selectors_to_try:
+        found = soup.select(selector)
+        if found and len(found) > len(movie_containers):
+            movie_containers = found
+
+    # If still no containers, try finding by text content
+    if not movie_containers:
+        movie_links = soup.find_all('a', href=re.compile(r'/title/tt\d+'))
+        unique_links = []
+        seen_titles = set()
+        for link in movie_links:
+            title = link.text.strip()
+            if title and title not in seen_titles and len(title) > 2:
+                seen_titles.add(title)
+                unique_links.append(link)
+        movie_containers = unique_links
+
+    for index, container in enumerate(movie_containers, 1):
+        try:
+            movie = _movie_from_soup_container(container, index)
+        except Exception as e:
+            print(f"Error processing item {index}: {e}", flush=True)
+            continue
+        if movie:
+            movies_list.append(movie)
+
+    return movies_list
+
+
+def _movie_from_soup_container(container, index):
+    if container.name == 'a':  # Direct link element
+        movie_title = container.text.strip()
+        movie_url = "https://www.imdb.com" + container['href']
+        # Find parent container for additional info
+        parent = container.find_parent(['div', 'li'])
+    else:  # Container element
+        title_link = container.find('a', href=re.compile(r'/title/tt'))
+        if title_link:
+            movie_title = title_link.text.strip()
+            movie_url = "https://www.imdb.com" + title_link['href']
+        else:
+            movie_title = container.get_text(strip=True)
+            movie_url = "N/A"
+        parent = container
+
+    if not movie_title or movie_title == '...':
+        return None
+
+    year_match = _YEAR.search(container.get_text())
+    rating_element = (container.find('span', class_='ipl-rating-star__rating') or
+                      container.find('span', class_=re.compile(r'rating')) or
+                      container.find('div', class_=re.compile(r'rating')))
+
+    runtime = "N/A"
+    genre = "N/A"
+    if parent:
+        runtime_match = _RUNTIME.search(parent.get_text())
+        if runtime_match:
+            runtime = runtime_match.group(1)
+        genre_elem = parent.find('span', class_='genre')
+        if genre_elem:
+            genre = genre_elem.text.strip()
+
+    return raw_movie(
+        movie_title,
+        year=year_match.group(1) if year_match else "N/A",
+        rating=rating_element.text.strip() if rating_element else "N/A",
+        runtime=runtime,
+        genre=genre,
+        url=movie_url,
+        rank=index
+    )
+
+
+STRATEGIES = {
+    "json_ld": extract_json_ld,
+    "single_pass": extract_single_pass,
+    "legacy": extract_legacy,
+}
+
+
+def extract_movies(html, strategies=None):
+    """Run the configured strategies in order; return (strategy name, movies)"""
+    for name in strategies or EXTRACTION_STRATEGIES:
+        movies_list = STRATEGIES[name.strip()](html)
+        if movies_list:
+            return name, movies_list
+    return None, []
+
+
+def next_page_url(html, page_url):
+    """Absolute URL of the list's next page (rel=next, a next-page button or aria-label "Next"), or None"""
+    for anchor in _ANCHOR.findall(html or ''):
+        if _NEXT_MARKERS.search(anchor):
+            href = _HREF.search(anchor)
+            if href:
+                return urljoin(page_url, unescape(href.group(1)))
+    return None
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+
+class GenreIndex:
+    """Multi-hot movies x genres matrix, built once per data version
+
+    Row i of the matrix lines up with row i of the DataFrame the index was built
+    from, so masks produced here can be used directly with df[mask].
+    """
+
+    def __init__(self, genres, matrix):
+        self.genres = genres
+        self.matrix = matrix
+        self._columns = {genre: i for i, genre in enumerate(genres)}
+
+    @classmethod
+    def build(cls, genres):
+        """Build the index from an iterable of genre lists (None/empty allowed)"""
+        if isinstance(genres, pd.Series):
+            series = genres.reset_index(drop=True)
+        else:
+            series = pd.Series(list(genres), dtype=object)
+        exploded = series.explode().dropna()
+        vocabulary = sorted(exploded.unique())
+        matrix = np.zeros((len(series), len(vocabulary)), dtype=bool)
+        if len(exploded):
+            codes = pd.Categorical(exploded, categories=vocabulary).codes
+            matrix[exploded.index.to_numpy(), codes] = True
+        return cls(vocabulary, matrix)
+
+    @classmethod
+    def from_arrow(cls, genres):
+        """Build the index from an Arrow list<dictionary<int, string>> column without Python lists"""
+        import pyarrow.compute as pc
+
+        if hasattr(genres, "combine_chunks"):
+            genres = genres.combine_chunks()
+        values = genres.flatten()
+        lengths = pc.list_value_length(genres).fill_null(0).to_numpy()
+        rows = np.repeat(np.arange(len(genres)), lengths)
+        if not hasattr(values, "dictionary"):
+            values = values.dictionary_encode()
+        valid = values.is_valid().to_numpy(zero_copy_only=False)
+        codes = values.indices.fill_null(0).to_numpy()
+        dictionary = values.dictionary.to_pylist()
+
+        # Columns are kept in sorted genre order, like build()
+        used = np.unique(codes[valid])
+        vocabulary = sorted(dictionary[code] for code in used)
+        column = np.full(len(dictionary), -1, dtype=np.int64)
+        column[[dictionary.index(genre) for genre in vocabulary]] = np.arange(len(vocabulary))
+        matrix = np.zeros((len(genres), len(vocabulary)), dtype=bool)
+        matrix[rows[valid], column[codes[valid]]] = True
+        return cls(vocabulary, matrix)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def columns_for(self, genres):
+        return [self._columns[genre] for genre in genres if genre in self._columns]
+
+    def any_of(self, genres):
+        """Boolean mask of movies that have at least one of the given genres"""
+        columns = self.columns_for(genres)
+        if not columns:
+            return np.zeros(len(self), dtype=bool)
+        return self.matrix[:, columns].any(axis=1)
+
+    def counts(self, mask=None):
+        """Per-genre movie counts (zero counts omitted), optionally restricted to a row mask"""
+        matrix = self.matrix if mask is None else self.matrix[mask]
+        return {genre: count for genre, count in zip(self.genres, matrix.sum(axis=0).tolist()) if count}
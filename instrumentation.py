@@ -0,0 +1,296 @@
+"""Timed spans and counters for the scraper, loader and dashboard
+
+Off by default. With INSTRUMENTATION=1 every span and log line is appended to a
+JSON-lines trace (TRACE_FILE) and the aggregated span timings and counters are
+written in Prometheus text format to METRICS_FILE when the process exits, on
+write_metrics(), or at most every METRICS_INTERVAL seconds through
+flush_metrics(). While disabled, span() hands back one shared no-op object and
+count() returns immediately, so the calls can stay in hot paths.
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+INSTRUMENTATION = os.getenv("INSTRUMENTATION", "0") == "1"
+TRACE_FILE = os.getenv("TRACE_FILE", "pipeline_trace.jsonl")
+METRICS_FILE = os.getenv("METRICS_FILE", "pipeline_metrics.prom")
+METRICS_PREFIX = "cage"
+# Long-running processes (the dashboard) rewrite METRICS_FILE at most this often
+METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", "15"))
+
+# Histogram bucket upper bounds in seconds, from a parse step up to a slow LLM call
+SPAN_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _NoopSpan:
+    seconds = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """One timed operation; nested spans record their parent's id"""
+
+    def __init__(self, recorder, name, attrs):
+        self._recorder = recorder
+        self.name = name
+        self.attrs = attrs
+        self.seconds = None
+
+    def set(self, **attrs):
+        """Attach attributes known only once the work is done (rows, tokens, cache hit...)"""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = self._recorder.stack()
+        self.parent = stack[-1].id if stack else None
+        self.id = self._recorder.next_id()
+        stack.append(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self._start
+        self._recorder.stack().pop()
+        # Errors the block caught itself can be reported with span.set(error=...)
+        error = f"{exc_type.__name__}: {exc}" if exc is not None else self.attrs.pop("error", None)
+        self._recorder.finish(self, error=error)
+        return False
+
+
+class Recorder:
+    """Aggregates spans and counters and appends trace events; thread-safe"""
+
+    def __init__(self, trace_file=TRACE_FILE, metrics_file=METRICS_FILE):
+        self.trace_file = trace_file
+        self.metrics_file = metrics_file
+        self.counters = defaultdict(float)
+        self.spans = {}
+        self._ids = 0
+        self._written_at = 0.0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._trace = open(trace_file, "a", encoding="utf-8") if trace_file else None
+
+    def stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def last(self):
+        """Durations of the spans finished on this thread, by name"""
+        if not hasattr(self._local, "last"):
+            self._local.last = {}
+        return self._local.last
+
+    def next_id(self):
+        with self._lock:
+            self._ids += 1
+            return self._ids
+
+    def emit(self, event):
+        if self._trace is None:
+            return
+        line = json.dumps(event, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self._trace.write(line)
+            self._trace.flush()
+
+    def finish(self, span, error=None):
+        with self._lock:
+            stats = self.spans.get(span.name)
+            if stats is None:
+                stats = self.spans[span.name] = {
+                    "count": 0, "sum": 0.0, "errors": 0, "buckets": [0] * len(SPAN_BUCKETS)
+                }
+            stats["count"] += 1
+            stats["sum"] += span.seconds
+            stats["errors"] += error is not None
+            for i, bound in enumerate(SPAN_BUCKETS):
+                if span.seconds <= bound:
+                    stats["buckets"][i] += 1
+                    break
+        self.last()[span.name] = span.seconds
+        event = {
+            "type": "span", "ts": time.time(), "name": span.name, "id": span.id,
+            "parent": span.parent, "seconds": round(span.seconds, 6),
+            "thread": threading.current_thread().name, **span.attrs,
+        }
+        if error:
+            event["error"] = error
+        self.emit(event)
+
+    def count(self, name, value, labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] += value
+
+    def log(self, message):
+        stack = self.stack()
+        self.emit({"type": "log", "ts": time.time(), "span": stack[-1].name if stack else None,
+                   "message": message})
+
+    def prometheus(self):
+        """Current counters and span timings in Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            by_name = defaultdict(list)
+            for (name, labels), value in sorted(self.counters.items()):
+                by_name[name].append((labels, value))
+            for name, samples in by_name.items():
+                metric = f"{METRICS_PREFIX}_{name}"
+                lines.append(f"# TYPE {metric} counter")
+                for labels, value in samples:
+                    lines.append(f"{metric}{_labels(labels)} {_number(value)}")
+
+            metric = f"{METRICS_PREFIX}_span_seconds"
+            if self.spans:
+                lines.append(f"# TYPE {metric} histogram")
+            for name, stats in sorted(self.spans.items()):
+                cumulative = 0
+                for bound, hits in zip(SPAN_BUCKETS, stats["buckets"]):
+                    cumulative += hits
+                    lines.append(f"{metric}_bucket{_labels([('span', name), ('le', bound)])} {cumulative}")
+                lines.append(f"{metric}_bucket{_labels([('span', name), ('le', '+Inf')])} {stats['count']}")
+                lines.append(f"{metric}_sum{_labels([('span', name)])} {stats['sum']:.6f}")
+                lines.append(f"{metric}_count{_labels([('span', name)])} {stats['count']}")
+
+            metric = f"{METRICS_PREFIX}_span_errors_total"
+            if self.spans:
+                lines.append(f"# TYPE {metric} counter")
+            for name, stats in sorted(self.spans.items()):
+                lines.append(f"{metric}{_labels([('span', name)])} {stats['errors']}")
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self, path=None):
+        path = path or self.metrics_file
+        if not path:
+            return
+        text = self.prometheus()
+        # Write then rename so a scraper never reads a half-written file; the temp file
+        # is unique and the lock keeps concurrent writers from replacing out of order
+        with self._lock:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(text)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self._written_at = time.monotonic()
+
+    def flush_metrics(self, interval=METRICS_INTERVAL):
+        """write_metrics() if the last write is more than interval seconds old"""
+        with self._lock:
+            due = time.monotonic() - self._written_at >= interval
+        if due:
+            self.write_metrics()
+
+    def close(self):
+        self.write_metrics()
+        if self._trace is not None:
+            with self._lock:
+                self._trace.close()
+                self._trace = None
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+_recorder = None
+
+
+def enable(trace_file=TRACE_FILE, metrics_file=METRICS_FILE):
+    """Start recording; metrics are written again at interpreter exit"""
+    global _recorder
+    if _recorder is None:
+        _recorder = Recorder(trace_file, metrics_file)
+        atexit.register(_recorder.close)
+    return _recorder
+
+
+def enabled():
+    return _recorder is not None
+
+
+def recorder():
+    return _recorder
+
+
+def span(name, **attrs):
+    """Context manager timing a block: with span("llm.batch", batch=3) as s: ..."""
+    if _recorder is None:
+        return _NOOP_SPAN
+    return Span(_recorder, name, attrs)
+
+
+def count(name, value=1, **labels):
+    """Add value to a counter such as llm_prompt_tokens_total or rows_loaded_total{op=...}"""
+    if _recorder is None:
+        return
+    _recorder.count(name, value, labels)
+
+
+def log(message):
+    """Print immediately and, when recording, add the line to the trace under the current span"""
+    print(message, flush=True)
+    if _recorder is not None:
+        _recorder.log(message)
+
+
+def last_timings():
+    """Most recent duration of every span name finished on the calling thread, in seconds
+
+    Streamlit runs each session's script on its own thread, so these are the
+    calling session's timings, not whichever session finished a span last.
+    """
+    if _recorder is None:
+        return {}
+    return dict(_recorder.last())
+
+
+def reset_timings():
+    """Forget the calling thread's span durations, e.g. at the start of a script run"""
+    if _recorder is not None:
+        _recorder.last().clear()
+
+
+def write_metrics(path=None):
+    if _recorder is not None:
+        _recorder.write_metrics(path)
+
+
+def flush_metrics():
+    """Write the metrics file if METRICS_INTERVAL has passed; cheap enough to call on every rerun"""
+    if _recorder is not None:
+        _recorder.flush_metrics()
+
+
+if INSTRUMENTATION:
+    enable()
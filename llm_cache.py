@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite3")
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+def fingerprint(*parts):
+    """Stable sha256 over JSON-serializable parts"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Content-addressed SQLite cache of parsed LLM batch results
+
+    Entries are keyed by a hash of the batch input plus model, prompt version and
+    temperature. Entries written under another prompt version are purged on open,
+    and the least recently used entries are evicted once max_bytes is exceeded.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, prompt_version=None, max_bytes=LLM_CACHE_MAX_BYTES):
+        self.path = path
+        self.prompt_version = prompt_version
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "create table if not exists batches ("
+            " key text primary key, prompt_version text, value text,"
+            " size integer, created_at real, used_at real)"
+        )
+        self._conn.execute("create index if not exists batches_used_at on batches (used_at)")
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "purged": 0}
+        if prompt_version is not None:
+            self.purge_stale()
+
+    def key(self, batch_input, model, temperature):
+        return fingerprint(batch_input, model, self.prompt_version, temperature)
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("select value from batches where key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self._conn.execute("update batches set used_at = ? where key = ?", (time.time(), key))
+            self._conn.commit()
+            self.stats["hits"] += 1
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        payload = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "insert or replace into batches values (?, ?, ?, ?, ?, ?)",
+                (key, self.prompt_version, payload, len(payload.encode("utf-8")), now, now),
+            )
+            self.stats["stores"] += 1
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("select coalesce(sum(size), 0) from batches").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("select key, size from batches order by used_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("delete from batches where key = ?", (key,))
+            total -= size
+            self.stats["evictions"] += 1
+
+    def purge_stale(self):
+        """Drop entries written under a different prompt version"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "delete from batches where prompt_version is not ?", (self.prompt_version,)
+            )
+            self.stats["purged"] += cursor.rowcount
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("delete from batches")
+            self._conn.commit()
+
+    def hit_rate(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,60 +1,451 @@
-import pandas as pd
 import json
 from supabase import create_client
 import os
+import re
+import sys
+import time
+import random
+import hashlib
+import httpx
+from concurrent.futures import ThreadPoolExecutor, wait, ALL_COMPLETED, FIRST_COMPLETED
 from datetime import datetime
 from dotenv import load_dotenv
+from postgrest.exceptions import APIError
+from postgrest.types import ReturnMethod
+
+from aggregates import AGGREGATES_TABLE, build_aggregates
+from instrumentation import count, log, span
+from movie_data import fetch_all_movies, fetch_data_version
+from snapshot import write_snapshot
 
 load_dotenv()
 
-def load_to_supabase():
-    with open('nicholas_cage_processed_movies.json', 'r') as f:
-        movies_data = json.load(f)
-    
-    print(f"Loaded {len(movies_data)} movies from JSON")
-    
-    df = pd.DataFrame(movies_data)
-    
-    current_time = datetime.now().isoformat()
-    df['extracted_at'] = current_time
-    df['updated_at'] = current_time
-    
-    df = df.rename(columns={
-        'rank': 'imdb_rank',
-        'release_year': 'year'
-    })
-    
-    if 'role' not in df.columns:
-        df['role'] = 'Unknown'
-    
-    if 'summary' not in df.columns:
-        df['summary'] = 'Description not available'
-    
-    print("Sample data:")
-    print(df[['imdb_rank', 'title', 'year', 'imdb_rating']].head())
-    
+MOVIES_TABLE = 'nicholas_cage_movies'
+SOURCE_FILE = 'nicholas_cage_processed_movies.json'
+
+# Incremental sync needs a unique key and a hash column on the table:
+#   alter table nicholas_cage_movies add column content_hash text, add column sync_key text;
+#   update nicholas_cage_movies set sync_key = coalesce(substring(imdb_url from 'tt[0-9]+'),
+#       coalesce(title, '') || '|' || coalesce(year::text, ''));
+#   create unique index on nicholas_cage_movies (sync_key);
+# imdb_url itself is not unique: titles without an IMDb page share None or "N/A"
+UPSERT_CHUNK_SIZE = 200
+DELETE_CHUNK_SIZE = 500
+PAGE_SIZE = 1000
+
+LOADER_WORKERS = int(os.getenv("LOADER_WORKERS", "4"))
+MAX_RETRIES = 5
+RETRY_BASE_DELAY = 0.5
+
+# HTTP statuses and Postgres error codes worth retrying
+TRANSIENT_CODES = {'408', '429', '500', '502', '503', '504', '40001', '40P01', '53300', '57014'}
+
+# Fields that come from the source file; timestamps and ids are not part of the hash
+CONTENT_FIELDS = ['imdb_rank', 'title', 'year', 'imdb_rating', 'runtime', 'genres', 'role', 'summary']
+
+# Set only by dataset loads (iter_dataset_records), which need:
+#   alter table nicholas_cage_movies add column actors text[], add column list_positions jsonb;
+PARTITION_FIELDS = ['actors', 'list_positions']
+
+# What build_aggregates reads from each row
+AGGREGATE_COLUMNS = 'id,imdb_rank,title,imdb_rating,genres'
+
+
+def init_supabase():
     supabase_url = os.getenv("SUPABASE_URL")
     supabase_key = os.getenv("SUPABASE_KEY")
-    
-    supabase = create_client(supabase_url, supabase_key)
-    
-    df['genres'] = df['genres'].apply(lambda x: x if isinstance(x, list) else [])
-    
-    records = df.to_dict('records')
-    
+    return create_client(supabase_url, supabase_key)
+
+
+def iter_json_records(path, read_size=1 << 16):
+    """Yield objects one at a time from a JSON array or JSONL file, reading it in blocks"""
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        pos = 0
+        started = False
+        while True:
+            # Skip whitespace, separators and the array brackets between objects
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos == len(buffer):
+                buffer = f.read(read_size)
+                pos = 0
+                if not buffer:
+                    return
+                continue
+            if not started:
+                started = True
+                if buffer[pos] == '[':
+                    pos += 1
+                    continue
+            if buffer[pos] == ']':
+                return
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                more = f.read(read_size)
+                if not more:
+                    raise
+                buffer = buffer[pos:] + more
+                pos = 0
+                continue
+            yield record
+            pos = end
+            if pos >= read_size:
+                buffer = buffer[pos:]
+                pos = 0
+
+
+def _title_id(record):
+    match = re.search(r'tt\d+', record.get('imdb_url') or '')
+    return match.group(0) if match else None
+
+
+def iter_dataset_records(directory):
+    """Records of every partition in an orchestrator.py dataset, in manifest order, each title once
+
+    A title's rank is its position in the whole dataset: the lists in manifest
+    order, each in its own order, counting a title where it first appears. Its
+    place in every list goes into actors and list_positions. Only records with
+    a tt id are deduped.
+    """
+    with open(os.path.join(directory, 'manifest.json'), 'r', encoding='utf-8') as f:
+        partitions = json.load(f).get('partitions', [])
+
+    # First pass: every list each title is in (ids and positions only, the records are not kept)
+    memberships = {}
+    for partition in partitions:
+        for record in iter_json_records(os.path.join(directory, partition['path'])):
+            key = _title_id(record)
+            if key is not None:
+                memberships.setdefault(key, []).append(
+                    (partition.get('actor'), partition['list'], record.get('rank')))
+
+    seen = set()
+    rank = 0
+    for partition in partitions:
+        for record in iter_json_records(os.path.join(directory, partition['path'])):
+            key = _title_id(record)
+            if key is not None:
+                if key in seen:
+                    continue
+                seen.add(key)
+            rank += 1
+            lists = memberships.get(key) or [(partition.get('actor'), partition['list'], record.get('rank'))]
+            record['rank'] = rank
+            record['actors'] = sorted({actor for actor, _, _ in lists if actor})
+            record['list_positions'] = {list_id: position for _, list_id, position in lists}
+            yield record
+    shared = sum(len(lists) > 1 for lists in memberships.values())
+    log(f"Dataset {directory}: {len(partitions)} partitions, {rank} titles, {shared} listed in more than one")
+
+
+def iter_source_records(path):
+    """A processed JSON/JSONL file, or a partitioned dataset directory"""
+    if os.path.isdir(path):
+        return iter_dataset_records(path)
+    return iter_json_records(path)
+
+
+def imdb_key(url):
+    """Canonical https://www.imdb.com/title/tt.../ URL so the same title always maps to one row"""
+    match = re.search(r'tt\d+', url or '')
+    return f"https://www.imdb.com/title/{match.group(0)}/" if match else url
+
+
+def sync_key(record):
+    """The title's tt id, or title|year for titles without one (see the backfill above)"""
+    title_id = _title_id(record)
+    if title_id is not None:
+        return title_id
+    year = record.get('year')
+    return f"{record.get('title') or ''}|{'' if year is None else year}"
+
+
+def content_hash(record):
+    content = {field: record.get(field) for field in CONTENT_FIELDS}
+    # Hashed only when present, so single-file loads keep the hashes they had
+    content.update({field: record[field] for field in PARTITION_FIELDS if field in record})
+    payload = json.dumps(content, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def prepare_record(movie, current_time):
+    """Apply the column renames and defaults to one source record"""
+    record = dict(movie)
+    if 'rank' in record:
+        record['imdb_rank'] = record.pop('rank')
+    if 'release_year' in record:
+        record['year'] = record.pop('release_year')
+    record.setdefault('role', 'Unknown')
+    record.setdefault('summary', 'Description not available')
+    if not isinstance(record.get('genres'), list):
+        record['genres'] = []
+    record['imdb_url'] = imdb_key(record.get('imdb_url'))
+    record['sync_key'] = sync_key(record)
+    record['extracted_at'] = current_time
+    record['updated_at'] = current_time
+    record['content_hash'] = content_hash(record)
+    return record
+
+
+def iter_prepared_records(path, current_time, sample_size=5):
+    """Stream prepared records from the source file, printing the first few as a sample"""
+    read = 0
+    for movie in iter_source_records(path):
+        record = prepare_record(movie, current_time)
+        if read == 0:
+            log("Sample data:")
+        if read < sample_size:
+            log(f"   {record.get('imdb_rank')}. {record.get('title')} "
+                f"({record.get('year')}) - Rating: {record.get('imdb_rating')}")
+        read += 1
+        yield record
+    log(f"Read {read} movies from {path}")
+
+
+def is_transient(error):
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, APIError):
+        code = str(error.code or '')
+        return code in TRANSIENT_CODES or code.startswith('08')
+    return False
+
+
+def with_retries(call, attempts=MAX_RETRIES, base_delay=RETRY_BASE_DELAY):
+    """Run call(), retrying transient errors with exponential backoff and jitter"""
+    for attempt in range(1, attempts + 1):
+        try:
+            return call()
+        except Exception as e:
+            if attempt == attempts or not is_transient(e):
+                raise
+            delay = base_delay * 2 ** (attempt - 1) * (0.5 + random.random())
+            count("supabase_retries_total")
+            log(f"Transient error ({e}); retry {attempt}/{attempts - 1} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+class ChunkWriter:
+    """Send records in fixed-size chunks through a small thread pool
+
+    At most two chunks per worker are queued or in flight, so memory stays flat
+    however many records are fed in. Chunks are retried on transient errors, so
+    send must be idempotent (an upsert, not a plain insert). sent counts the
+    records of chunks that went through.
+    """
+
+    def __init__(self, send, chunk_size=UPSERT_CHUNK_SIZE, workers=LOADER_WORKERS):
+        self._send = send
+        self._chunk_size = chunk_size
+        self._max_pending = workers * 2
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._pending = set()
+        self._buffer = []
+        self.sent = 0
+
+    def add(self, record):
+        self._buffer.append(record)
+        if len(self._buffer) >= self._chunk_size:
+            self._submit()
+
+    def _submit(self):
+        chunk, self._buffer = self._buffer, []
+        while len(self._pending) >= self._max_pending:
+            self._collect(FIRST_COMPLETED)
+        self._pending.add(self._pool.submit(self._send_chunk, chunk))
+
+    def _send_chunk(self, chunk):
+        with_retries(lambda: self._send(chunk))
+        return len(chunk)
+
+    def _collect(self, return_when):
+        done, self._pending = wait(self._pending, return_when=return_when)
+        for future in done:
+            self.sent += future.result()
+
+    def close(self):
+        try:
+            if self._buffer:
+                self._submit()
+            self._collect(ALL_COMPLETED)
+        finally:
+            self._pool.shutdown(wait=True)
+
+
+def count_rows(supabase):
+    """Server-side row count; no rows are transferred"""
+    with span("supabase.count"):
+        return supabase.table(MOVIES_TABLE).select('id', count='exact', head=True).execute().count
+
+
+def iter_table_rows(supabase, columns, label="rows"):
+    """Every stored row with the given columns (id included), paged by id"""
+    def fetch_page(last_id):
+        query = supabase.table(MOVIES_TABLE).select(columns)
+        if last_id is not None:
+            query = query.gt('id', last_id)
+        with span(f"supabase.fetch_{label}", after=last_id) as page_span:
+            rows = query.order('id').limit(PAGE_SIZE).execute().data
+            page_span.set(rows=len(rows))
+        return rows
+
+    last_id = None
+    while True:
+        page = with_retries(lambda: fetch_page(last_id))
+        yield from page
+        if len(page) < PAGE_SIZE:
+            return
+        last_id = page[-1]['id']
+
+
+def fetch_stored_hashes(supabase):
+    """Map of sync_key -> content_hash for every stored row"""
+    return {row['sync_key']: row['content_hash']
+            for row in iter_table_rows(supabase, 'id,sync_key,content_hash', label="hashes")}
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _upsert(supabase, chunk):
+    with span("supabase.upsert", rows=len(chunk)):
+        return supabase.table(MOVIES_TABLE).upsert(
+            chunk, on_conflict='sync_key', returning=ReturnMethod.minimal
+        ).execute()
+
+
+def _delete_all(supabase):
+    with span("supabase.delete_all"):
+        return supabase.table(MOVIES_TABLE).delete().neq('id', 0).execute()
+
+
+def _delete_keys(supabase, keys):
+    with span("supabase.delete", rows=len(keys)):
+        return supabase.table(MOVIES_TABLE).delete(returning=ReturnMethod.minimal).in_('sync_key', keys).execute()
+
+
+def full_reload(supabase, records):
+    """Replace the whole table: delete everything, then write every record"""
     # First delete all existing records
-    supabase.table('nicholas_cage_movies').delete().neq('id', 0).execute()
-    
-    # Then insert new records
-    response = supabase.table('nicholas_cage_movies').insert(records).execute()
-    
-    print(f"Loaded {len(records)} movies to Supabase")
-    
-    verify_response = supabase.table('nicholas_cage_movies').select('*', count='exact').execute()
-    print(f"Total movies in database: {len(verify_response.data)}")
-    
+    with_retries(lambda: _delete_all(supabase))
+
+    # Then write the new records. An upsert rather than an insert, so a chunk retried
+    # after a timeout the server had already committed does not insert it twice
+    writer = ChunkWriter(lambda chunk: _upsert(supabase, chunk))
+    seen = set()
+    try:
+        for record in records:
+            if record['sync_key'] in seen:
+                log(f"Skipping duplicate title {record['sync_key']}")
+                continue
+            seen.add(record['sync_key'])
+            writer.add(record)
+    finally:
+        writer.close()
+
+    count("rows_loaded_total", writer.sent, op="inserted")
+    log(f"Loaded {writer.sent} movies to Supabase")
+
+
+def sync_records(supabase, records):
+    """Upsert only new or changed rows (by content hash) and delete rows missing from the source"""
+    stored = fetch_stored_hashes(supabase)
+
+    # Inserts and updates have different columns, so they go out as separate chunks
+    inserts = ChunkWriter(lambda chunk: _upsert(supabase, chunk))
+    updates = ChunkWriter(lambda chunk: _upsert(supabase, chunk))
+    unchanged = 0
+    seen = set()
+    try:
+        for record in records:
+            key = record['sync_key']
+            if key in seen:
+                log(f"Skipping duplicate title {key}")
+                continue
+            seen.add(key)
+            if key not in stored:
+                inserts.add(record)
+            elif stored[key] != record['content_hash']:
+                # Keep the original extracted_at on rows we already had
+                updates.add({k: v for k, v in record.items() if k != 'extracted_at'})
+            else:
+                unchanged += 1
+    finally:
+        try:
+            inserts.close()
+        finally:
+            updates.close()
+
+    missing = [key for key in stored if key is not None and key not in seen]
+    if None in stored:
+        log("Some stored rows have no sync_key; run the backfill at the top of loader.py")
+    for chunk in _chunks(missing, DELETE_CHUNK_SIZE):
+        with_retries(lambda: _delete_keys(supabase, chunk))
+
+    summary = {
+        'inserted': inserts.sent,
+        'updated': updates.sent,
+        'deleted': len(missing),
+        'unchanged': unchanged,
+    }
+    for op in ('inserted', 'updated', 'deleted'):
+        count("rows_loaded_total", summary[op], op=op)
+    log(f"Sync complete: {summary['inserted']} inserted, {summary['updated']} updated, "
+          f"{summary['deleted']} deleted, {summary['unchanged']} unchanged")
+    return summary
+
+
+def write_aggregates(supabase, records, data_version):
+    """Replace the chart aggregates table with aggregates of the given records (any iterable)"""
+    rows = build_aggregates(records, data_version=data_version, updated_at=datetime.now().isoformat())
+    with span("supabase.aggregates", rows=len(rows)):
+        with_retries(lambda: supabase.table(AGGREGATES_TABLE).upsert(
+            rows, on_conflict='genre', returning=ReturnMethod.minimal
+        ).execute())
+        # Genres no longer in the data
+        genres = [row['genre'] for row in rows]
+        with_retries(lambda: supabase.table(AGGREGATES_TABLE).delete(
+            returning=ReturnMethod.minimal
+        ).not_.in_('genre', genres).execute())
+    log(f"Wrote chart aggregates for {len(rows) - 1} genres")
+
+
+def load_to_supabase(full=False, path=SOURCE_FILE, snapshot=True, aggregates=True):
+    records = iter_prepared_records(path, datetime.now().isoformat())
+    supabase = init_supabase()
+
+    with span("loader.run", mode="full" if full else "sync"):
+        if full:
+            full_reload(supabase, records)
+        else:
+            sync_records(supabase, records)
+
+    log(f"Total movies in database: {count_rows(supabase)}")
+
+    if snapshot or aggregates:
+        # Stamp both with the version the dashboard will see for this load
+        data_version = fetch_data_version(supabase)
+        # Both are read back from the table, like modal_app.bake_snapshot, so they describe exactly
+        # the rows stamped with this data version and the load itself stays streaming
+        if aggregates:
+            # Streamed page by page; only the per-genre sums and top lists are kept
+            write_aggregates(supabase, iter_table_rows(supabase, AGGREGATE_COLUMNS), data_version)
+        if snapshot:
+            write_snapshot(fetch_all_movies(supabase).to_dict("records"), data_version=data_version)
+
     return True
 
 if __name__ == "__main__":
-    print("Nicholas Cage Movies - Supabase Loader")
-    load_to_supabase()
\ No newline at end of file
+    log("Nicholas Cage Movies - Supabase Loader")
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    load_to_supabase(
+        full='--full' in sys.argv[1:],
+        path=args[0] if args else SOURCE_FILE,
+        snapshot='--no-snapshot' not in sys.argv[1:],
+        aggregates='--no-aggregates' not in sys.argv[1:],
+    )
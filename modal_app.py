@@ -1,3 +1,5 @@
+import os
+
 import modal
 
 image = modal.Image.debian_slim().pip_install(
@@ -36,5 +38,88 @@ def run():
     
     subprocess.run(cmd)
 
+
+# Cold-start tuned deployment (`modal deploy modal_app.py` serves both; point users at `serve`):
+# pinned wheels, the movies baked into the image as an Arrow snapshot at deploy time,
+# and serve.py importing pandas/plotly and mapping the snapshot before the port opens.
+# Track it locally with `python benchmarks/bench_cold_start.py`, which launches the same command.
+MIN_CONTAINERS = int(os.getenv("MODAL_MIN_CONTAINERS", "1"))
+CONTAINER_CONCURRENCY = int(os.getenv("MODAL_CONTAINER_CONCURRENCY", "50"))
+SCALEDOWN_WINDOW = int(os.getenv("MODAL_SCALEDOWN_WINDOW", "300"))
+SNAPSHOT_IN_IMAGE = "/data/nicholas_cage_movies.arrow"
+
+APP_MODULES = ["app", "api", "aggregates", "render_cache", "serve", "movie_data", "genre_index", "snapshot", "similarity", "title_index", "instrumentation", "llm_cache"]
+
+
+def bake_snapshot():
+    """Runs during the image build: pull the table from Supabase into the snapshot file"""
+    from movie_data import fetch_all_movies, fetch_data_version, get_supabase_client
+    from snapshot import write_snapshot
+
+    client = get_supabase_client()
+    version = fetch_data_version(client)
+    df = fetch_all_movies(client)
+    os.makedirs(os.path.dirname(SNAPSHOT_IN_IMAGE), exist_ok=True)
+    write_snapshot(df.to_dict("records"), SNAPSHOT_IN_IMAGE, data_version=version)
+
+
+fast_image = (
+    modal.Image.debian_slim(python_version="3.11")
+    .pip_install(
+        "streamlit==1.65.0",
+        "pandas==3.0.6",
+        "numpy==2.4.6",
+        "plotly==7.1.0",
+        "pyarrow==25.0.1",
+        "supabase==2.32.0",
+        "python-dotenv==1.2.4",
+    )
+    .env({
+        "MOVIE_DATA_MODE": "snapshot",
+        "MOVIE_SNAPSHOT": SNAPSHOT_IN_IMAGE,
+    })
+    .add_local_python_source(*APP_MODULES, copy=True)
+    # Precompile so the first import in a new container does not compile anything
+    .run_commands("python -m compileall -q /root")
+    # Rebuilt on every deploy so the baked data is the latest
+    .run_function(bake_snapshot, secrets=[modal.Secret.from_name("my-supabase-secret")], force_build=True)
+)
+
+
+@app.function(
+    image=fast_image,
+    secrets=[modal.Secret.from_name("my-supabase-secret")],
+    timeout=600,
+    min_containers=MIN_CONTAINERS,
+    scaledown_window=SCALEDOWN_WINDOW,
+)
+@modal.concurrent(max_inputs=CONTAINER_CONCURRENCY)
+@modal.web_server(8000, startup_timeout=120)
+def serve():
+    import subprocess
+    import sys
+
+    # Modal routes traffic once port 8000 accepts connections, which serve.py only
+    # opens after the warmup
+    subprocess.Popen([sys.executable, "/root/serve.py", "--port", "8000",
+                      "--browser.serverAddress=0.0.0.0"], cwd="/root")
+
+
+# Read-only JSON query API (see api.py) on the same image, answering from the baked snapshot
+@app.function(
+    image=fast_image,
+    secrets=[modal.Secret.from_name("my-supabase-secret")],
+    min_containers=MIN_CONTAINERS,
+    scaledown_window=SCALEDOWN_WINDOW,
+)
+@modal.concurrent(max_inputs=CONTAINER_CONCURRENCY)
+@modal.wsgi_app()
+def api():
+    from api import application, queries
+
+    # Load the movies and precompute the common responses before the first request
+    queries.current()
+    return application
+
 if __name__ == "__main__":
     app.serve()
\ No newline at end of file
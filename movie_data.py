@@ -0,0 +1,240 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from postgrest.exceptions import APIError
+from supabase import create_client
+from dotenv import load_dotenv
+
+from aggregates import AGGREGATES_TABLE
+from instrumentation import span
+
+load_dotenv()
+
+MOVIES_TABLE = "nicholas_cage_movies"
+
+# How long a cached DataFrame is served before the data version is re-checked
+CACHE_TTL_SECONDS = float(os.getenv("MOVIE_CACHE_TTL", "60"))
+
+# Stay below PostgREST's default max-rows cap (1000) so no page is silently truncated
+PAGE_SIZE = int(os.getenv("MOVIE_PAGE_SIZE", "500"))
+QUERY_WORKERS = int(os.getenv("MOVIE_QUERY_WORKERS", "4"))
+
+# Columns the dashboard needs; id and imdb_rank double as the keyset for pagination
+DASHBOARD_COLUMNS = ["id", "imdb_rank", "title", "imdb_rating", "genres"]
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_supabase_client():
+    """Return the process-wide Supabase client, creating it on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            supabase_url = os.getenv("SUPABASE_URL")
+            supabase_key = os.getenv("SUPABASE_KEY")
+            _client = create_client(supabase_url, supabase_key)
+        return _client
+
+
+def fetch_data_version(client):
+    """Cheap version check: newest updated_at written by loader.py plus the row count"""
+    with span("supabase.data_version"):
+        response = (
+            client.table(MOVIES_TABLE)
+            .select("updated_at", count="exact")
+            .order("updated_at", desc=True)
+            .limit(1)
+            .execute()
+        )
+    latest = response.data[0]["updated_at"] if response.data else None
+    # The count catches deletions, which do not move max(updated_at)
+    return (latest, response.count)
+
+
+def build_movie_query(client, min_rating=None, genres=None, columns="*", count=None):
+    """Turn the sidebar filter state into server-side predicates"""
+    query = client.table(MOVIES_TABLE).select(columns, count=count)
+    if min_rating is not None:
+        query = query.gte("imdb_rating", min_rating)
+    if genres:
+        query = query.overlaps("genres", list(genres))
+    return query
+
+
+def _select_columns(columns):
+    if columns == "*":
+        return columns
+    columns = list(columns)
+    for key in ("imdb_rank", "id"):
+        if key not in columns:
+            columns.append(key)
+    return ",".join(columns)
+
+
+def _fetch_pages(client, min_rating, genres, columns, rank_range=None, page_size=PAGE_SIZE):
+    """Keyset-paginate the ranked rows over (imdb_rank, id), optionally inside a [lo, hi) rank window"""
+    rows = []
+    last = None
+    while True:
+        query = build_movie_query(client, min_rating, genres, columns).not_.is_("imdb_rank", "null")
+        if rank_range is not None:
+            lo, hi = rank_range
+            query = query.gte("imdb_rank", lo)
+            if hi is not None:
+                query = query.lt("imdb_rank", hi)
+        if last is not None:
+            rank, row_id = last
+            query = query.or_(f"imdb_rank.gt.{rank},and(imdb_rank.eq.{rank},id.gt.{row_id})")
+        with span("supabase.page", rank_range=rank_range) as page_span:
+            page = query.order("imdb_rank").order("id").limit(page_size).execute().data
+            page_span.set(rows=len(page))
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        last = (page[-1]["imdb_rank"], page[-1]["id"])
+
+
+def _fetch_unranked(client, min_rating, genres, columns, page_size=PAGE_SIZE):
+    """Rows with no imdb_rank, keyset-paginated by id; they sort after every ranked row"""
+    rows = []
+    last_id = None
+    while True:
+        query = build_movie_query(client, min_rating, genres, columns).is_("imdb_rank", "null")
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        with span("supabase.page", rank_range="unranked") as page_span:
+            page = query.order("id").limit(page_size).execute().data
+            page_span.set(rows=len(page))
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        last_id = page[-1]["id"]
+
+
+def _rank_bounds(client, min_rating, genres):
+    """Matching ranked row count and the lowest/highest imdb_rank, in two one-row queries"""
+    with span("supabase.rank_bounds"):
+        first = (
+            build_movie_query(client, min_rating, genres, "imdb_rank", count="exact")
+            .not_.is_("imdb_rank", "null").order("imdb_rank").limit(1).execute()
+        )
+        if not first.data:
+            return 0, None, None
+        last = (
+            build_movie_query(client, min_rating, genres, "imdb_rank")
+            .not_.is_("imdb_rank", "null").order("imdb_rank", desc=True).limit(1).execute()
+        )
+    return first.count, first.data[0]["imdb_rank"], last.data[0]["imdb_rank"]
+
+
+def fetch_movies(client, min_rating=None, genres=None, columns="*", page_size=PAGE_SIZE,
+                 max_workers=QUERY_WORKERS):
+    """Fetch movies matching the filters, ordered by rank, in keyset-paginated pages
+
+    The rank range is split into windows that are paged through concurrently and
+    stitched back in order; rows with no rank come last, from one more window.
+    """
+    select = _select_columns(columns)
+    empty = pd.DataFrame(columns=None if columns == "*" else list(columns))
+    if "imdb_rating" in empty.columns:
+        empty = empty.astype({"imdb_rating": float})
+
+    count, lo, hi = _rank_bounds(client, min_rating, genres)
+    windows = min(max_workers, -(-count // page_size))
+    if windows <= 1:
+        rows = _fetch_pages(client, min_rating, genres, select, page_size=page_size) if count else []
+        rows += _fetch_unranked(client, min_rating, genres, select, page_size)
+    else:
+        edges = sorted({lo + (hi - lo + 1) * i // windows for i in range(windows)})
+        ranges = list(zip(edges, edges[1:] + [None]))
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            unranked = pool.submit(_fetch_unranked, client, min_rating, genres, select, page_size)
+            pages = pool.map(
+                lambda rank_range: _fetch_pages(client, min_rating, genres, select, rank_range, page_size),
+                ranges,
+            )
+            rows = [row for page in pages for row in page] + unranked.result()
+    return pd.DataFrame(rows) if rows else empty
+
+
+def fetch_all_movies(client):
+    """Fetch the whole movies table ordered by rank"""
+    return fetch_movies(client)
+
+
+def fetch_genre_vocabulary(client):
+    """Every genre that appears in the table, sorted"""
+    df = fetch_movies(client, columns=["genres"])
+    all_genres = set()
+    for genres in df.get("genres", []):
+        if genres:
+            all_genres.update(genres)
+    return sorted(all_genres)
+
+
+def fetch_aggregates(client):
+    """Chart aggregate rows written by loader.py (see aggregates.py), or [] if the table is missing"""
+    with span("supabase.aggregates"):
+        try:
+            return client.table(AGGREGATES_TABLE).select("*").execute().data
+        except APIError:
+            return []
+
+
+class MovieCache:
+    """Process-wide movies DataFrame, refetched only when the data version changes"""
+
+    def __init__(self, ttl=CACHE_TTL_SECONDS, fetch=fetch_all_movies, fetch_version=fetch_data_version):
+        self.ttl = ttl
+        self._fetch = fetch
+        self._fetch_version = fetch_version
+        self._lock = threading.Lock()
+        self._df = None
+        self._version = None
+        self._checked_at = 0.0
+        self._stats = {"hits": 0, "misses": 0, "version_checks": 0, "invalidations": 0}
+
+    def get(self, client=None):
+        """Return (DataFrame, version); the frame is shared, so callers must not mutate it"""
+        client = client or get_supabase_client()
+        with self._lock:
+            now = time.monotonic()
+            if self._df is not None and now - self._checked_at < self.ttl:
+                self._stats["hits"] += 1
+                return self._df, self._version
+
+            version = self._fetch_version(client)
+            self._stats["version_checks"] += 1
+            if self._df is not None and version == self._version:
+                self._checked_at = now
+                self._stats["hits"] += 1
+                return self._df, self._version
+
+            self._stats["misses"] += 1
+            self._df = self._fetch(client)
+            self._version = version
+            self._checked_at = time.monotonic()
+            return self._df, self._version
+
+    def invalidate(self):
+        """Drop the cached frame so the next get() refetches"""
+        with self._lock:
+            self._df = None
+            self._version = None
+            self._checked_at = 0.0
+            self._stats["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+            stats["version"] = self._version
+            return stats
+
+
+movie_cache = MovieCache()
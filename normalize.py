@@ -0,0 +1,130 @@
+import re
+
+# IMDB's genre vocabulary; anything else in raw_genre is left to the LLM
+KNOWN_GENRES = {
+    "Action", "Adult", "Adventure", "Animation", "Biography", "Comedy", "Crime",
+    "Documentary", "Drama", "Family", "Fantasy", "Film-Noir", "Game-Show", "History",
+    "Horror", "Music", "Musical", "Mystery", "News", "Reality-TV", "Romance", "Sci-Fi",
+    "Short", "Sport", "Talk-Show", "Thriller", "War", "Western",
+}
+_GENRE_LOOKUP = {genre.lower(): genre for genre in KNOWN_GENRES}
+_GENRE_LOOKUP.update({"science fiction": "Sci-Fi", "scifi": "Sci-Fi", "film noir": "Film-Noir"})
+
+MISSING = {"", "N/A", "NONE", "NULL"}
+
+_RANK_PREFIX = re.compile(r"^\s*\d{1,5}\.\s+")
+_YEAR = re.compile(r"^\(?(\d{4})(?:[-–]\S*)?\)?$")
+_RATING = re.compile(r"^(\d{1,2}(?:\.\d+)?)(?:\s*/\s*10)?$")
+_RUNTIME = re.compile(r"^(?:(\d+)\s*h)?\s*(?:(\d+)\s*m(?:in)?)?$")
+_ISO_DURATION = re.compile(r"^PT(?:(\d+)H)?(?:(\d+)M)?")
+
+
+class Unresolved(ValueError):
+    pass
+
+
+def _missing(value):
+    return value is None or str(value).strip().upper() in MISSING
+
+
+def normalize_title(value):
+    if _missing(value):
+        raise Unresolved("title")
+    title = _RANK_PREFIX.sub("", str(value)).strip()
+    if not title:
+        raise Unresolved("title")
+    return title
+
+
+def normalize_year(value):
+    if _missing(value):
+        return None
+    match = _YEAR.match(str(value).strip())
+    if not match:
+        raise Unresolved("release_year")
+    return int(match.group(1))
+
+
+def normalize_rating(value):
+    if _missing(value):
+        return None
+    if isinstance(value, (int, float)):
+        rating = float(value)
+    else:
+        match = _RATING.match(str(value).strip())
+        if not match:
+            raise Unresolved("imdb_rating")
+        rating = float(match.group(1))
+    if not 0.0 <= rating <= 10.0:
+        raise Unresolved("imdb_rating")
+    return rating
+
+
+def normalize_runtime(value):
+    if _missing(value):
+        return None
+    match = _RUNTIME.match(str(value).strip())
+    if not match or not any(match.groups()):
+        raise Unresolved("runtime")
+    hours, minutes = match.groups()
+    return f"{int(hours or 0) * 60 + int(minutes or 0)} min"
+
+
+def iso_duration_to_runtime(value):
+    """'PT2H18M' (schema.org duration) -> '138 min'; None if it is not a duration"""
+    match = _ISO_DURATION.match(str(value or ""))
+    if not match or not any(match.groups()):
+        return None
+    hours, minutes = match.groups()
+    return f"{int(hours or 0) * 60 + int(minutes or 0)} min"
+
+
+def normalize_genres(value):
+    if _missing(value):
+        return []
+    genres = []
+    for part in str(value).split(","):
+        genre = _GENRE_LOOKUP.get(part.strip().lower())
+        if genre is None:
+            raise Unresolved("genres")
+        if genre not in genres:
+            genres.append(genre)
+    return genres
+
+
+def normalize_movie(movie):
+    """Rule-based version of what the LLM prompt asks for
+
+    Returns (record, unresolved) where unresolved lists the fields the rules could
+    not handle; the record is only trustworthy when that list is empty.
+    """
+    fields = [
+        ("title", normalize_title, "raw_title"),
+        ("release_year", normalize_year, "raw_year"),
+        ("imdb_rating", normalize_rating, "raw_rating"),
+        ("runtime", normalize_runtime, "raw_runtime"),
+        ("genres", normalize_genres, "raw_genre"),
+    ]
+    record = {"rank": movie["raw_rank"]}
+    unresolved = []
+    for name, normalize, raw_field in fields:
+        try:
+            record[name] = normalize(movie.get(raw_field))
+        except Unresolved:
+            record[name] = None
+            unresolved.append(name)
+    url = movie.get("raw_url")
+    record["imdb_url"] = None if _missing(url) else url
+    return record, unresolved
+
+
+def split_by_confidence(raw_movies):
+    """Normalize what the rules can; return (resolved records, raw rows that need the LLM)"""
+    resolved, ambiguous = [], []
+    for movie in raw_movies:
+        record, unresolved = normalize_movie(movie)
+        if unresolved:
+            ambiguous.append(movie)
+        else:
+            resolved.append(record)
+    return resolved, ambiguous
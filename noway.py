@@ -1,16 +1,79 @@
-from bs4 import BeautifulSoup
 import requests
 import pandas as pd
-import re
 import json
 from openai import OpenAI
-import time
+from concurrent.futures import ThreadPoolExecutor
+from rate_limit import RateLimiter
+from llm_cache import LLMCache, fingerprint
+from normalize import normalize_movie, split_by_confidence
+from enrich import enrich_movies
+from extraction import extract_movies
+from instrumentation import count, log, span
+from snapshot import SNAPSHOT_PATH, write_snapshot
+import os
+import threading
 import sys
 
 # LLM API Configuration
-endpoint = "you know, the API Link"
-api_key = "and that key, too"
-deployment_name = "gpt-4o"
+endpoint = os.getenv("LLM_ENDPOINT", "you know, the API Link")
+api_key = os.getenv("LLM_API_KEY", "and that key, too")
+deployment_name = os.getenv("LLM_MODEL", "gpt-4o")
+
+# LLM concurrency and rate limits (1 keeps batches strictly sequential)
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "90000"))
+LLM_MAX_TOKENS = 3000
+
+# Batches are packed by estimated tokens rather than a fixed row count: prompt plus
+# expected completion up to LLM_BATCH_TOKEN_BUDGET, with the expected completion kept
+# to LLM_COMPLETION_HEADROOM of max_tokens so long rows do not get cut off
+LLM_BATCH_TOKEN_BUDGET = int(os.getenv("LLM_BATCH_TOKEN_BUDGET", "4000"))
+LLM_COMPLETION_HEADROOM = 0.75
+LLM_MAX_BATCH_ROWS = int(os.getenv("LLM_MAX_BATCH_ROWS", "40"))
+
+# Resolve mechanical rows with local rules and only send ambiguous ones to the LLM
+LOCAL_FAST_PATH = os.getenv("LOCAL_FAST_PATH", "1") != "0"
+
+# Write the fetched list page to imdb_page_debug.html
+DEBUG_HTML = os.getenv("DEBUG_HTML", "0") == "1"
+
+# Fill missing year/runtime from each title's detail page
+ENRICH_DETAILS = os.getenv("ENRICH_DETAILS", "1") != "0"
+LLM_TEMPERATURE = 0.1
+
+SYSTEM_MESSAGE = "You are a precise JSON formatter. You always return valid JSON arrays and nothing else. Make sure titles are clean and properly formatted."
+
+BATCH_PROMPT_TEMPLATE = """
+    Please convert this movie data into a clean JSON array. Return ONLY valid JSON, no other text.
+    
+    {movies_text}
+    
+    Required JSON format for each movie:
+    {{
+      "rank": 1,
+      "title": "Clean Movie Title",
+      "release_year": 2023,
+      "imdb_rating": 8.5,
+      "runtime": "136 min",
+      "genres": ["Action", "Drama"],
+      "imdb_url": "full_url"
+    }}
+    
+    Instructions:
+    1. Keep all movies in the order provided by rank
+    2. Clean the titles - remove any extra numbers or symbols at the beginning
+    3. Convert year to number if possible (use null if "N/A" or not a number)
+    4. Convert rating to number if possible (use null if "N/A" or not a number)
+    5. For genres, convert comma-separated strings to arrays
+    6. Preserve the original rank number
+    7. If any field is "N/A", use null instead
+    
+    Return a JSON array of movie objects.
+    """
+
+# Any edit to the prompt changes this version and invalidates cached batch results
+PROMPT_VERSION = fingerprint(SYSTEM_MESSAGE, BATCH_PROMPT_TEMPLATE)[:16]
 
 def setup_client():
     """Setup the OpenAI client with error handling"""
@@ -26,148 +89,45 @@ def setup_client():
         return None
 
 client = setup_client()
+llm_limiter = RateLimiter(LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE)
+llm_cache = LLMCache(prompt_version=PROMPT_VERSION)
+normalize_stats = {"fast_path": 0, "slow_path": 0}
+# Batches run on worker threads, so the shared counters and the calibration are updated under a lock
+stats_lock = threading.Lock()
+batch_stats = {"calls": 0, "rows": 0, "truncated": 0, "invalid": 0, "errors": 0, "splits": 0}
+# Observed / estimated completion tokens, learned from usage so later batches pack tighter or looser
+token_calibration = {"completion_ratio": 1.0}
 
 def debug_print(message):
-    """Helper function to ensure output is flushed immediately"""
-    print(message, flush=True)
+    """Helper function to ensure output is flushed immediately (and traced when instrumentation is on)"""
+    log(message)
 
-def scrape_nicholas_cage_movies():
+def scrape_nicholas_cage_movies(url='https://www.imdb.com/list/ls086744766/'):
     """Scrape ALL Nicholas Cage movies from IMDB list with proper selectors"""
     debug_print("Starting web scraping...")
     
-    url = 'https://www.imdb.com/list/ls086744766/'
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
     }
     
     try:
         debug_print("Making request to IMDB...")
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, "html.parser")
-        movies_list = []
+        with span("scrape.fetch", url=url) as fetch_span:
+            response = requests.get(url, headers=headers, timeout=30)
+            response.raise_for_status()
+            fetch_span.set(status=response.status_code, bytes=len(response.content))
+        count("http_bytes_total", len(response.content), source="imdb_list")
         
         # Debug: Save the HTML to see what we're working with
-        with open('imdb_page_debug.html', 'w', encoding='utf-8') as f:
-            f.write(soup.prettify())
-        debug_print("Saved page HTML to 'imdb_page_debug.html' for inspection")
-        
-        # Try multiple selectors to find the movie containers
-        selectors_to_try = [
-            'div.lister-item',  # Traditional IMDB list selector
-            'li.ipc-metadata-list-summary-item',  # New IMDB selector
-            'div[data-testid="list-item"]',  # Test ID selector
-            'h3 a[href*="/title/tt"]',  # Direct title links
-        ]
-        
-        movie_containers = []
-        for selector in selectors_to_try:
-            found = soup.select(selector)
-            debug_print(f"Selector '{selector}': found {len(found)} items")
-            if found and len(found) > len(movie_containers):
-                movie_containers = found
+        if DEBUG_HTML:
+            with open('imdb_page_debug.html', 'w', encoding='utf-8') as f:
+                f.write(response.text)
+            debug_print("Saved page HTML to 'imdb_page_debug.html' for inspection")
         
-        # If still no containers, try finding by text content
-        if not movie_containers:
-            debug_print("Trying alternative approach - searching for movie links...")
-            # Find all movie title links
-            movie_links = soup.find_all('a', href=re.compile(r'/title/tt\d+'))
-            debug_print(f"Found {len(movie_links)} movie links total")
-            
-            # Filter to get unique movies (avoid duplicates)
-            unique_links = []
-            seen_titles = set()
-            for link in movie_links:
-                title = link.text.strip()
-                if title and title not in seen_titles and len(title) > 2:
-                    seen_titles.add(title)
-                    unique_links.append(link)
-            
-            movie_containers = unique_links
-            debug_print(f"Found {len(movie_containers)} unique movie titles")
-        
-        debug_print(f"Total items to process: {len(movie_containers)}")
-        
-        # Process each movie container
-        for index, container in enumerate(movie_containers, 1):
-            try:
-                debug_print(f"Processing item {index}...")
-                
-                # Extract title based on container type
-                if container.name == 'a':  # Direct link element
-                    movie_title = container.text.strip()
-                    movie_url = "https://www.imdb.com" + container['href']
-                    # Find parent container for additional info
-                    parent = container.find_parent(['div', 'li'])
-                else:  # Container element
-                    title_link = container.find('a', href=re.compile(r'/title/tt'))
-                    if title_link:
-                        movie_title = title_link.text.strip()
-                        movie_url = "https://www.imdb.com" + title_link['href']
-                        parent = container
-                    else:
-                        # Try to extract text content directly
-                        movie_title = container.get_text(strip=True)
-                        movie_url = "N/A"
-                        parent = container
-                
-                if not movie_title or movie_title == '...':
-                    debug_print("Empty title, skipping")
-                    continue
-                
-                debug_print(f"   Title: {movie_title}")
-                
-                # Extract year from the text around the title
-                year_match = re.search(r'\((\d{4})\)', container.get_text())
-                year = year_match.group(1) if year_match else "N/A"
-                
-                # Try to find rating
-                rating_element = (container.find('span', class_='ipl-rating-star__rating') or 
-                                container.find('span', class_=re.compile(r'rating')) or
-                                container.find('div', class_=re.compile(r'rating')))
-                rating = rating_element.text.strip() if rating_element else "N/A"
-                
-                # Try to find additional info from parent
-                runtime = "N/A"
-                genre = "N/A"
-                if parent:
-                    # Look for runtime
-                    runtime_text = parent.get_text()
-                    runtime_match = re.search(r'(\d+h\s*\d*min|\d+\s*min)', runtime_text)
-                    if runtime_match:
-                        runtime = runtime_match.group(1)
-                    
-                    # Look for genre
-                    genre_elem = parent.find('span', class_='genre')
-                    if genre_elem:
-                        genre = genre_elem.text.strip()
-                
-                movies_list.append({
-                    "raw_title": movie_title,
-                    "raw_year": year,
-                    "raw_rating": rating,
-                    "raw_runtime": runtime,
-                    "raw_genre": genre,
-                    "raw_description": "N/A",
-                    "raw_url": movie_url,
-                    "raw_rank": index
-                })
-                
-                debug_print(f"Added: {movie_title} ({year})")
-                
-            except Exception as e:
-                debug_print(f"Error processing item {index}: {e}")
-                continue
-        
-        debug_print(f"Successfully processed {len(movies_list)} movies")
-        
-        # If we still don't have enough movies, try a different approach
-        if len(movies_list) < 50:
-            debug_print("Trying secondary scraping approach...")
-            secondary_movies = scrape_secondary_approach(soup)
-            movies_list.extend(secondary_movies)
-            debug_print(f"Total after secondary approach: {len(movies_list)} movies")
+        with span("scrape.parse") as parse_span:
+            strategy, movies_list = extract_movies(response.text)
+            parse_span.set(strategy=strategy, rows=len(movies_list))
+        debug_print(f"Successfully processed {len(movies_list)} movies (strategy: {strategy})")
         
         return movies_list
         
@@ -175,149 +135,307 @@ def scrape_nicholas_cage_movies():
         debug_print(f"Error in web scraping: {e}")
         return []
 
-def scrape_secondary_approach(soup):
-    """Alternative scraping approach for IMDB lists"""
-    movies_list = []
+def fallback_batch(batch):
+    """Use the raw scraped data when the LLM fails for a batch
     
-    # Look for JSON-LD data (IMDB often stores data this way)
-    script_data = soup.find('script', type='application/ld+json')
-    if script_data:
-        try:
-            data = json.loads(script_data.string)
-            if 'itemListElement' in data:
-                for item in data['itemListElement']:
-                    if 'item' in item:
-                        movie_data = item['item']
-                        movies_list.append({
-                            "raw_title": movie_data.get('name', 'N/A'),
-                            "raw_year": movie_data.get('datePublished', 'N/A'),
-                            "raw_rating": movie_data.get('aggregateRating', {}).get('ratingValue', 'N/A'),
-                            "raw_runtime": "N/A",
-                            "raw_genre": ', '.join(movie_data.get('genre', [])),
-                            "raw_description": "N/A",
-                            "raw_url": movie_data.get('url', 'N/A'),
-                            "raw_rank": item.get('position', len(movies_list) + 1)
-                        })
-        except:
-            pass
-    
-    return movies_list
-
-def process_movies_with_llm(raw_movies, batch_size=15):
-    """Process all movies with LLM, handling them in batches if needed"""
+    These rows are the ones the local rules could not fully parse, so each field goes
+    through the same parsers and whatever they cannot read is left empty (None, or no genres).
+    """
+    count("fallback_batches_total")
+    count("fallback_rows_total", len(batch))
+    fallback = []
+    for movie in batch:
+        record, _ = normalize_movie(movie)
+        record["genres"] = record["genres"] or []
+        fallback.append(record)
+    return fallback
+
+def rank_key(movie):
+    try:
+        return (0, int(movie.get("rank")))
+    except (TypeError, ValueError):
+        return (1, 0)
+
+def process_movies_with_llm(raw_movies, batch_size=None, concurrency=LLM_CONCURRENCY, local_fast_path=LOCAL_FAST_PATH):
+    """Normalize rows locally where the rules are confident, send only the rest to the LLM"""
     if not raw_movies:
         return None
     
-    debug_print(f"Processing {len(raw_movies)} movies with LLM...")
+    if not local_fast_path:
+        return process_batches_with_llm(raw_movies, batch_size, concurrency)
     
-    # If we have many movies, process in batches
-    if len(raw_movies) > batch_size:
-        debug_print(f"Processing in batches of {batch_size}...")
-        all_processed = []
-        
-        for i in range(0, len(raw_movies), batch_size):
-            batch = raw_movies[i:i + batch_size]
-            batch_num = i//batch_size + 1
-            debug_print(f"   Processing batch {batch_num}/{(len(raw_movies)-1)//batch_size + 1}")
-            
-            processed_batch = process_single_batch(batch, batch_num)
-            if processed_batch:
-                all_processed.extend(processed_batch)
-            else:
-                # If LLM fails, use raw data as fallback
-                fallback_batch = [{
-                    "rank": movie["raw_rank"],
-                    "title": movie["raw_title"],
-                    "release_year": movie["raw_year"] if movie["raw_year"] != "N/A" else None,
-                    "imdb_rating": float(movie["raw_rating"]) if movie["raw_rating"] != "N/A" else None,
-                    "runtime": movie["raw_runtime"],
-                    "genres": [movie["raw_genre"]] if movie["raw_genre"] != "N/A" else [],
-                    "imdb_url": movie["raw_url"]
-                } for movie in batch]
-                all_processed.extend(fallback_batch)
-                debug_print(f"Used fallback data for batch {batch_num}")
-            
-            time.sleep(1)  # Rate limiting
-        
-        return all_processed
+    with span("normalize.local", rows=len(raw_movies)):
+        resolved, ambiguous = split_by_confidence(raw_movies)
+    with stats_lock:
+        normalize_stats["fast_path"] += len(resolved)
+        normalize_stats["slow_path"] += len(ambiguous)
+    count("normalized_rows_total", len(resolved), path="local")
+    count("normalized_rows_total", len(ambiguous), path="llm")
+    debug_print(f"Local fast path resolved {len(resolved)} movies; {len(ambiguous)} need the LLM")
+    
+    if not ambiguous:
+        return resolved
+    
+    # Failed batches already fall back to the raw data inside process_batches_with_llm
+    processed = process_batches_with_llm(ambiguous, batch_size, concurrency)
+    return sorted(resolved + processed, key=rank_key)
+
+def normalize_batch(batch, batch_num=1, local_fast_path=LOCAL_FAST_PATH):
+    """Normalize one batch: local rules, the LLM for what is left, raw-data fallback if that fails"""
+    if local_fast_path:
+        resolved, ambiguous = split_by_confidence(batch)
     else:
-        return process_single_batch(raw_movies)
+        resolved, ambiguous = [], list(batch)
+    with stats_lock:
+        normalize_stats["fast_path"] += len(resolved)
+        normalize_stats["slow_path"] += len(ambiguous)
+    count("normalized_rows_total", len(resolved), path="local")
+    count("normalized_rows_total", len(ambiguous), path="llm")
+    
+    processed = []
+    for part, movies in enumerate(pack_batches(ambiguous), 1):
+        label = batch_num if part == 1 and len(movies) == len(ambiguous) else f"{batch_num}.{part}"
+        processed.extend(process_batch_with_retries(movies, label))
+    return sorted(resolved + processed, key=rank_key)
 
-def process_single_batch(movies, batch_num=1):
-    """Process a single batch of movies with LLM"""
-    debug_print(f"Sending batch {batch_num} to LLM ({len(movies)} movies)...")
+def process_batches_with_llm(raw_movies, batch_size=None, concurrency=LLM_CONCURRENCY):
+    """Process all movies with LLM in token-budgeted batches"""
+    debug_print(f"Processing {len(raw_movies)} movies with LLM...")
     
-    # Prepare the data for LLM
-    movies_text = "MOVIE DATA TO PROCESS:\n\n"
-    for movie in movies:
-        movies_text += f"Rank: {movie['raw_rank']}\n"
-        movies_text += f"Title: {movie['raw_title']}\n"
-        movies_text += f"Year: {movie['raw_year']}\n"
-        movies_text += f"Rating: {movie['raw_rating']}\n"
-        movies_text += f"Runtime: {movie['raw_runtime']}\n"
-        movies_text += f"Genre: {movie['raw_genre']}\n"
-        movies_text += f"URL: {movie['raw_url']}\n"
-        movies_text += "---\n"
-    
-    prompt = f"""
-    Please convert this movie data into a clean JSON array. Return ONLY valid JSON, no other text.
+    raw_movies = sorted(raw_movies, key=lambda movie: movie["raw_rank"])
+    batches = list(pack_batches(raw_movies, max_rows=batch_size or LLM_MAX_BATCH_ROWS))
+    debug_print(f"Processing in {len(batches)} batches of up to {LLM_BATCH_TOKEN_BUDGET} tokens "
+                f"({len(raw_movies) / len(batches):.1f} movies each, {max(1, concurrency)} at a time)...")
     
-    {movies_text}
+    def run_batch(batch_num):
+        batch = batches[batch_num - 1]
+        debug_print(f"   Processing batch {batch_num}/{len(batches)}")
+        return process_batch_with_retries(batch, batch_num)
     
-    Required JSON format for each movie:
-    {{
-      "rank": 1,
-      "title": "Clean Movie Title",
-      "release_year": 2023,
-      "imdb_rating": 8.5,
-      "runtime": "136 min",
-      "genres": ["Action", "Drama"],
-      "imdb_url": "full_url"
-    }}
+    # Batches finish in any order; map() hands results back in batch (raw_rank) order
+    batch_nums = range(1, len(batches) + 1)
+    if concurrency <= 1 or len(batches) == 1:
+        results = map(run_batch, batch_nums)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(run_batch, batch_nums))
     
-    Instructions:
-    1. Keep all movies in the order provided by rank
-    2. Clean the titles - remove any extra numbers or symbols at the beginning
-    3. Convert year to number if possible (use null if "N/A" or not a number)
-    4. Convert rating to number if possible (use null if "N/A" or not a number)
-    5. For genres, convert comma-separated strings to arrays
-    6. Preserve the original rank number
-    7. If any field is "N/A", use null instead
+    all_processed = []
+    for processed_batch in results:
+        all_processed.extend(processed_batch)
+    return all_processed
+
+def process_batch_with_retries(movies, batch_num=1):
+    """Send a batch; if the answer is cut off or unparseable, split it in half and retry each half
     
-    Return a JSON array of movie objects.
+    Only a batch that failed outright (API error) or a single row the LLM cannot answer
+    falls back to the raw scraped data.
     """
+    processed, outcome = request_batch(movies, batch_num)
+    if processed is not None:
+        return processed
+    if outcome in ("truncated", "invalid") and len(movies) > 1:
+        with stats_lock:
+            batch_stats["splits"] += 1
+        count("llm_batch_splits_total")
+        middle = len(movies) // 2
+        debug_print(f"Splitting batch {batch_num} ({outcome}) into {middle} + {len(movies) - middle} movies")
+        return (process_batch_with_retries(movies[:middle], f"{batch_num}a") +
+                process_batch_with_retries(movies[middle:], f"{batch_num}b"))
+    debug_print(f"Used fallback data for batch {batch_num}")
+    return fallback_batch(movies)
+
+def batch_cache_input(movies):
+    """The fields the prompt is built from, normalized so cosmetic whitespace does not miss the cache"""
+    fields = ["raw_rank", "raw_title", "raw_year", "raw_rating", "raw_runtime", "raw_genre", "raw_url"]
+    return [{field: str(movie.get(field)).strip() for field in fields} for movie in movies]
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token) used for rate limiting"""
+    return len(text) // 4 + 1
+
+def movie_prompt_text(movie):
+    return (f"Rank: {movie['raw_rank']}\n"
+            f"Title: {movie['raw_title']}\n"
+            f"Year: {movie['raw_year']}\n"
+            f"Rating: {movie['raw_rating']}\n"
+            f"Runtime: {movie['raw_runtime']}\n"
+            f"Genre: {movie['raw_genre']}\n"
+            f"URL: {movie['raw_url']}\n"
+            "---\n")
+
+# Prompt tokens every request pays regardless of how many movies it carries
+PROMPT_OVERHEAD_TOKENS = estimate_tokens(SYSTEM_MESSAGE + BATCH_PROMPT_TEMPLATE + "MOVIE DATA TO PROCESS:\n\n")
+
+def estimate_row_tokens(movie):
+    """(prompt tokens, expected completion tokens) for one movie
     
-    try:
-        response = client.chat.completions.create(
-            model=deployment_name,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a precise JSON formatter. You always return valid JSON arrays and nothing else. Make sure titles are clean and properly formatted."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=0.1,
-            max_tokens=3000  # Increase tokens for larger batches
-        )
+    The completion estimate is the record the prompt asks for, rendered the way
+    models tend to answer (indented JSON), so long titles and genre lists count.
+    """
+    expected = {
+        "rank": movie.get("raw_rank"),
+        "title": movie.get("raw_title"),
+        "release_year": movie.get("raw_year"),
+        "imdb_rating": movie.get("raw_rating"),
+        "runtime": movie.get("raw_runtime"),
+        "genres": str(movie.get("raw_genre")).split(","),
+        "imdb_url": movie.get("raw_url"),
+    }
+    return estimate_tokens(movie_prompt_text(movie)), estimate_tokens(json.dumps(expected, indent=2))
+
+def pack_batches(movies, token_budget=None, max_rows=LLM_MAX_BATCH_ROWS):
+    """Greedily group movies (in order) so each batch fills the token budget without overflowing max_tokens"""
+    token_budget = token_budget or LLM_BATCH_TOKEN_BUDGET
+    completion_budget = int(LLM_MAX_TOKENS * LLM_COMPLETION_HEADROOM)
+    ratio = token_calibration["completion_ratio"]
+    batch, prompt_tokens, completion_tokens = [], PROMPT_OVERHEAD_TOKENS, 0
+    for movie in movies:
+        row_prompt, row_completion = estimate_row_tokens(movie)
+        row_completion = int(row_completion * ratio)
+        if batch and (len(batch) >= max_rows or
+                      completion_tokens + row_completion > completion_budget or
+                      prompt_tokens + completion_tokens + row_prompt + row_completion > token_budget):
+            yield batch
+            batch, prompt_tokens, completion_tokens = [], PROMPT_OVERHEAD_TOKENS, 0
+        batch.append(movie)
+        prompt_tokens += row_prompt
+        completion_tokens += row_completion
+    if batch:
+        yield batch
+
+def request_batch(movies, batch_num=1):
+    """One LLM call for a batch: (parsed movies or None, outcome)
+    
+    outcome is "cached", "ok", "truncated" (hit max_tokens), "invalid" (unparseable
+    or missing rows) or "error" (the request itself failed).
+    """
+    debug_print(f"Sending batch {batch_num} to LLM ({len(movies)} movies)...")
+    
+    # Prepare the data for LLM
+    movies_text = "MOVIE DATA TO PROCESS:\n\n" + "".join(movie_prompt_text(movie) for movie in movies)
+    
+    prompt = BATCH_PROMPT_TEMPLATE.format(movies_text=movies_text)
+    
+    cache_key = llm_cache.key(batch_cache_input(movies), deployment_name, LLM_TEMPERATURE)
+    with span("llm.batch", batch=batch_num, rows=len(movies)) as batch_span:
+        cached = llm_cache.get(cache_key)
+        count("llm_cache_lookups_total", result="miss" if cached is None else "hit")
+        if cached is not None:
+            batch_span.set(cached=True)
+            debug_print(f"Batch {batch_num} served from LLM cache: {len(cached)} movies")
+            return cached, "cached"
+        
+        try:
+            # Providers count max_tokens against the TPM budget up front
+            with span("llm.rate_limit_wait"):
+                llm_limiter.acquire(estimate_tokens(SYSTEM_MESSAGE + prompt) + LLM_MAX_TOKENS)
+            with span("llm.request", batch=batch_num):
+                response = client.chat.completions.create(
+                    model=deployment_name,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": SYSTEM_MESSAGE
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    temperature=LLM_TEMPERATURE,
+                    max_tokens=LLM_MAX_TOKENS
+                )
+        except Exception as e:
+            return batch_outcome(batch_span, batch_num, movies, "error", f"{type(e).__name__}: {e}")
+        record_usage(response, batch_span)
         
-        result = response.choices[0].message.content
+        choice = response.choices[0]
+        usage = getattr(response, "usage", None)
+        calibrate(movies, usage.completion_tokens if usage else None, choice.finish_reason == "length")
+        result = choice.message.content or ""
         debug_print(f"LLM response received for batch {batch_num}")
+        if choice.finish_reason == "length":
+            return batch_outcome(batch_span, batch_num, movies, "truncated", "output hit max_tokens")
         
         # Clean the response (remove markdown code blocks if present)
         cleaned_result = result.replace('```json', '').replace('```', '').strip()
         
         # Parse JSON
-        parsed_data = json.loads(cleaned_result)
-        debug_print(f"Batch {batch_num} processed successfully: {len(parsed_data)} movies")
-        return parsed_data
+        try:
+            parsed_data = json.loads(cleaned_result)
+        except ValueError as e:
+            return batch_outcome(batch_span, batch_num, movies, "invalid", f"unparseable JSON: {e}")
+        if not isinstance(parsed_data, list) or len(parsed_data) != len(movies):
+            got = len(parsed_data) if isinstance(parsed_data, list) else type(parsed_data).__name__
+            return batch_outcome(batch_span, batch_num, movies, "invalid", f"expected {len(movies)} movies, got {got}")
         
-    except Exception as e:
-        debug_print(f"Error processing batch {batch_num}: {e}")
-        return None
+        debug_print(f"Batch {batch_num} processed successfully: {len(parsed_data)} movies")
+        llm_cache.put(cache_key, parsed_data)
+        batch_outcome(batch_span, batch_num, movies, "ok")
+        return parsed_data, "ok"
+
+def calibrate(movies, completion_tokens, truncated):
+    """Nudge the completion estimate toward what the provider reported for this batch"""
+    estimated = sum(estimate_row_tokens(movie)[1] for movie in movies)
+    if not estimated or not completion_tokens:
+        return
+    observed = completion_tokens / estimated
+    with stats_lock:
+        ratio = token_calibration["completion_ratio"]
+        if truncated:
+            # The real answer was longer than completion_tokens; never estimate below that
+            ratio = max(ratio, observed * 1.1)
+        else:
+            ratio = 0.8 * ratio + 0.2 * observed
+        token_calibration["completion_ratio"] = min(4.0, max(0.5, ratio))
+
+def batch_outcome(batch_span, batch_num, movies, outcome, error=None):
+    """Record one LLM call in batch_stats and the metrics; returns the failed-call result"""
+    with stats_lock:
+        batch_stats["calls"] += 1
+        batch_stats["rows"] += len(movies)
+        if outcome == "truncated":
+            batch_stats["truncated"] += 1
+        elif outcome == "invalid":
+            batch_stats["invalid"] += 1
+        elif outcome == "error":
+            batch_stats["errors"] += 1
+    count("llm_batches_total", outcome=outcome)
+    count("llm_batch_rows_total", len(movies))
+    if error:
+        batch_span.set(error=error)
+        debug_print(f"Error processing batch {batch_num}: {error}")
+    return None, outcome
+
+def record_usage(response, batch_span):
+    """Count the prompt/completion tokens the provider reports for one call"""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    prompt_tokens = usage.prompt_tokens or 0
+    completion_tokens = usage.completion_tokens or 0
+    count("llm_prompt_tokens_total", prompt_tokens)
+    count("llm_completion_tokens_total", completion_tokens)
+    batch_span.set(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+def print_summary(raw_count, processed_movies):
+    debug_print("PROCESSING SUMMARY:")
+    debug_print(f"   Raw movies scraped: {raw_count}")
+    debug_print(f"   Movies normalized: {len(processed_movies)}")
+    debug_print(f"   Fast path (local rules): {normalize_stats['fast_path']}, "
+                f"slow path (LLM): {normalize_stats['slow_path']}")
+    calls = batch_stats["calls"]
+    if calls:
+        debug_print(f"   LLM calls: {calls}, {batch_stats['rows'] / calls:.1f} movies per call, "
+                    f"{batch_stats['truncated'] / calls:.0%} truncated, {batch_stats['splits']} batches split")
+    stats = llm_cache.stats
+    debug_print(f"   LLM cache: {stats['hits']} hits / {stats['misses']} misses "
+                f"({llm_cache.hit_rate():.0%} hit rate), {stats['evictions']} evicted")
+    
+    debug_print("FIRST 5 PROCESSED MOVIES:")
+    for movie in processed_movies[:5]:
+        debug_print(f"   {movie.get('rank')}. {movie.get('title')} ({movie.get('release_year')}) - Rating: {movie.get('imdb_rating')}")
 
 def main():
     debug_print("Starting Nicholas Cage Movie Scraper with LLM Processing...")
@@ -339,8 +457,12 @@ def main():
     debug_print(f"Scraped {len(raw_movies)} raw movies")
     
     # Step 2: Process with LLM (ALL movies)
-    debug_print("Step 2: Processing ALL movies with LLM...")
-    processed_movies = process_movies_with_llm(raw_movies, batch_size=15)
+    debug_print("Step 2: Normalizing ALL movies (local rules, LLM for the rest)...")
+    processed_movies = process_movies_with_llm(raw_movies)
+    
+    if processed_movies and ENRICH_DETAILS:
+        debug_print("Step 2b: Enriching missing year/runtime from title pages...")
+        enrich_movies(processed_movies)
     
     # Step 3: Save results
     debug_print("Step 3: Saving results...")
@@ -357,17 +479,11 @@ def main():
         
         df = pd.DataFrame(processed_movies)
         df.to_csv('nicholas_cage_processed_movies.csv', index=False)
+        write_snapshot(processed_movies)
         
         debug_print(f"Processed data saved: {len(processed_movies)} movies")
         
-        # Display summary
-        debug_print("PROCESSING SUMMARY:")
-        debug_print(f"   Raw movies scraped: {len(raw_movies)}")
-        debug_print(f"   Movies processed by LLM: {len(processed_movies)}")
-        
-        debug_print("FIRST 5 PROCESSED MOVIES:")
-        for movie in processed_movies[:5]:
-            debug_print(f"   {movie.get('rank')}. {movie.get('title')} ({movie.get('release_year')}) - Rating: {movie.get('imdb_rating')}")
+        print_summary(len(raw_movies), processed_movies)
     
     else:
         debug_print("No movies were processed by LLM")
@@ -377,11 +493,17 @@ def main():
     debug_print("   - nicholas_cage_raw_movies.json")
     debug_print("   - nicholas_cage_processed_movies.json")
     debug_print("   - nicholas_cage_processed_movies.csv")
-    debug_print("   - imdb_page_debug.html (for troubleshooting)")
+    debug_print(f"   - {SNAPSHOT_PATH} (columnar snapshot for the dashboard)")
+    if DEBUG_HTML:
+        debug_print("   - imdb_page_debug.html (for troubleshooting)")
 
 if __name__ == "__main__":
     try:
-        main()
+        if "--stream" in sys.argv[1:]:
+            from pipeline import run_pipeline
+            run_pipeline(fresh="--fresh" in sys.argv[1:])
+        else:
+            main()
     except KeyboardInterrupt:
         debug_print("Script interrupted by user")
     except Exception as e:
@@ -0,0 +1,219 @@
+"""Scrape many IMDB lists (several actors, curated lists) into one partitioned dataset
+
+The manifest names the lists:
+
+    {"lists": [
+        {"id": "ls086744766", "actor": "Nicolas Cage"},
+        {"id": "ls000000001", "actor": "Nicolas Cage", "name": "Cult classics"}
+    ]}
+
+Lists are scraped concurrently, each following its pagination, and every IMDB
+request (list pages and title pages alike) goes through one DetailFetcher, so
+one per-host rate limit covers the whole run. Titles are deduped by tt id
+across lists before normalization and enrichment, so a title in five lists is
+sent to the LLM and fetched once.
+
+Output, one JSON array per list in the same record format noway.py writes:
+
+    dataset/manifest.json
+    dataset/actor=nicolas-cage/list=ls086744766.json
+
+A partition's rank is the title's position in that list. Unchanged partitions
+are not rewritten. `python loader.py dataset/` syncs the whole dataset, ranking
+titles across all lists in manifest order and keeping each title's actors and
+list positions in their own columns.
+
+Usage: python orchestrator.py [manifest.json] [--out dataset]
+"""
+import json
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from enrich import DetailFetcher, enrich_movies
+from extraction import extract_movies, next_page_url
+from instrumentation import count, span
+from llm_cache import fingerprint
+from noway import ENRICH_DETAILS, debug_print, process_movies_with_llm
+
+MANIFEST_FILE = os.getenv("SCRAPE_MANIFEST", "manifest.json")
+DATASET_DIR = os.getenv("DATASET_DIR", "dataset")
+IMDB_LIST_URL = os.getenv("IMDB_LIST_URL", "https://www.imdb.com/list/{list_id}/")
+LIST_CONCURRENCY = int(os.getenv("LIST_CONCURRENCY", "4"))
+MAX_LIST_PAGES = int(os.getenv("MAX_LIST_PAGES", "100"))
+
+_TITLE_ID = re.compile(r'tt\d+')
+
+
+def load_manifest(path=MANIFEST_FILE):
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    lists = manifest.get("lists", []) if isinstance(manifest, dict) else manifest
+    for entry in lists:
+        if not entry.get("id"):
+            raise ValueError(f"Manifest entry without an id: {entry}")
+        entry.setdefault("actor", "unknown")
+    return lists
+
+
+def slug(text):
+    return re.sub(r'[^a-z0-9]+', '-', str(text).lower()).strip('-') or 'unknown'
+
+
+def title_id(url):
+    match = _TITLE_ID.search(url or '')
+    return match.group(0) if match else None
+
+
+def scrape_list(entry, fetcher, max_pages=MAX_LIST_PAGES):
+    """Raw movies of one list in list order, following its pages; raw_rank is the position in the list"""
+    url = entry.get("url") or IMDB_LIST_URL.format(list_id=entry["id"])
+    movies = []
+    seen = set()
+    pages = 0
+    with span("orchestrator.list", list=entry["id"]) as list_span:
+        while url and pages < max_pages:
+            html = fetcher.fetch(url, source="imdb_list")
+            if not html:
+                break
+            pages += 1
+            strategy, page_movies = extract_movies(html)
+            new = 0
+            for movie in page_movies:
+                key = title_id(movie.get("raw_url")) or movie.get("raw_title")
+                if key in seen:
+                    continue
+                seen.add(key)
+                movie["raw_rank"] = len(movies) + 1
+                movies.append(movie)
+                new += 1
+            # A page with nothing new means the list is looping back on itself
+            url = next_page_url(html, url) if new else None
+        list_span.set(pages=pages, rows=len(movies))
+    debug_print(f"List {entry['id']} ({entry['actor']}): {len(movies)} movies over {pages} pages")
+    return movies
+
+
+def scrape_lists(lists, fetcher, concurrency=LIST_CONCURRENCY):
+    """{list id: raw movies}; lists run concurrently, the fetcher's rate limit is shared"""
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        results = pool.map(lambda entry: scrape_list(entry, fetcher), lists)
+        return {entry["id"]: movies for entry, movies in zip(lists, results)}
+
+
+def unique_titles(scraped):
+    """First occurrence of every title across all lists (by tt id), renumbered 1..n"""
+    unique = {}
+    total = 0
+    for movies in scraped.values():
+        for movie in movies:
+            total += 1
+            key = title_id(movie.get("raw_url")) or movie.get("raw_title")
+            if key not in unique:
+                unique[key] = dict(movie, raw_rank=len(unique) + 1)
+    count("orchestrator_titles_total", total, kind="listed")
+    count("orchestrator_titles_total", len(unique), kind="unique")
+    return unique
+
+
+def normalize_titles(unique, fetcher, enrich=ENRICH_DETAILS):
+    """{tt id: normalized record}; each unique title is normalized and enriched once"""
+    raw = list(unique.values())
+    processed = process_movies_with_llm(raw) or []
+    if processed and enrich:
+        enrich_movies(processed, fetcher)
+
+    # Map back by tt id, or by the rank we sent when the answer lost the URL
+    by_rank = {movie["raw_rank"]: key for key, movie in unique.items()}
+    normalized = {}
+    for record in processed:
+        key = title_id(record.get("imdb_url"))
+        if key not in unique:
+            key = by_rank.get(record.get("rank"))
+        if key is not None:
+            normalized[key] = record
+    return normalized
+
+
+def partition_records(movies, normalized):
+    """One list's records: the normalized title with the rank it has in this list"""
+    records = []
+    for movie in movies:
+        key = title_id(movie.get("raw_url")) or movie.get("raw_title")
+        if key in normalized:
+            record = dict(normalized[key], rank=movie["raw_rank"])
+            if key.startswith("tt"):
+                record["imdb_url"] = f"https://www.imdb.com/title/{key}/"
+            records.append(record)
+    return records
+
+
+def partition_path(entry):
+    return os.path.join(f"actor={slug(entry['actor'])}", f"list={entry['id']}.json")
+
+
+def write_dataset(lists, scraped, normalized, out_dir=DATASET_DIR):
+    """Write one partition per list plus manifest.json; partitions whose content is unchanged are left alone"""
+    previous = {}
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            previous = {part["path"]: part for part in json.load(f).get("partitions", [])}
+
+    partitions = []
+    written = 0
+    for entry in lists:
+        records = partition_records(scraped.get(entry["id"], []), normalized)
+        path = partition_path(entry)
+        version = fingerprint(records)[:16]
+        full_path = os.path.join(out_dir, path)
+        if previous.get(path, {}).get("content_version") != version or not os.path.exists(full_path):
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(records, f, indent=2, ensure_ascii=False)
+            os.replace(full_path + ".tmp", full_path)
+            written += 1
+        partitions.append({
+            "path": path,
+            "actor": entry["actor"],
+            "list": entry["id"],
+            "name": entry.get("name"),
+            "rows": len(records),
+            "content_version": version,
+        })
+
+    manifest = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "titles": len(normalized),
+        "partitions": partitions,
+    }
+    with open(manifest_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    debug_print(f"Dataset {out_dir}: {len(partitions)} partitions ({written} rewritten), "
+                f"{len(normalized)} unique titles")
+    return manifest
+
+
+def run(manifest_path=MANIFEST_FILE, out_dir=DATASET_DIR, fetcher=None):
+    lists = load_manifest(manifest_path)
+    fetcher = fetcher or DetailFetcher()
+    debug_print(f"Scraping {len(lists)} lists, {LIST_CONCURRENCY} at a time...")
+    with span("orchestrator.run", lists=len(lists)):
+        scraped = scrape_lists(lists, fetcher)
+        unique = unique_titles(scraped)
+        listed = sum(len(movies) for movies in scraped.values())
+        debug_print(f"{listed} list entries, {len(unique)} unique titles")
+        normalized = normalize_titles(unique, fetcher)
+        return write_dataset(lists, scraped, normalized, out_dir)
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    out = DATASET_DIR
+    if "--out" in sys.argv[1:]:
+        out = sys.argv[sys.argv.index("--out") + 1]
+        args = [arg for arg in args if arg != out]
+    run(args[0] if args else MANIFEST_FILE, out)
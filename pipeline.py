@@ -0,0 +1,200 @@
+"""Streaming scrape -> normalize -> save pipeline with checkpoint/resume
+
+Each stage is a generator. Normalized batches are appended to a JSONL file as
+they complete, and a run journal records which batches are finished, so a rerun
+after a crash or Ctrl-C only processes the batches that are still missing.
+The JSON and CSV exports are produced from the JSONL at the end.
+
+Usage: python pipeline.py [--fresh]    (or: python noway.py --stream [--fresh])
+"""
+import json
+import os
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import pandas as pd
+
+from enrich import DetailFetcher, enrich_movies
+from instrumentation import span
+from snapshot import write_snapshot
+from llm_cache import fingerprint
+from noway import (
+    ENRICH_DETAILS,
+    LLM_CONCURRENCY,
+    batch_cache_input,
+    debug_print,
+    normalize_batch,
+    print_summary,
+    scrape_nicholas_cage_movies,
+)
+
+LIST_URL = 'https://www.imdb.com/list/ls086744766/'
+BATCH_SIZE = 15
+
+RAW_JSONL = 'nicholas_cage_raw_movies.jsonl'
+PROCESSED_JSONL = 'nicholas_cage_processed_movies.jsonl'
+JOURNAL_FILE = 'nicholas_cage_run_journal.jsonl'
+RAW_JSON = 'nicholas_cage_raw_movies.json'
+PROCESSED_JSON = 'nicholas_cage_processed_movies.json'
+PROCESSED_CSV = 'nicholas_cage_processed_movies.csv'
+
+
+def _append_line(f, entry):
+    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def _read_jsonl(path):
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # A line cut short by a crash; its batch is not in the journal anyway
+                continue
+
+
+class RunJournal:
+    """Append-only record of finished batches: {"batch": id, "run": run id, "rows": n}"""
+
+    def __init__(self, path=JOURNAL_FILE):
+        self.path = path
+        self.done = {entry["batch"]: entry["run"] for entry in _read_jsonl(path)}
+
+    def is_done(self, batch_id):
+        return batch_id in self.done
+
+    def mark_done(self, batch_id, run_id, rows):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            _append_line(f, {"batch": batch_id, "run": run_id, "rows": rows})
+            f.flush()
+            os.fsync(f.fileno())
+        self.done[batch_id] = run_id
+
+
+def scrape_stage(url=LIST_URL, raw_path=RAW_JSONL):
+    """Yield raw movies as they are scraped, mirroring them to the raw JSONL"""
+    with open(raw_path, 'w', encoding='utf-8') as f:
+        for movie in scrape_nicholas_cage_movies(url):
+            _append_line(f, movie)
+            yield movie
+
+
+def batch_stage(movies, batch_size=BATCH_SIZE, seen=None):
+    """Group movies into batches identified by a hash of their content"""
+    def identify(batch):
+        batch_id = fingerprint(batch_cache_input(batch))[:16]
+        if seen is not None:
+            seen.add(batch_id)
+        return batch_id
+
+    batch = []
+    for movie in movies:
+        batch.append(movie)
+        if len(batch) == batch_size:
+            yield identify(batch), batch
+            batch = []
+    if batch:
+        yield identify(batch), batch
+
+
+def normalize_stage(batches, journal, concurrency=LLM_CONCURRENCY, enrich=ENRICH_DETAILS):
+    """Normalize (and enrich) batches concurrently, skipping batches the journal has; yields as they finish"""
+    fetcher = DetailFetcher() if enrich else None
+    stats = {"skipped": 0}
+
+    def work(batch_num, batch):
+        records = normalize_batch(batch, batch_num)
+        if fetcher is not None:
+            with span("pipeline.enrich", batch=batch_num, rows=len(records)):
+                enrich_movies(records, fetcher)
+        return records
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        pending = {}
+        for batch_num, (batch_id, batch) in enumerate(batches, 1):
+            if journal.is_done(batch_id):
+                stats["skipped"] += 1
+                continue
+            while len(pending) >= max(1, concurrency):
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+            pending[pool.submit(work, batch_num, batch)] = batch_id
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+
+    debug_print(f"Skipped {stats['skipped']} batches already completed by an earlier run")
+
+
+def write_stage(results, journal, run_id, out_path=PROCESSED_JSONL):
+    """Append each finished batch to the JSONL, then journal it"""
+    with open(out_path, 'a', encoding='utf-8') as f:
+        for batch_id, records in results:
+            with span("pipeline.checkpoint", batch=batch_id, rows=len(records)):
+                for record in records:
+                    _append_line(f, {"batch": batch_id, "run": run_id, "movie": record})
+                f.flush()
+                os.fsync(f.fileno())
+                journal.mark_done(batch_id, run_id, len(records))
+            debug_print(f"Checkpointed batch {batch_id} ({len(records)} movies)")
+            yield records
+
+
+def export(journal, batch_ids, processed_path=PROCESSED_JSONL, raw_path=RAW_JSONL):
+    """Build the JSON and CSV exports from the JSONL files in one read each"""
+    raw_movies = list(_read_jsonl(raw_path))
+    with open(RAW_JSON, 'w', encoding='utf-8') as f:
+        json.dump(raw_movies, f, indent=2, ensure_ascii=False)
+
+    # Only keep the journaled write of batches in the current scrape; partial writes
+    # from crashed runs and batches the list no longer contains are dropped
+    processed = [
+        entry["movie"] for entry in _read_jsonl(processed_path)
+        if entry["batch"] in batch_ids and journal.done.get(entry["batch"]) == entry["run"]
+    ]
+    processed.sort(key=lambda movie: (movie.get("rank") is None, movie.get("rank") or 0))
+    with open(PROCESSED_JSON, 'w', encoding='utf-8') as f:
+        json.dump(processed, f, indent=2, ensure_ascii=False)
+    pd.DataFrame(processed).to_csv(PROCESSED_CSV, index=False)
+    write_snapshot(processed)
+    return raw_movies, processed
+
+
+def run_pipeline(url=LIST_URL, fresh=False):
+    debug_print("Starting streaming pipeline (scrape -> normalize -> save)...")
+    if fresh:
+        for path in (JOURNAL_FILE, PROCESSED_JSONL):
+            if os.path.exists(path):
+                os.remove(path)
+
+    journal = RunJournal()
+    run_id = uuid.uuid4().hex[:12]
+
+    batch_ids = set()
+    batches = batch_stage(scrape_stage(url), seen=batch_ids)
+    written = write_stage(normalize_stage(batches, journal), journal, run_id)
+    new_rows = sum(len(records) for records in written)
+    if not batch_ids:
+        debug_print("No movies scraped. Exiting.")
+        return None
+    debug_print(f"Normalized {new_rows} movies in this run")
+
+    raw_movies, processed = export(journal, batch_ids)
+    debug_print(f"Exported {len(processed)} movies to {PROCESSED_JSON} and {PROCESSED_CSV}")
+    print_summary(len(raw_movies), processed)
+    return processed
+
+
+if __name__ == "__main__":
+    try:
+        run_pipeline(fresh="--fresh" in sys.argv[1:])
+    except KeyboardInterrupt:
+        debug_print("Interrupted; finished batches are checkpointed, rerun to resume")
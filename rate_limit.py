@@ -0,0 +1,51 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at rate_per_minute
+
+    Callers reserve tokens up front; when the bucket runs dry the balance goes
+    negative and the caller is told how long to wait, so concurrent callers
+    queue up fairly instead of spinning.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        """Take amount tokens and return the seconds to wait before using them"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, amount=1):
+        wait = self.reserve(amount)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits enforced together"""
+
+    def __init__(self, requests_per_minute, tokens_per_minute=None):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def acquire(self, tokens=0):
+        wait = self.requests.reserve(1)
+        if self.tokens is not None and tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        if wait > 0:
+            time.sleep(wait)
+        return wait
@@ -0,0 +1,101 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from instrumentation import count
+
+# Memory budget for finished figures and tables, shared by every session in the process
+RENDER_CACHE_BYTES = int(float(os.getenv("RENDER_CACHE_MB", "64")) * 1024 * 1024)
+
+# Slider step of the minimum rating; keys are rounded to it so 6.300000000000001 == 6.3
+RATING_STEP = 0.1
+
+
+def render_key(data_version, min_rating, genres):
+    """Cache key for a filter state: the data version, the rounded rating and the sorted genres"""
+    steps = int(round((min_rating or 0.0) / RATING_STEP))
+    return (data_version, steps, tuple(sorted(set(genres or ()))))
+
+
+def estimate_size(value):
+    """Rough size in bytes of a cached view: figures by their JSON, frames by their memory use"""
+    from plotly.basedatatypes import BaseFigure
+
+    if isinstance(value, BaseFigure):
+        return len(value.to_json(validate=False))
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class RenderCache:
+    """Process-wide LRU of rendered views (figures and tables) keyed by filter state
+
+    Entries are evicted least recently used first once their estimated size
+    passes max_bytes. Cached figures and frames are shared between sessions,
+    so callers must not mutate them.
+    """
+
+    def __init__(self, max_bytes=RENDER_CACHE_BYTES, sizeof=estimate_size, metric="render_cache"):
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._metric = metric
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key, build):
+        """Return the view for key, calling build() to make it on a miss"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                count(f"{self._metric}_total", result="hit")
+                return self._entries[key][0]
+            self._stats["misses"] += 1
+        count(f"{self._metric}_total", result="miss")
+
+        # Built outside the lock so a slow view does not block hits for other sessions
+        value = build()
+        self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        size = self._sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self._stats["evictions"] += 1
+                count(f"{self._metric}_evictions_total")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+            return stats
+
+
+render_cache = RenderCache()
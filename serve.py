@@ -0,0 +1,133 @@
+"""Start the dashboard with heavy imports and data warmed before the port opens
+
+Usage: python serve.py [--port 8501] [extra streamlit flags...]
+
+`streamlit run app.py` only imports pandas/plotly and loads the movies when the
+first session runs the script. Here that happens in the server process before
+Streamlit starts listening; app.py then runs in the same process, so the first
+visitor reuses the imported modules and the process-wide data caches.
+"""
+import importlib
+import json
+import os
+import sys
+import time
+
+from instrumentation import log, span
+
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+PORT = int(os.getenv("PORT", "8501"))
+
+# Module-level imports of app.py and the modules behind st.plotly_chart/st.dataframe
+WARM_MODULES = [
+    "numpy",
+    "pandas",
+    "pyarrow",
+    "plotly.express",
+    "plotly.io",
+    "supabase",
+    "streamlit",
+    "aggregates",
+    "genre_index",
+    "render_cache",
+    "movie_data",
+    "similarity",
+    "snapshot",
+    "title_index",
+]
+
+STREAMLIT_FLAGS = [
+    "--server.headless=true",
+    "--server.fileWatcherType=none",
+    "--server.enableCORS=false",
+    "--server.enableXsrfProtection=false",
+    "--browser.gatherUsageStats=false",
+]
+
+
+def warm_imports():
+    timings = {}
+    for name in WARM_MODULES:
+        start = time.perf_counter()
+        with span("serve.import", module=name):
+            importlib.import_module(name)
+        timings[name] = round(time.perf_counter() - start, 4)
+    return timings
+
+
+def warm_charts():
+    """Plotly loads its templates and validators on the first figure, not on import
+
+    The figures are built the way app.render_views builds them: a px.bar over the
+    aggregates' folded rating bins, styled the same, and the genre pie.
+    """
+    import pandas as pd
+    import plotly.express as px
+
+    from aggregates import display_bins, rating_histogram
+
+    starts, counts = display_bins(rating_histogram([5.0, 7.5]))
+    fig_hist = px.bar(x=starts + 0.25, y=counts, labels={"x": "imdb_rating", "y": "count"},
+                      color_discrete_sequence=["#FF4B4B"])
+    fig_hist.update_traces(marker=dict(line=dict(width=2, color="DarkSlateGrey")))
+    fig_hist.update_layout(bargap=0, plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)",
+                           font=dict(color="white"))
+    fig_hist.to_json()
+    genre_df = pd.DataFrame({"Genre": ["Drama", "Action"], "Count": [1, 1]})
+    px.pie(genre_df, values="Count", names="Genre", color_discrete_sequence=px.colors.qualitative.Set3).to_json()
+
+
+def warm_data():
+    """Load the movies into the same process-wide caches app.py reads from"""
+    mode = os.getenv("MOVIE_DATA_MODE", "cache")
+    if mode == "snapshot":
+        from snapshot import SNAPSHOT_PATH, open_snapshot
+        snapshot = open_snapshot(SNAPSHOT_PATH)
+        if snapshot is None:
+            return f"no snapshot at {SNAPSHOT_PATH}"
+        snapshot.dashboard_frame()
+        snapshot.genre_index()
+        return f"snapshot {snapshot.content_version} ({snapshot.table.num_rows} movies)"
+    if mode == "cache":
+        from movie_data import movie_cache
+        df, version = movie_cache.get()
+        return f"cache ({len(df)} movies)"
+    return f"{mode} mode loads per query"
+
+
+def warm_up():
+    report = {"imports": {}, "started": time.time()}
+    start = time.perf_counter()
+    report["imports"] = warm_imports()
+    step = time.perf_counter()
+    warm_charts()
+    report["charts"] = round(time.perf_counter() - step, 4)
+    step = time.perf_counter()
+    try:
+        with span("serve.warm_data"):
+            report["data_source"] = warm_data()
+    except Exception as e:
+        # The dashboard can still start and load on the first session
+        report["data_source"] = f"failed: {e}"
+    report["data"] = round(time.perf_counter() - step, 4)
+    report["total"] = round(time.perf_counter() - start, 4)
+    log("WARMUP " + json.dumps(report))
+    return report
+
+
+def main(argv):
+    port = PORT
+    if "--port" in argv:
+        index = argv.index("--port")
+        port = int(argv[index + 1])
+        argv = argv[:index] + argv[index + 2:]
+
+    warm_up()
+
+    from streamlit.web import cli
+    sys.argv = ["streamlit", "run", APP_SCRIPT, f"--server.port={port}", *STREAMLIT_FLAGS, *argv]
+    cli.main()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
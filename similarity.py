@@ -0,0 +1,119 @@
+"""Movie similarity for Cage Match: feature vectors, blocked all-pairs cosine and top-k neighbors
+
+A movie's vector is its genres (multi-hot, scaled to unit length) next to its
+standardized rating and year, each part weighted. Rows are normalized, so the
+cosine similarity of two movies is the dot product of their rows.
+
+All pairs are scored as features[block] @ features.T over blocks of rows sized
+to SIMILARITY_BLOCK_MB, keeping only each row's top k, so memory stays at one
+block of scores however large the catalog is. snapshot.py stores the result
+next to the movies, and a lookup is then a read of k entries.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+NEIGHBORS_K = int(os.getenv("MOVIE_NEIGHBORS_K", "10"))
+SIMILARITY_BLOCK_MB = float(os.getenv("SIMILARITY_BLOCK_MB", "64"))
+SIMILARITY_WORKERS = int(os.getenv("SIMILARITY_WORKERS", str(os.cpu_count() or 1)))
+
+# Relative weight of each part of the vector; the genre part has unit length
+GENRE_WEIGHT = 1.0
+RATING_WEIGHT = 0.5
+YEAR_WEIGHT = 0.3
+
+
+def _standardized(values):
+    """(x - mean) / std with missing values at the mean (0)"""
+    values = np.asarray(values, dtype=float)
+    known = ~np.isnan(values)
+    if not known.any():
+        return np.zeros(len(values))
+    std = values[known].std() or 1.0
+    return np.where(known, (values - values[known].mean()) / std, 0.0)
+
+
+def feature_matrix(genre_matrix, ratings, years):
+    """Unit-length float32 rows: weighted genres, rating and year (all-zero rows stay zero)"""
+    genres = np.asarray(genre_matrix, dtype=np.float32)
+    sizes = np.sqrt(genres.sum(axis=1, keepdims=True))
+    genres = np.divide(genres, sizes, out=np.zeros_like(genres), where=sizes > 0)
+    features = np.hstack([
+        GENRE_WEIGHT * genres,
+        RATING_WEIGHT * _standardized(ratings)[:, None],
+        YEAR_WEIGHT * _standardized(years)[:, None],
+    ]).astype(np.float32)
+    norms = np.linalg.norm(features, axis=1, keepdims=True)
+    return np.divide(features, norms, out=np.zeros_like(features), where=norms > 0)
+
+
+def block_rows(n, block_mb=SIMILARITY_BLOCK_MB):
+    """Rows per block so one block of float32 scores fits in block_mb"""
+    return max(1, int(block_mb * 1024 * 1024 // (4 * max(n, 1))))
+
+
+def _block_top_k(block, offset, k):
+    """Top k columns of each row of a block of scores, best first, ties to the lower column"""
+    rows = np.arange(len(block))
+    block[rows, rows + offset] = -np.inf  # a movie is not its own neighbor
+    # The k-th best score among the first columns is a lower bound on the k-th best overall,
+    # so everything at or above it is a small candidate set that holds the true top k
+    sample = min(block.shape[1], max(8 * k, block.shape[1] // 16))
+    bound = np.partition(block[:, :sample], sample - k, axis=1)[:, sample - k]
+    # flatnonzero + divmod is several times faster than 2-D nonzero on a block this size
+    candidate_rows, candidate_columns = np.divmod(np.flatnonzero(block >= bound[:, None]), block.shape[1])
+    # Rounded so float noise from the matrix product does not reorder exact ties
+    candidate_scores = np.round(block[candidate_rows, candidate_columns], 5)
+    order = np.lexsort((candidate_columns, -candidate_scores, candidate_rows))
+    starts = np.searchsorted(candidate_rows[order], rows)
+    picked = order[starts[:, None] + np.arange(k)]
+    return candidate_columns[picked], candidate_scores[picked]
+
+
+def top_k_neighbors(features, k=NEIGHBORS_K, block_mb=SIMILARITY_BLOCK_MB, workers=SIMILARITY_WORKERS):
+    """(indices int32 (n, k), scores float32 (n, k)): each row's k most similar other rows, best first
+
+    Ties go to the lower row, i.e. the better ranked movie. Blocks run on a thread
+    pool (NumPy releases the GIL in the product and the partition), so peak memory
+    is about workers blocks of scores.
+    """
+    n = len(features)
+    k = min(k, n - 1)
+    indices = np.zeros((n, max(k, 0)), dtype=np.int32)
+    scores = np.zeros((n, max(k, 0)), dtype=np.float32)
+    if k <= 0:
+        return indices, scores
+
+    def run(start):
+        stop = min(start + step, n)
+        indices[start:stop], scores[start:stop] = _block_top_k(features[start:stop] @ features.T, start, k)
+
+    step = block_rows(n, block_mb)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(run, range(0, n, step)))
+    return indices, scores
+
+
+def similarity(features, a, b):
+    """Cosine similarity of two rows"""
+    return float(features[a] @ features[b])
+
+
+def compare(first, second):
+    """Head-to-head facts for two movies given as dicts with title, imdb_rating, year and genres"""
+    genres_a = set(first.get("genres") or [])
+    genres_b = set(second.get("genres") or [])
+    union = genres_a | genres_b
+    rating_a, rating_b = first.get("imdb_rating"), second.get("imdb_rating")
+    winner = None
+    if rating_a is not None and rating_b is not None and rating_a != rating_b:
+        winner = first["title"] if rating_a > rating_b else second["title"]
+    return {
+        "shared_genres": sorted(genres_a & genres_b),
+        "genre_overlap": len(genres_a & genres_b) / len(union) if union else 0.0,
+        "rating_gap": None if rating_a is None or rating_b is None else round(rating_a - rating_b, 1),
+        "year_gap": None if first.get("year") is None or second.get("year") is None
+        else first["year"] - second["year"],
+        "winner": winner,
+    }
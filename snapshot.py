@@ -0,0 +1,249 @@
+"""Columnar (Arrow IPC) snapshot of the movies table for the dashboard
+
+The pipeline writes the snapshot next to its JSON/CSV output and loader.py
+rewrites it after each load, stamped with the Supabase data version it matches.
+The dashboard memory-maps the file, so startup does no network transfer or JSON
+decoding; Supabase is only asked for the data version to tell whether the
+snapshot is current.
+
+Columns: imdb_rank int32, title string, year int16, imdb_rating float64,
+runtime string, genres list<dictionary<int16, string>>, imdb_url string,
+and unless MOVIE_NEIGHBORS_K is 0, neighbors list<int32> (rows of the most
+similar movies, best first) with neighbor_scores list<float32> (see similarity.py).
+"""
+import json
+import math
+import os
+import tempfile
+import threading
+from datetime import datetime
+
+from instrumentation import log, span
+from llm_cache import fingerprint
+from similarity import NEIGHBORS_K
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # snapshot mode is unavailable; the dashboard falls back to Supabase
+    pa = None
+
+SNAPSHOT_PATH = os.getenv("MOVIE_SNAPSHOT", "nicholas_cage_movies.arrow")
+SNAPSHOT_FORMAT = "2"
+DASHBOARD_SNAPSHOT_COLUMNS = ["imdb_rank", "title", "imdb_rating", "genres"]
+
+
+def _schema():
+    return pa.schema([
+        ("imdb_rank", pa.int32()),
+        ("title", pa.string()),
+        ("year", pa.int16()),
+        ("imdb_rating", pa.float64()),
+        ("runtime", pa.string()),
+        ("genres", pa.list_(pa.dictionary(pa.int16(), pa.string()))),
+        ("imdb_url", pa.string()),
+    ])
+
+
+def _number(value, cast):
+    # Rows read back from the table through pandas carry NaN for missing values
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    try:
+        return cast(value) if value not in (None, "", "N/A") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _text(value):
+    return None if isinstance(value, float) and math.isnan(value) else value
+
+
+def _row(movie):
+    """Accept both the pipeline's field names (rank, release_year) and the table's (imdb_rank, year)"""
+    genres = movie.get("genres")
+    return {
+        "imdb_rank": _number(movie.get("imdb_rank", movie.get("rank")), int),
+        "title": _text(movie.get("title")),
+        "year": _number(movie.get("year", movie.get("release_year")), int),
+        "imdb_rating": _number(movie.get("imdb_rating"), float),
+        "runtime": _text(movie.get("runtime")),
+        "genres": [genre for genre in genres if genre] if isinstance(genres, list) else [],
+        "imdb_url": _text(movie.get("imdb_url")),
+    }
+
+
+def list_column(values):
+    """(n, k) array as an Arrow list column without going through Python lists"""
+    n, k = values.shape
+    offsets = pa.array(range(0, n * k + 1, k), type=pa.int32())
+    return pa.ListArray.from_arrays(offsets, pa.array(values.ravel()))
+
+
+def table_features(table):
+    """similarity.feature_matrix of the table's genres, ratings and years"""
+    from genre_index import GenreIndex
+    from similarity import feature_matrix
+
+    return feature_matrix(
+        GenreIndex.from_arrow(table.column("genres")).matrix,
+        table.column("imdb_rating").to_numpy(zero_copy_only=False),
+        table.column("year").cast(pa.float64()).to_numpy(zero_copy_only=False),
+    )
+
+
+def neighbor_columns(table, k=NEIGHBORS_K):
+    """Top-k similar rows for every movie in the table, as (neighbors, neighbor_scores) columns"""
+    from similarity import top_k_neighbors
+
+    with span("snapshot.neighbors", rows=table.num_rows, k=k):
+        indices, scores = top_k_neighbors(table_features(table), k)
+    return list_column(indices), list_column(scores)
+
+
+def build_table(movies, data_version=None, neighbors_k=NEIGHBORS_K):
+    rows = sorted(
+        (_row(movie) for movie in movies),
+        key=lambda row: (row["imdb_rank"] is None, row["imdb_rank"] or 0),
+    )
+    schema = _schema()
+    columns = {name: [row[name] for row in rows] for name in schema.names}
+    metadata = {
+        "snapshot_format": SNAPSHOT_FORMAT,
+        "content_version": fingerprint(rows)[:16],
+        "data_version": json.dumps(data_version),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    table = pa.Table.from_pydict(columns, schema=schema)
+    if neighbors_k > 0 and table.num_rows > 1:
+        neighbors, scores = neighbor_columns(table, neighbors_k)
+        table = table.append_column("neighbors", neighbors).append_column("neighbor_scores", scores)
+    return table.replace_schema_metadata(metadata)
+
+
+def write_table(table, path=SNAPSHOT_PATH):
+    # Write then rename: dashboards that have the old file mapped keep reading it intact. The temp
+    # file is unique, so the loader and a bake_snapshot writing at once do not clobber each other
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    os.close(fd)
+    try:
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return path
+
+
+def write_snapshot(movies, path=SNAPSHOT_PATH, data_version=None, neighbors_k=NEIGHBORS_K):
+    """Write movies as an Arrow IPC file; data_version is the Supabase version they match, if known"""
+    if pa is None:
+        log("pyarrow is not installed; skipping the columnar snapshot")
+        return None
+    with span("snapshot.write") as write_span:
+        table = build_table(movies, data_version, neighbors_k)
+        write_table(table, path)
+        write_span.set(rows=table.num_rows, bytes=os.path.getsize(path))
+    log(f"Snapshot saved: {table.num_rows} movies to {path}")
+    return path
+
+
+class Snapshot:
+    """A memory-mapped snapshot; the dashboard frame and genre index are built once and shared"""
+
+    def __init__(self, path, table):
+        self.path = path
+        self.table = table
+        self._frame = None
+        self._genre_index = None
+        self._title_index = None
+        self._features = None
+        self._lock = threading.Lock()
+        metadata = {key.decode(): value.decode() for key, value in (table.schema.metadata or {}).items()}
+        self.content_version = metadata.get("content_version")
+        data_version = json.loads(metadata.get("data_version") or "null")
+        self.data_version = tuple(data_version) if isinstance(data_version, list) else data_version
+
+    def matches(self, data_version):
+        """True if the snapshot was stamped with this Supabase data version"""
+        return self.data_version is not None and tuple(self.data_version) == tuple(data_version)
+
+    def to_frame(self, columns=None):
+        """pandas view of the snapshot; genres become arrays of strings"""
+        table = self.table.select(columns) if columns else self.table
+        return table.to_pandas()
+
+    def dashboard_frame(self):
+        """The columns the dashboard shows, converted once; callers must not mutate it"""
+        with self._lock:
+            if self._frame is None:
+                self._frame = self.to_frame(DASHBOARD_SNAPSHOT_COLUMNS)
+            return self._frame
+
+    def genre_index(self):
+        from genre_index import GenreIndex
+        with self._lock:
+            if self._genre_index is None:
+                self._genre_index = GenreIndex.from_arrow(self.table.column("genres"))
+            return self._genre_index
+
+    def title_index(self):
+        from title_index import TitleIndex
+        with self._lock:
+            if self._title_index is None:
+                self._title_index = TitleIndex.build(self.table.column("title").to_pylist())
+            return self._title_index
+
+    def features(self):
+        with self._lock:
+            if self._features is None:
+                self._features = table_features(self.table)
+            return self._features
+
+    def has_neighbors(self):
+        return "neighbors" in self.table.column_names
+
+    def movies(self, rows, columns=("title", "imdb_rating", "year", "genres")):
+        """The given rows, in that order, as a small DataFrame"""
+        return self.table.select(list(columns)).take(rows).to_pandas()
+
+    def movie(self, row):
+        return self.table.slice(row, 1).to_pylist()[0]
+
+    def neighbors(self, row):
+        """(rows, scores) of the movies most similar to row, best first; a read of k values"""
+        rows = self.table.column("neighbors")[row].values.to_numpy()
+        scores = self.table.column("neighbor_scores")[row].values.to_numpy()
+        return rows, scores
+
+
+def read_snapshot(path=SNAPSHOT_PATH):
+    """Memory-map the snapshot; None if pyarrow or the file is missing"""
+    if pa is None or not os.path.exists(path):
+        return None
+    with span("snapshot.read"):
+        source = pa.memory_map(path, "r")
+        table = pa.ipc.open_file(source).read_all()
+    return Snapshot(path, table)
+
+
+_open = {}
+_open_lock = threading.Lock()
+
+
+def open_snapshot(path=SNAPSHOT_PATH):
+    """Process-wide Snapshot for path, reopened only when the file is replaced"""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _open_lock:
+        cached = _open.get(path)
+        if cached is None or cached[0] != mtime:
+            snapshot = read_snapshot(path)
+            if snapshot is None:
+                return None
+            cached = _open[path] = (mtime, snapshot)
+        return cached[1]
@@ -0,0 +1,117 @@
+import gzip
+import json
+
+import pandas as pd
+import pytest
+
+import api
+
+
+class FixedMovies:
+    """MovieCache stand-in serving one frame at one data version"""
+
+    def __init__(self, df, version=("2024-01-01T00:00:00", 1)):
+        self.df = df
+        self.version = version
+
+    def get(self, client=None):
+        return self.df, self.version
+
+
+def frame(n=60):
+    return pd.DataFrame({
+        "id": range(1, n + 1),
+        "imdb_rank": [None if i == 5 else float(i) for i in range(1, n + 1)],
+        "title": [f"Movie {i}" for i in range(1, n + 1)],
+        "imdb_rating": [round(9.5 - i / 10, 1) for i in range(1, n + 1)],
+        "genres": [["Action"] if i % 2 else ["Drama", "Action"] for i in range(1, n + 1)],
+    })
+
+
+@pytest.fixture
+def queries(monkeypatch):
+    queries = api.MovieQueries(movies=FixedMovies(frame()))
+    monkeypatch.setattr(api, "queries", queries)
+    return queries
+
+
+def get(path, query="", **headers):
+    environ = {"REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": query}
+    environ.update({"HTTP_" + name.upper(): value for name, value in headers.items()})
+    response = {}
+
+    def start_response(status, response_headers):
+        response["status"] = int(status.split()[0])
+        response["headers"] = dict(response_headers)
+
+    response["body"] = b"".join(api.application(environ, start_response))
+    return response
+
+
+def payload(response):
+    body = response["body"]
+    if response["headers"].get("Content-Encoding") == "gzip":
+        body = gzip.decompress(body)
+    return json.loads(body)
+
+
+def test_pages_follow_the_cursor_and_null_ranks_are_null(queries):
+    first = payload(get("/movies", "genres=Action&limit=25"))
+    second = payload(get("/movies", f"genres=Action&limit=25&cursor={first['next_cursor']}"))
+    third = payload(get("/movies", f"genres=Action&limit=25&cursor={second['next_cursor']}"))
+    titles = [movie["title"] for page in (first, second, third) for movie in page["movies"]]
+    assert titles == [f"Movie {i}" for i in range(1, 61)]
+    assert first["movies"][4]["imdb_rank"] is None
+    assert third["next_cursor"] is None
+
+
+@pytest.mark.parametrize("changed", ["genres=Drama&limit=25", "genres=Action&limit=10",
+                                     "genres=Action&limit=25&min_rating=5", "genres=Action&limit=25&top=50"])
+def test_cursor_from_another_query_is_rejected(queries, changed):
+    cursor = payload(get("/movies", "genres=Action&limit=25"))["next_cursor"]
+    response = get("/movies", f"{changed}&cursor={cursor}")
+    assert response["status"] == 400
+    assert "different query" in payload(response)["error"]
+
+
+def test_cursor_from_an_older_data_version_is_gone(queries):
+    cursor = payload(get("/movies", "limit=25"))["next_cursor"]
+    queries.movies.df = frame()  # a new frame is a new data version to MovieQueries
+    queries.movies.version = ("2024-02-01T00:00:00", 1)
+    assert get("/movies", f"limit=25&cursor={cursor}")["status"] == 410
+
+
+def test_etag_revalidation_and_encoding(queries):
+    plain = get("/movies", "limit=100", Accept_Encoding="identity")
+    zipped = get("/movies", "limit=100", Accept_Encoding="gzip, deflate")
+    refused = get("/movies", "limit=100", Accept_Encoding="gzip;q=0, identity")
+    assert zipped["headers"]["Content-Encoding"] == "gzip"
+    assert "Content-Encoding" not in plain["headers"] and "Content-Encoding" not in refused["headers"]
+    assert payload(plain) == payload(zipped) == payload(refused)
+    assert plain["headers"]["ETag"] != zipped["headers"]["ETag"]
+    again = get("/movies", "limit=100", Accept_Encoding="gzip", If_None_Match=zipped["headers"]["ETag"])
+    assert again["status"] == 304 and again["body"] == b""
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip", True), ("GZIP;Q=0.5", True), ("br, *;q=0.1", True), ("gzip;q=0", False),
+    ("gzip;q=0, *", False), ("*;q=0", False), ("identity", False), (None, False),
+])
+def test_accepts_gzip(header, expected):
+    assert api.accepts_gzip(header) is expected
+
+
+def test_a_version_check_is_not_repeated_by_the_fetch(monkeypatch):
+    checks = []
+
+    def fetch_data_version(client):
+        checks.append(client)
+        return ("2024-01-01T00:00:00", 60)
+
+    monkeypatch.setattr(api, "fetch_data_version", fetch_data_version)
+    monkeypatch.setattr(api, "open_snapshot", lambda path: None)
+    monkeypatch.setattr(api, "fetch_movies", lambda client, columns: frame())
+    queries = api.MovieQueries()
+    df, version = queries.movies.get(client="client")
+    assert len(df) == 60 and version == ("2024-01-01T00:00:00", 60)
+    assert checks == ["client"]
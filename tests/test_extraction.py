@@ -0,0 +1,34 @@
+import pytest
+
+import extraction
+from fixtures import render_list_page, synthetic_movies
+
+# Old-style list markup: the ratings-bar wrapper comes before the rating span in document order
+LISTER_PAGE = """<html><body>
+<div class="lister-item mode-detail">
+  <h3 class="lister-item-header"><span>1.</span> <a href="/title/tt0119094/">Face/Off</a> <span>(1997)</span></h3>
+  <p><span class="runtime">138 min</span> | <span class="genre">Action, Crime</span></p>
+  <div class="ipl-rating-widget"><div class="ipl-rating-star small">
+    <span class="ipl-rating-star__star">*</span><span class="ipl-rating-star__rating">7.3</span>
+    <span class="ipl-rating-star__total-votes">(400,000)</span>
+  </div></div>
+</div>
+<div class="lister-item mode-detail">
+  <h3 class="lister-item-header"><span>2.</span> <a href="/title/tt0117500/">The Rock</a> <span>(1996)</span></h3>
+  <div class="ratings-bar"><div class="inline-block ratings-imdb-rating"><strong>7.4</strong></div></div>
+</div>
+</body></html>"""
+
+
+@pytest.mark.skipif(extraction.lxml is None, reason="lxml is not installed")
+def test_single_pass_keeps_the_legacy_rating_priority():
+    single_pass = extraction.extract_single_pass(LISTER_PAGE)
+    assert [movie["raw_rating"] for movie in single_pass] == ["7.3", "7.4"]
+    assert single_pass == extraction.extract_legacy(LISTER_PAGE)
+
+
+def test_strategies_agree_on_a_generated_list_page():
+    html = render_list_page(synthetic_movies(30))
+    name, movies = extraction.extract_movies(html, ["single_pass"])
+    assert name == "single_pass"
+    assert movies == extraction.extract_legacy(html)
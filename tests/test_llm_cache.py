@@ -0,0 +1,44 @@
+import itertools
+
+import llm_cache
+from llm_cache import LLMCache
+
+
+def cache(tmp_path, **kwargs):
+    return LLMCache(str(tmp_path / "llm_cache.sqlite3"), **kwargs)
+
+
+def test_round_trip_and_key_inputs(tmp_path):
+    store = cache(tmp_path, prompt_version="v1")
+    batch = [{"raw_title": "Face/Off", "raw_rating": "7.3"}]
+    key = store.key(batch, "gpt-4o", 0.1)
+    assert store.get(key) is None
+    store.put(key, [{"title": "Face/Off", "imdb_rating": 7.3}])
+    assert store.get(key) == [{"title": "Face/Off", "imdb_rating": 7.3}]
+    assert store.key(batch, "gpt-4o", 0.1) == key
+    assert store.key(batch, "gpt-4o-mini", 0.1) != key
+    assert store.key(batch, "gpt-4o", 0.2) != key
+    assert store.stats["hits"] == 1 and store.stats["misses"] == 1
+
+
+def test_entries_of_another_prompt_version_are_purged_on_open(tmp_path):
+    old = cache(tmp_path, prompt_version="v1")
+    old.put("a", [1])
+    old.close()
+    assert cache(tmp_path, prompt_version="v1").get("a") == [1]
+    new = cache(tmp_path, prompt_version="v2")
+    assert new.stats["purged"] == 1
+    assert new.get("a") is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    # A clock that always moves, so used_at never ties
+    monkeypatch.setattr(llm_cache.time, "time", itertools.count(1).__next__)
+    store = cache(tmp_path, max_bytes=40)
+    store.put("a", ["x" * 10])
+    store.put("b", ["y" * 10])
+    store.get("a")  # a is now more recent than b
+    store.put("c", ["z" * 10])
+    assert store.get("b") is None
+    assert store.get("a") == ["x" * 10] and store.get("c") == ["z" * 10]
+    assert store.stats["evictions"] == 1
@@ -0,0 +1,74 @@
+import pytest
+from supabase import create_client
+
+import loader
+from stubs import STUB_SUPABASE_KEY, PostgrestStub
+
+
+def movie(rank, title, url, year=2000, rating=6.0):
+    return {"rank": rank, "title": title, "release_year": year, "imdb_rating": rating,
+            "runtime": "100 min", "genres": ["Drama"], "imdb_url": url}
+
+
+SOURCE = [
+    movie(1, "Face/Off", "https://www.imdb.com/title/tt0119094/?ref_=x"),
+    movie(2, "Untitled Project", "N/A", year=2025),
+    movie(3, "Another Untitled Project", "N/A", year=2026),
+    movie(4, "Short Film", None, year=1999),
+    {k: v for k, v in movie(5, "Cameo", None, year=2010).items() if k != "imdb_url"},
+]
+
+
+@pytest.fixture
+def db():
+    with PostgrestStub() as stub:
+        yield stub
+
+
+def prepared(movies):
+    return [loader.prepare_record(m, "2024-01-01T00:00:00") for m in movies]
+
+
+def stored(db):
+    return sorted(db.table(loader.MOVIES_TABLE), key=lambda row: row["imdb_rank"])
+
+
+def test_sync_keeps_titles_without_tt_ids(db):
+    client = create_client(db.url, STUB_SUPABASE_KEY)
+    summary = loader.sync_records(client, prepared(SOURCE))
+    assert summary["inserted"] == 5
+    assert [row["title"] for row in stored(db)] == [m["title"] for m in SOURCE]
+
+    # A second sync matches every row back to its source record
+    summary = loader.sync_records(client, prepared(SOURCE))
+    assert summary == {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 5}
+
+
+def test_sync_deletes_only_the_removed_tt_less_title(db):
+    client = create_client(db.url, STUB_SUPABASE_KEY)
+    loader.sync_records(client, prepared(SOURCE))
+    summary = loader.sync_records(client, prepared(SOURCE[:2] + SOURCE[3:]))
+    assert summary["deleted"] == 1
+    assert "Another Untitled Project" not in [row["title"] for row in stored(db)]
+    assert len(stored(db)) == 4
+
+
+def test_full_reload_keeps_titles_without_tt_ids(db):
+    client = create_client(db.url, STUB_SUPABASE_KEY)
+    loader.full_reload(client, prepared(SOURCE))
+    assert len(stored(db)) == 5
+
+
+def test_duplicate_tt_ids_are_loaded_once(db):
+    client = create_client(db.url, STUB_SUPABASE_KEY)
+    twice = SOURCE + [movie(6, "Face/Off (re-release)", "https://www.imdb.com/title/tt0119094/")]
+    summary = loader.sync_records(client, prepared(twice))
+    assert summary["inserted"] == 5
+    assert stored(db)[0]["imdb_url"] == "https://www.imdb.com/title/tt0119094/"
+
+
+def test_sync_key_is_the_tt_id_or_title_and_year():
+    records = prepared(SOURCE)
+    assert [r["sync_key"] for r in records] == [
+        "tt0119094", "Untitled Project|2025", "Another Untitled Project|2026", "Short Film|1999", "Cameo|2010",
+    ]
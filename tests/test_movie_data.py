@@ -0,0 +1,98 @@
+import pytest
+from supabase import create_client
+
+import movie_data
+from stubs import STUB_SUPABASE_KEY, PostgrestStub
+
+
+def rows(n, unranked):
+    """n movies ranked 1..n except the ids in unranked, which have a null imdb_rank"""
+    return [{"id": i, "imdb_rank": None if i in unranked else i, "title": f"Movie {i}",
+             "imdb_rating": round(1 + (i * 7 % 90) / 10, 1), "genres": ["Drama"] if i % 3 else ["Action"]}
+            for i in range(1, n + 1)]
+
+
+@pytest.fixture
+def client():
+    with PostgrestStub() as db:
+        yield db, create_client(db.url, STUB_SUPABASE_KEY)
+
+
+def expected_ids(table, keep=lambda row: True):
+    ranked = sorted((row for row in table if keep(row) and row["imdb_rank"] is not None),
+                    key=lambda row: row["imdb_rank"])
+    return [row["id"] for row in ranked] + sorted(row["id"] for row in table if keep(row) and
+                                                  row["imdb_rank"] is None)
+
+
+@pytest.mark.parametrize("unranked", [set(), {7}, {1, 50, 51, 100, 1200}])
+def test_fetch_movies_keeps_null_ranks_last(client, unranked):
+    db, supabase = client
+    table = rows(1200, unranked)
+    db.write(movie_data.MOVIES_TABLE, table)
+    df = movie_data.fetch_movies(supabase, columns=movie_data.DASHBOARD_COLUMNS, page_size=50)
+    assert df["id"].tolist() == expected_ids(table)
+
+
+def test_fetch_movies_single_window_with_null_rank_on_a_page_boundary(client):
+    db, supabase = client
+    table = rows(100, {50, 51})
+    db.write(movie_data.MOVIES_TABLE, table)
+    df = movie_data.fetch_movies(supabase, columns=movie_data.DASHBOARD_COLUMNS, page_size=50, max_workers=1)
+    assert df["id"].tolist() == expected_ids(table)
+
+
+def test_fetch_movies_filters_with_null_ranks(client):
+    db, supabase = client
+    table = rows(600, {3, 300})
+    db.write(movie_data.MOVIES_TABLE, table)
+    df = movie_data.fetch_movies(supabase, 5.0, ["Action"], columns=movie_data.DASHBOARD_COLUMNS, page_size=40)
+    assert df["id"].tolist() == expected_ids(
+        table, lambda row: row["imdb_rating"] >= 5.0 and "Action" in row["genres"])
+
+
+def test_fetch_movies_only_unranked_and_empty(client):
+    db, supabase = client
+    assert movie_data.fetch_movies(supabase, columns=movie_data.DASHBOARD_COLUMNS).empty
+    db.write(movie_data.MOVIES_TABLE, rows(3, {1, 2, 3}))
+    assert movie_data.fetch_movies(supabase, columns=movie_data.DASHBOARD_COLUMNS)["id"].tolist() == [1, 2, 3]
+
+
+class Source:
+    """fetch/fetch_version pair for MovieCache that counts its calls"""
+
+    def __init__(self):
+        self.version = ("2024-01-01T00:00:00", 3)
+        self.fetches = 0
+        self.checks = 0
+
+    def fetch(self, client):
+        self.fetches += 1
+        return movie_data.pd.DataFrame({"id": [1, 2, 3]})
+
+    def fetch_version(self, client):
+        self.checks += 1
+        return self.version
+
+
+def test_movie_cache_refetches_only_on_a_new_version():
+    source = Source()
+    cache = movie_data.MovieCache(ttl=0, fetch=source.fetch, fetch_version=source.fetch_version)
+    df, version = cache.get(client="client")
+    assert cache.get(client="client")[0] is df
+    assert (source.fetches, source.checks) == (1, 2)
+
+    source.version = ("2024-01-01T00:00:00", 2)  # a deleted row changes only the count
+    assert cache.get(client="client")[0] is not df
+    assert source.fetches == 2
+
+
+def test_movie_cache_skips_the_version_check_within_the_ttl():
+    source = Source()
+    cache = movie_data.MovieCache(ttl=60, fetch=source.fetch, fetch_version=source.fetch_version)
+    for _ in range(5):
+        cache.get(client="client")
+    assert (source.fetches, source.checks) == (1, 1)
+    cache.invalidate()
+    cache.get(client="client")
+    assert source.fetches == 2
@@ -0,0 +1,80 @@
+import pytest
+
+from normalize import (
+    Unresolved,
+    iso_duration_to_runtime,
+    normalize_genres,
+    normalize_movie,
+    normalize_rating,
+    normalize_runtime,
+    normalize_title,
+    normalize_year,
+    split_by_confidence,
+)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("12. Face/Off", "Face/Off"), ("  Con Air ", "Con Air"), ("2001: A Space Odyssey", "2001: A Space Odyssey"),
+])
+def test_normalize_title(value, expected):
+    assert normalize_title(value) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1997", 1997), ("(1997)", 1997), ("(2019–2021)", 2019), ("N/A", None), (None, None),
+])
+def test_normalize_year(value, expected):
+    assert normalize_year(value) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("7.3", 7.3), ("7.3/10", 7.3), ("8", 8.0), (6.5, 6.5), ("n/a", None),
+])
+def test_normalize_rating(value, expected):
+    assert normalize_rating(value) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("138 min", "138 min"), ("2h 18m", "138 min"), ("1h", "60 min"), ("", None),
+])
+def test_normalize_runtime(value, expected):
+    assert normalize_runtime(value) == expected
+
+
+def test_normalize_genres_maps_aliases_and_drops_repeats():
+    assert normalize_genres("action, Science Fiction, Action") == ["Action", "Sci-Fi"]
+    assert normalize_genres("N/A") == []
+
+
+@pytest.mark.parametrize("parse, value", [
+    (normalize_title, "N/A"), (normalize_year, "nineteen"), (normalize_rating, "7.3Rate"),
+    (normalize_rating, "11"), (normalize_runtime, "long"), (normalize_genres, "Action, Cage-core"),
+])
+def test_unparseable_values_raise_unresolved(parse, value):
+    with pytest.raises(Unresolved):
+        parse(value)
+
+
+def test_iso_duration_to_runtime():
+    assert iso_duration_to_runtime("PT2H18M") == "138 min"
+    assert iso_duration_to_runtime("PT45M") == "45 min"
+    assert iso_duration_to_runtime("soon") is None
+
+
+def raw(rating="7.3", genre="Action"):
+    return {"raw_rank": 1, "raw_title": "1. Face/Off", "raw_year": "(1997)", "raw_rating": rating,
+            "raw_runtime": "2h 18m", "raw_genre": genre, "raw_url": "N/A"}
+
+
+def test_normalize_movie_reports_unresolved_fields():
+    record, unresolved = normalize_movie(raw(rating="7.3Rate"))
+    assert unresolved == ["imdb_rating"]
+    assert record == {"rank": 1, "title": "Face/Off", "release_year": 1997, "imdb_rating": None,
+                      "runtime": "138 min", "genres": ["Action"], "imdb_url": None}
+
+
+def test_split_by_confidence():
+    clean, junk = raw(), raw(genre="Cage-core")
+    resolved, ambiguous = split_by_confidence([clean, junk])
+    assert [record["title"] for record in resolved] == ["Face/Off"]
+    assert ambiguous == [junk]
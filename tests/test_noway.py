@@ -0,0 +1,76 @@
+import os
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+
+# Keep the module-level LLM cache out of the working tree
+os.environ.setdefault("LLM_CACHE_PATH", os.path.join(tempfile.mkdtemp(prefix="cage-tests-"), "llm_cache.sqlite3"))
+
+import noway  # noqa: E402
+from llm_cache import LLMCache  # noqa: E402
+from rate_limit import RateLimiter  # noqa: E402
+
+
+def raw(rank, rating="7.3", genre="Action, Drama", title=None, year="2001", runtime="1h 40m"):
+    return {"raw_rank": rank, "raw_title": title or f"{rank}. Movie {rank}", "raw_year": year,
+            "raw_rating": rating, "raw_runtime": runtime, "raw_genre": genre,
+            "raw_url": f"https://www.imdb.com/title/tt{1000000 + rank}/"}
+
+
+class Unreachable:
+    """Stands in for the OpenAI client with the endpoint down"""
+
+    class chat:
+        class completions:
+            @staticmethod
+            def create(**kwargs):
+                raise ConnectionError("endpoint unreachable")
+
+
+class Garbled:
+    """An endpoint that answers every batch with JSON that is not the movie array"""
+
+    class chat:
+        class completions:
+            calls = 0
+
+            @classmethod
+            def create(cls, **kwargs):
+                cls.calls += 1
+                message = SimpleNamespace(content='{"error": "unexpected"}')
+                return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")],
+                                       usage=SimpleNamespace(prompt_tokens=100, completion_tokens=10))
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch, tmp_path):
+    monkeypatch.setattr(noway, "client", Unreachable)
+    monkeypatch.setattr(noway, "llm_cache", LLMCache(str(tmp_path / "cache.sqlite3"), noway.PROMPT_VERSION))
+    monkeypatch.setattr(noway, "llm_limiter", RateLimiter(1e9, 1e12))
+
+
+def test_fallback_maps_unparseable_fields_to_none():
+    rows = noway.fallback_batch([raw(1, rating="7.3Rate", genre="Thriller, Sci fi", year="N/A", runtime="long")])
+    assert rows == [{"rank": 1, "title": "Movie 1", "release_year": None, "imdb_rating": None,
+                     "runtime": None, "genres": [], "imdb_url": "https://www.imdb.com/title/tt1000001/"}]
+
+
+def test_llm_failure_falls_back_for_ambiguous_rows():
+    movies = [raw(1), raw(2, rating="7.3Rate"), raw(3, genre="Sci fi"), raw(4, rating="6.1")]
+    processed = noway.process_movies_with_llm(movies, concurrency=2)
+    assert [movie["rank"] for movie in processed] == [1, 2, 3, 4]
+    assert [movie["imdb_rating"] for movie in processed] == [7.3, None, 7.3, 6.1]
+    assert processed[2]["genres"] == []
+
+
+def test_invalid_batch_splits_down_to_single_rows_then_falls_back(monkeypatch):
+    monkeypatch.setattr(noway, "client", Garbled)
+    Garbled.chat.completions.calls = 0
+    movies = [raw(1, rating="7.3Rate"), raw(2, rating="8,1"), raw(3, rating="Rate")]
+    processed = noway.process_batch_with_retries(movies)
+    # 3 rows -> 1 + 2 -> 1 + 1: five calls, every single row still invalid
+    assert Garbled.chat.completions.calls == 5
+    assert [movie["rank"] for movie in processed] == [1, 2, 3]
+    assert [movie["imdb_rating"] for movie in processed] == [None, None, None]
+    assert [movie["title"] for movie in processed] == ["Movie 1", "Movie 2", "Movie 3"]
@@ -0,0 +1,37 @@
+from render_cache import RenderCache, render_key
+
+
+def test_render_key_normalizes_the_filter_state():
+    assert render_key("v1", 6.300000000000001, ["Drama", "Action", "Drama"]) == \
+        render_key("v1", 6.3, ("Action", "Drama"))
+    assert render_key("v1", None, None) == ("v1", 0, ())
+    assert render_key("v1", 6.3, []) != render_key("v2", 6.3, [])
+
+
+def test_misses_build_once_then_hit():
+    cache = RenderCache(max_bytes=100, sizeof=len)
+    builds = []
+    assert cache.get("a", lambda: builds.append("a") or "view") == "view"
+    assert cache.get("a", lambda: builds.append("a") or "other") == "view"
+    assert builds == ["a"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"], stats["bytes"]) == (1, 1, 1, 4)
+
+
+def test_least_recently_used_views_are_evicted_within_the_budget():
+    cache = RenderCache(max_bytes=10, sizeof=len)
+    cache.put("a", "aaaa")
+    cache.put("b", "bbbb")
+    cache.get("a", lambda: "rebuilt")
+    cache.put("c", "cccc")
+    assert cache.stats()["evictions"] == 1
+    assert cache.get("a", lambda: "rebuilt") == "aaaa"
+    assert cache.get("c", lambda: "rebuilt") == "cccc"
+    assert cache.get("b", lambda: "rebuilt") == "rebuilt"
+    assert cache.stats()["bytes"] <= 10
+
+
+def test_views_larger_than_the_budget_are_not_kept():
+    cache = RenderCache(max_bytes=3, sizeof=len)
+    assert cache.get("a", lambda: "too big") == "too big"
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,96 @@
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# Queries are matched as typed prefixes, so only titles get the trailing pad
+PAD = "  "
+
+# A title is a match when at least this share of the query's trigrams occur in it
+MIN_CONTAINMENT = 0.5
+
+
+def normalize_title(title):
+    """Lowercase, accents and punctuation stripped, spaces removed: "Face/Off" -> "faceoff" """
+    text = unicodedata.normalize("NFKD", str(title or "")).casefold()
+    return re.sub(r"[\W_]+", "", "".join(ch for ch in text if not unicodedata.combining(ch)))
+
+
+def trigrams(text, pad_end=True):
+    padded = PAD + text + (" " if pad_end else "")
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleIndex:
+    """Trigram inverted index over movie titles, built once per data version
+
+    Row i lines up with row i of the DataFrame the index was built from, like
+    GenreIndex, so search() takes the same row masks and returns positions
+    usable with df.iloc. Postings are stored CSR style: the rows containing
+    trigram t are rows[offsets[t]:offsets[t + 1]].
+    """
+
+    def __init__(self, normalized, vocabulary, offsets, rows, sizes):
+        self.normalized = normalized
+        self._vocabulary = vocabulary
+        self._offsets = offsets
+        self._rows = rows
+        self._sizes = sizes
+
+    @classmethod
+    def build(cls, titles):
+        """Build the index from an iterable of titles (None allowed)"""
+        normalized = [normalize_title(title) for title in titles]
+        grams = [trigrams(text) if text else () for text in normalized]
+        sizes = np.fromiter(map(len, grams), dtype=np.int32, count=len(grams))
+        codes, uniques = pd.factorize(pd.Series([gram for row in grams for gram in row], dtype=object))
+        vocabulary = {gram: i for i, gram in enumerate(uniques)}
+        order = np.argsort(codes, kind="stable")
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=len(vocabulary)), out=offsets[1:])
+        rows = np.repeat(np.arange(len(grams), dtype=np.int32), sizes)[order]
+        return cls(np.asarray(normalized, dtype=object), vocabulary, offsets, rows, sizes)
+
+    def __len__(self):
+        return len(self.normalized)
+
+    def scores(self, query):
+        """Score per row: trigram containment of the query plus Jaccard similarity,
+        plus 1 when the normalized query is a substring of the title; 0 for non-matches"""
+        text = normalize_title(query)
+        scores = np.zeros(len(self), dtype=float)
+        if not text:
+            return scores
+        query_grams = trigrams(text, pad_end=False)
+        ids = [self._vocabulary[gram] for gram in query_grams if gram in self._vocabulary]
+        if not ids:
+            return scores
+        postings = np.concatenate([self._rows[self._offsets[i]:self._offsets[i + 1]] for i in ids])
+        shared = np.bincount(postings, minlength=len(self))
+        candidates = np.flatnonzero(shared >= MIN_CONTAINMENT * len(query_grams))
+        common = shared[candidates]
+        containment = common / len(query_grams)
+        jaccard = common / (len(query_grams) + self._sizes[candidates] - common)
+        substring = np.fromiter((text in title for title in self.normalized[candidates]),
+                                dtype=bool, count=len(candidates))
+        scores[candidates] = containment + jaccard + substring
+        return scores
+
+    def search(self, query, mask=None, limit=20):
+        """Row positions of the best matches, best first (ties in row order), optionally within a mask"""
+        scores = self.scores(query)
+        if mask is not None:
+            scores[~np.asarray(mask, dtype=bool)] = 0
+        matches = np.flatnonzero(scores)
+        if len(matches) > limit:
+            # Keep everything tied with the limit-th best so ties still resolve in row order
+            cutoff = np.partition(scores[matches], len(matches) - limit)[len(matches) - limit]
+            matches = matches[scores[matches] >= cutoff]
+        return matches[np.lexsort((matches, -scores[matches]))][:limit]
+
+    def search_frame(self, df, query, mask=None, limit=20):
+        """The matching rows of df, best first"""
+        if not len(df):
+            return df
+        return df.iloc[self.search(query, mask, limit)]